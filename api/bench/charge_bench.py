@@ -0,0 +1,146 @@
+"""
+Compare the transactional and atomic charge paths of POST /ic_cards/scan.
+
+Needs a MongoDB replica set (transactions). Uses its own database, which is
+dropped afterwards.
+
+    python -m bench.charge_bench --scans 2000 --concurrency 50 --students 5
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from beanie import init_beanie
+from beanie.operators import Set
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from models import ICCard, Purchase, Shelf, SystemSetting, User
+from routes.ic_cards import card_scan
+from schema import ScanRequest
+from services.charge import ChargeMode, charge_settings
+from services.scan_idempotency import scan_settings
+from services.settings import settings_service
+from services.shelf_registry import shelf_registry
+from services.transaction import transaction_stats
+
+SHELF_PORT = 1
+SHELF_PRICE = 100
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def seed(students: int):
+    now = datetime.now(timezone.utc)
+    await Shelf(shelf_id="bench_shelf", usb_port=SHELF_PORT, price=SHELF_PRICE).insert()
+    # High enough that the limit never rejects a scan during the run
+    await SystemSetting(key="max_debt_limit", value=str(10**12)).insert()
+    for i in range(students):
+        await User(student_id=i + 1, first_name=f"Bench{i + 1}", last_name="Student").insert()
+        await ICCard(uid=f"benchcard{i + 1:04d}", student_id=i + 1, created_at=now, updated_at=now).insert()
+    await shelf_registry.load()
+    await settings_service.load()
+
+
+async def reset():
+    await User.find_all().update(Set({User.account_balance: 0}))
+    await Purchase.find_all().delete()
+
+
+async def run_mode(mode: ChargeMode, scans: int, concurrency: int, students: int) -> dict:
+    charge_settings.mode = mode
+    await reset()
+    transaction_stats.reset()
+
+    latencies: list[float] = []
+    errors: Counter = Counter()
+    replayed = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal replayed
+        req = ScanRequest(idm=f"benchcard{i % students + 1:04d}", usb_port=SHELF_PORT)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await card_scan(req)
+                # Should stay 0: a replay times the idempotency lookup, not a charge
+                if result.get("replayed"):
+                    replayed += 1
+            except HTTPException as e:
+                errors[f"HTTP {e.status_code}"] += 1
+            except PyMongoError as e:
+                errors[type(e).__name__] += 1
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(scans)))
+    elapsed = time.perf_counter() - started
+
+    charged = sum(u.account_balance for u in await User.find_all().to_list())
+    purchases = await Purchase.find_all().count()
+    latencies.sort()
+    return {
+        "mode": mode.value,
+        "throughput": scans / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": dict(errors),
+        "replayed": replayed,
+        "retries": transaction_stats.snapshot().get("card_scan", {}).get("retries", 0),
+        "consistent": charged == purchases * SHELF_PRICE,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark transactional vs atomic charge paths")
+    parser.add_argument("--scans", type=int, default=2000, help="Scans per mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="Scans in flight at once")
+    parser.add_argument("--students", type=int, default=5, help="Fewer students means more contention")
+    parser.add_argument("--db", default=os.getenv("MONGODB_BENCH_DB", "labshop_bench"))
+    args = parser.parse_args()
+
+    # Every bench student taps the one bench shelf over and over; with the
+    # double-tap window on, most scans would be answered as replays
+    scan_settings.duplicate_window = timedelta(0)
+
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+    await client.drop_database(args.db)
+    await init_beanie(
+        database=client[args.db],
+        document_models=[User, Purchase, Shelf, ICCard, SystemSetting],
+    )
+
+    try:
+        await seed(args.students)
+        results = [
+            await run_mode(mode, args.scans, args.concurrency, args.students)
+            for mode in (ChargeMode.transaction, ChargeMode.atomic)
+        ]
+    finally:
+        await client.drop_database(args.db)
+        client.close()
+
+    print(f"{args.scans} scans, concurrency {args.concurrency}, {args.students} students")
+    print(f"{'mode':<12}{'scans/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'retries':>9}{'replayed':>10}  consistent  errors")
+    for r in results:
+        print(
+            f"{r['mode']:<12}{r['throughput']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['retries']:>9}"
+            f"{r['replayed']:>10}  {str(r['consistent']):<10}  {r['errors'] or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+"""
+Load generator for the scan, payment and admin list endpoints.
+
+Seeds students, cards and shelves into a dedicated database, then sends
+requests through httpx at fixed rates (open loop: latency is measured from
+the scheduled send time, so queueing inside the client counts too). Runs the
+real FastAPI app in-process by default, or targets a running server with
+--url (start it with MONGODB_DB set to --db and the same SECRET_KEY).
+
+Needs a MongoDB replica set (`make docker-db`). The database is dropped
+afterwards unless --keep is given.
+
+    python -m bench.load --students 500 --duration 30 --scan-rate 200 --payment-rate 10 --list-rate 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from beanie import init_beanie
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from bench.charge_bench import percentile
+from models import Admin, AdminLog, ICCard, Payment, Purchase, Shelf, SystemSetting, User
+from schema import ADMIN_PORT
+from services.auth import TokenData, encode_token
+from services.scan_idempotency import DUPLICATE_WINDOW_ENV
+
+SHELF_PRICE = 100
+SHELF_PORTS = [port for port in range(1, 8) if port != ADMIN_PORT]
+LIST_PATHS = ["/users/", "/purchases/", "/payments/"]
+
+
+class Recorder:
+    """Latencies and error counts for one workload."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self.replayed = 0
+
+    def record(self, latency: float, response: Optional[httpx.Response], error: Optional[Exception] = None):
+        self.latencies.append(latency)
+        if error is not None:
+            self.errors[f"network {type(error).__name__}"] += 1
+            return
+        if response.is_success: # type: ignore
+            if isinstance(body := response.json(), dict) and body.get("replayed"): # type: ignore
+                self.replayed += 1
+            return
+        self.errors[error_key(response)] += 1 # type: ignore
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "name": self.name,
+            "requests": len(latencies),
+            "ok": len(latencies) - sum(self.errors.values()),
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "replayed": self.replayed,
+            "errors": dict(self.errors),
+        }
+
+
+def error_key(response: httpx.Response) -> str:
+    """"<status>" or "<status> <error_code>" for error bodies like {"detail": {"error_code": ...}}."""
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = None
+    if isinstance(detail, dict) and detail.get("error_code"):
+        return f"{response.status_code} {detail['error_code']}"
+    return str(response.status_code)
+
+
+async def seed(students: int, max_debt_limit: int):
+    # Clear rather than drop, so the indexes the app created stay in place
+    for model in (User, ICCard, Shelf, SystemSetting, Purchase, Payment):
+        await model.delete_all()
+    now = datetime.now(timezone.utc)
+    await Shelf.insert_many([
+        Shelf(shelf_id=f"load_shelf{port}", usb_port=port, price=SHELF_PRICE, created_at=now, updated_at=now)
+        for port in SHELF_PORTS
+    ])
+    await SystemSetting(key="max_debt_limit", value=str(max_debt_limit)).insert()
+    await User.insert_many([
+        User(student_id=i, first_name=f"Load{i}", last_name="Student", created_at=now, updated_at=now)
+        for i in range(1, students + 1)
+    ])
+    await ICCard.insert_many([
+        ICCard(uid=card_uid(i), student_id=i, created_at=now, updated_at=now)
+        for i in range(1, students + 1)
+    ])
+
+
+def card_uid(student_id: int) -> str:
+    return f"loadcard{student_id:06d}"
+
+
+async def drive(
+    recorder: Recorder,
+    rate: float,
+    duration: float,
+    slots: asyncio.Semaphore,
+    send: Callable[[], Awaitable[httpx.Response]],
+):
+    """Send `rate` requests per second for `duration` seconds."""
+    if rate <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    interval = 1 / rate
+    started = loop.time()
+    tasks = []
+
+    async def one(scheduled: float):
+        async with slots:
+            try:
+                response = await send()
+            except httpx.HTTPError as e:
+                recorder.record(loop.time() - scheduled, None, e)
+                return
+        recorder.record(loop.time() - scheduled, response)
+
+    n = 0
+    while (scheduled := started + n * interval) < started + duration:
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        tasks.append(asyncio.create_task(one(scheduled)))
+        n += 1
+    await asyncio.gather(*tasks)
+
+
+async def transaction_counters(client: httpx.AsyncClient, headers: dict) -> Dict[str, dict]:
+    response = await client.get("/admin/transaction_stats", headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+def counter_delta(before: Dict[str, dict], after: Dict[str, dict]) -> Dict[str, dict]:
+    delta = {}
+    for name, stats in after.items():
+        prev = before.get(name, {})
+        aborts = Counter(stats["aborts"])
+        aborts.subtract(prev.get("aborts", {}))
+        delta[name] = {
+            "commits": stats["commits"] - prev.get("commits", 0),
+            "retries": stats["retries"] - prev.get("retries", 0),
+            "aborts": {reason: n for reason, n in aborts.items() if n},
+        }
+    return {name: d for name, d in delta.items() if d["commits"] or d["retries"] or d["aborts"]}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    os.environ.setdefault("SECRET_KEY", "labshop-load-test")
+    headers = {"Authorization": f"Bearer {encode_token(TokenData(id='load', username='load', full_name='Load Test'))}"}
+
+    async with AsyncExitStack() as stack:
+        if args.url:
+            mongo = AsyncIOMotorClient(os.getenv("MONGODB_URL"))
+            stack.callback(mongo.close)
+            await init_beanie(
+                database=mongo[args.db],
+                document_models=[User, Admin, Purchase, Payment, Shelf, ICCard, AdminLog, SystemSetting],
+            )
+            await seed(args.students, args.max_debt_limit)
+            transport = None
+        else:
+            # The in-process app reads these when its lifespan starts
+            os.environ["MONGODB_DB"] = args.db
+            if args.no_double_tap_window:
+                os.environ[DUPLICATE_WINDOW_ENV] = "0"
+            from main import app
+            from services.settings import settings_service
+            from services.shelf_registry import shelf_registry
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            mongo = User.get_pymongo_collection().database.client
+            await seed(args.students, args.max_debt_limit)
+            await shelf_registry.load()
+            await settings_service.load()
+            transport = httpx.ASGITransport(app=app)
+
+        if not args.keep:
+            stack.push_async_callback(mongo.drop_database, args.db)
+
+        client = await stack.enter_async_context(httpx.AsyncClient(
+            base_url=args.url or "http://labshop",
+            transport=transport,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+        ))
+
+        def scan():
+            student = random.randint(1, args.students)
+            return client.post("/ic_cards/scan", json={
+                "idm": card_uid(student),
+                "usb_port": random.choice(SHELF_PORTS),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "idempotency_key": uuid.uuid4().hex,
+            })
+
+        def payment():
+            return client.post("/payments/", json={
+                "student_id": random.randint(1, args.students),
+                "amount_paid": SHELF_PRICE,
+                "idempotency_key": uuid.uuid4().hex,
+            })
+
+        def admin_list():
+            return client.get(random.choice(LIST_PATHS), headers=headers)
+
+        recorders = {name: Recorder(name) for name in ("scan", "payment", "admin_list")}
+        slots = asyncio.Semaphore(args.concurrency)
+        before = await transaction_counters(client, headers)
+        started = time.perf_counter()
+        await asyncio.gather(
+            drive(recorders["scan"], args.scan_rate, args.duration, slots, scan),
+            drive(recorders["payment"], args.payment_rate, args.duration, slots, payment),
+            drive(recorders["admin_list"], args.list_rate, args.duration, slots, admin_list),
+        )
+        elapsed = time.perf_counter() - started
+        after = await transaction_counters(client, headers)
+
+    return {
+        "elapsed": elapsed,
+        "workloads": [r.summary(elapsed) for r in recorders.values() if r.latencies],
+        "transactions": counter_delta(before, after),
+    }
+
+
+def print_report(args: argparse.Namespace, report: dict):
+    target = args.url or "in-process app"
+    print(f"{target}, {args.students} students, {report['elapsed']:.1f}s, concurrency {args.concurrency}")
+    print(f"{'workload':<12}{'requests':>9}{'ok':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'replayed':>9}")
+    for w in report["workloads"]:
+        print(
+            f"{w['name']:<12}{w['requests']:>9}{w['ok']:>8}{w['throughput']:>9.1f}{w['p50_ms']:>9.2f}"
+            f"{w['p95_ms']:>9.2f}{w['p99_ms']:>9.2f}{w['max_ms']:>9.2f}{w['replayed']:>9}"
+        )
+    errors = [(w["name"], key, n) for w in report["workloads"] for key, n in w["errors"].items()]
+    if errors:
+        print("\nerrors")
+        for name, key, n in sorted(errors):
+            print(f"  {name:<12}{key:<28}{n:>8}")
+    if report["transactions"]:
+        print("\ntransactions")
+        print(f"  {'route':<20}{'commits':>9}{'retries':>9}  aborts")
+        for name, t in sorted(report["transactions"].items()):
+            print(f"  {name:<20}{t['commits']:>9}{t['retries']:>9}  {t['aborts'] or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive scans, payments and admin lists at fixed rates")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--scan-rate", type=float, default=100, help="POST /ic_cards/scan per second")
+    parser.add_argument("--payment-rate", type=float, default=5, help="POST /payments/ per second")
+    parser.add_argument("--list-rate", type=float, default=1, help="Admin list requests per second")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at once")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--max-debt-limit", type=int, default=10**12, help="Lower it to exercise LIMIT_REACHED")
+    parser.add_argument("--no-double-tap-window", action="store_true", help="Disable double-tap suppression (in-process only)")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--db", default=os.getenv("MONGODB_LOAD_DB", "labshop_load"))
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database")
+    args = parser.parse_args()
+
+    print_report(args, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main()
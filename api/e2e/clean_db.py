@@ -10,7 +10,7 @@ async def main():
     MONGODB_URL = os.getenv("MONGODB_URL")
     MONGODB_DB = os.getenv("MONGODB_DB")
     client = AsyncIOMotorClient(MONGODB_URL)
-    models: list[type[Document]] = [User, Admin, Purchase, Payment, Shelf, ICCard, AdminLog, SystemSetting]
+    models: list[type[Document]] = [User, Admin, Purchase, Payment, Shelf, ICCard, AdminLog, SystemSetting, Tombstone, TabletMessage, TabletPresence]
     await init_beanie(
         database=client[MONGODB_DB], # type: ignore
         document_models=models,
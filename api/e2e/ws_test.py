@@ -1,7 +1,6 @@
 import pytest
 import websockets as ws
 import os
-import json
 from services.ws import WSSchema
 
 
@@ -19,7 +18,8 @@ class TestWebSocketConnection:
             test_message = "HELLO API"
             await websocket.send(test_message)
             data = await websocket.recv()
-            ws_instace = WSSchema.model_validate_json(json.loads(data))
+            # Tablet frames are JSON objects, decoded once (like the tablet app does)
+            ws_instace = WSSchema.model_validate_json(data)
             assert ws_instace.action == "ECHO"
         
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import certifi
@@ -14,7 +15,8 @@ from models import UserStatus, PaymentStatus, ICCardStatus, PurchaseStatus
 from services.ws import ws_connection_manager, WSSchema
 from models import (
     User, Admin, Purchase, Payment,
-    ICCard, Shelf, AdminLog, SystemSetting
+    ICCard, Shelf, AdminLog, SystemSetting, Tombstone,
+    TabletMessage, TabletPresence
 )
 from schema import (
     UserCreate, UserOut, UsersOut,
@@ -28,6 +30,7 @@ from schema import (
 
 
 
+from routes.activity import router as ActivityRouter
 from routes.admin import router as AdminRouter
 from routes.ic_cards import router as ICCardRouter
 from routes.payment import router as PaymentRouter
@@ -38,6 +41,17 @@ from routes.websocket import router as WebsocketRouter
 from routes.setting import router as SettingRouter
 
 from services.auth import get_current_admin, TokenData
+from services.change_stream import watch_collection
+from services.shelf_registry import shelf_registry
+from services.settings import settings_service
+from services.card_cache import card_identity_cache
+from services.collection_versions import collection_versions
+from services.delta_sync import delta_sync
+from services.admin_events import admin_events
+from services.balance_updates import balance_updates
+from services.passwords import password_hasher
+from services.charge import charge_settings
+from services.scan_idempotency import scan_settings
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -55,17 +69,52 @@ async def init_db():
         database=client[MONGODB_DB],
         document_models=[
             User, Admin, Purchase, Payment, 
-            Shelf, ICCard, AdminLog, SystemSetting
+            Shelf, ICCard, AdminLog, SystemSetting, Tombstone,
+            TabletMessage, TabletPresence
         ],
     )
     return client
 
+# Balance updates on every scan must not flush the card identity cache
+USER_IDENTITY_CHANGES = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.status": {"$exists": True}},
+        {"updateDescription.updatedFields.first_name": {"$exists": True}},
+    ]}},
+]
+
 # 3. Lifespan manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    logger.info(f"Charge mode: {charge_settings.load().value}")
+    logger.info(f"Scan duplicate window: {scan_settings.load().total_seconds()}s")
     client = await init_db()
     logger.info("Startup: Database initialized.")
+    await shelf_registry.load()
+    await settings_service.load()
+    card_identity_cache.enable()
+    watchers = [
+        asyncio.create_task(watch_collection(Shelf, shelf_registry.refresh)),
+        asyncio.create_task(watch_collection(SystemSetting, settings_service.refresh)),
+        asyncio.create_task(watch_collection(ICCard, card_identity_cache.refresh)),
+        asyncio.create_task(watch_collection(User, card_identity_cache.refresh, pipeline=USER_IDENTITY_CHANGES)),
+        # ETags of the polled list routes
+        *(asyncio.create_task(collection_versions.watch(model)) for model in (User, Purchase, Payment, ICCard)),
+        # Tombstones for the delta sync routes
+        *(asyncio.create_task(delta_sync.record_deletions(model)) for model in (User, ICCard)),
+        # Admin dashboard event stream
+        asyncio.create_task(admin_events.watch()),
+        # Balance updates for the tablet roster
+        asyncio.create_task(balance_updates.watch()),
+        # Tablet payloads published by other workers
+        asyncio.create_task(ws_connection_manager.backplane.run()),
+    ]
     yield
+    for watcher in watchers:
+        watcher.cancel()
+    await asyncio.gather(*watchers, return_exceptions=True)
+    password_hasher.close()
     client.close() 
     logger.info("Shutdown: Database closed.")
 
@@ -81,6 +130,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(ActivityRouter)
 app.include_router(AdminRouter)
 app.include_router(ICCardRouter)
 app.include_router(PaymentRouter)
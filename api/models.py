@@ -4,10 +4,29 @@ from pydantic import Field
 from typing import Optional
 from enum import Enum
 from beanie import PydanticObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
 
 def utcnow():
     return datetime.now(timezone.utc) 
 
+# How long deletions are remembered for delta sync (services/delta_sync.py)
+TOMBSTONE_RETENTION_SECONDS = 7 * 24 * 3600
+
+# How long payloads relayed between API workers are kept (services/backplane.py)
+TABLET_MESSAGE_RETENTION_SECONDS = 60
+
+# How long a worker's tablet presence entry outlives its last refresh (services/backplane.py)
+TABLET_PRESENCE_TTL_SECONDS = 30
+
+# Sort order and index of keyset-paginated lists (services/pagination.py)
+CREATED_AT_PAGE_INDEX = IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)])
+
+# One student's purchases or payments in time order: exports and ledgers (services/ledger.py)
+STUDENT_HISTORY_INDEX = IndexModel([("student_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+
+# Scan order of the delta sync routes (services/delta_sync.py)
+UPDATED_AT_SYNC_INDEX = IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)])
+
 class UserStatus(str, Enum):
     active = "active"
     inactive = "inactive"
@@ -47,6 +66,12 @@ class User(Document):
 
     class Settings:
         name = "user"
+        indexes = [
+            CREATED_AT_PAGE_INDEX,
+            UPDATED_AT_SYNC_INDEX,
+            # Debtor filters and balance sort on GET /users/
+            IndexModel([("account_balance", ASCENDING), ("_id", ASCENDING)]),
+        ]
 
 class Admin(Document):
     username: str
@@ -64,10 +89,22 @@ class Purchase(Document):
     shelf_id: str
     price: int
     status: PurchaseStatus = PurchaseStatus.pending
+    idempotency_key: Optional[str] = None
+    # Student's balance right after this purchase, reported again when its scan is replayed
+    balance_after: Optional[int] = None
     created_at: datetime = Field(default_factory=utcnow)
 
     class Settings:
         name = "purchase"
+        indexes = [
+            IndexModel(
+                [("idempotency_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$type": "string"}},
+            ),
+            STUDENT_HISTORY_INDEX,
+            CREATED_AT_PAGE_INDEX,
+        ]
     
 class Payment(Document):
     student_id: int
@@ -79,6 +116,10 @@ class Payment(Document):
 
     class Settings:
         name = "payment"
+        indexes = [
+            STUDENT_HISTORY_INDEX,
+            CREATED_AT_PAGE_INDEX,
+        ]
 
 
 class Shelf(Document):
@@ -109,6 +150,7 @@ class ICCard(Document):
 
     class Settings:
         name = "ic_card"
+        indexes = [UPDATED_AT_SYNC_INDEX]
 
 class AdminLog(Document):
     admin_id: PydanticObjectId
@@ -120,6 +162,7 @@ class AdminLog(Document):
 
     class Settings:
         name = "admin_log"
+        indexes = [CREATED_AT_PAGE_INDEX]
 
 class SystemSetting(Document):
     key: Indexed(str, unique=True)
@@ -131,4 +174,44 @@ class SystemSetting(Document):
         return await super().save(*args, **kwargs)
 
     class Settings:
-        name = "system_setting"
\ No newline at end of file
+        name = "system_setting"
+
+class Tombstone(Document):
+    """Deleted user or IC card, reported by the delta sync routes until it expires."""
+    collection: str
+    document_id: PydanticObjectId
+    deleted_at: datetime = Field(default_factory=utcnow)
+
+    class Settings:
+        name = "tombstone"
+        indexes = [
+            IndexModel([("collection", ASCENDING), ("document_id", ASCENDING)], unique=True),
+            IndexModel([("collection", ASCENDING), ("deleted_at", ASCENDING)]),
+            IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=TOMBSTONE_RETENTION_SECONDS),
+        ]
+
+class TabletMessage(Document):
+    """Tablet payload relayed to the API workers; `station` is None for every tablet."""
+    station: Optional[str] = None
+    payload: dict
+    origin: str
+    created_at: datetime = Field(default_factory=utcnow)
+
+    class Settings:
+        name = "tablet_message"
+        indexes = [
+            IndexModel([("created_at", ASCENDING)], expireAfterSeconds=TABLET_MESSAGE_RETENTION_SECONDS),
+        ]
+
+class TabletPresence(Document):
+    """Tablet station connected to one API worker, refreshed while it stays connected."""
+    station: str
+    worker_id: str
+    seen_at: datetime = Field(default_factory=utcnow)
+
+    class Settings:
+        name = "tablet_presence"
+        indexes = [
+            IndexModel([("station", ASCENDING), ("worker_id", ASCENDING)], unique=True),
+            IndexModel([("seen_at", ASCENDING)], expireAfterSeconds=TABLET_PRESENCE_TTL_SECONDS),
+        ]
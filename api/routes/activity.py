@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from schema import ActivityOut
+from services.activity import activity_page
+from services.auth import get_current_admin, TokenData
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter(prefix="/activity")
+
+@router.get("/", response_model=ActivityOut, description="Purchases, payments and optionally admin log entries, newest first")
+async def list_activity(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    student_id: Optional[int] = None,
+    include_admin_logs: bool = False,
+    admin: TokenData = Depends(get_current_admin),
+):
+    items, next_cursor = await activity_page(limit, cursor, student_id, include_admin_logs)
+    return {"activity": items, "next_cursor": next_cursor}
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from models import Admin
 from schema import AdminCreate, AdminRole, AdminLogin
-from typing import Annotated
+from typing import Annotated, Optional
 from services.auth import Token, TokenData
 import services.auth as auth
-import bcrypt
+from services.admin_events import admin_events
+from services.passwords import password_hasher
+from services.transaction import transaction_stats
 import jwt
 import os
 
@@ -17,12 +20,7 @@ async def create_admin_user(data: AdminCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    password_bytes = data.password.encode('utf-8')
-
-    salt = bcrypt.gensalt()
-    hashed_password_bytes = bcrypt.hashpw(password_bytes, salt)
-
-    hashed_password = hashed_password_bytes.decode('utf-8')
+    hashed_password = await password_hasher.hash(data.password)
 
     new_admin = Admin( 
         username=data.username,
@@ -47,13 +45,15 @@ async def admin_login(credentials: AdminLogin):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     stored_hash = admin.password_hash
-    is_valid = bcrypt.checkpw(
-        credentials.password.encode("utf-8"),
-        stored_hash.encode("utf-8")
-    )
+    async with password_hasher.login():
+        is_valid = await password_hasher.verify(credentials.password, stored_hash)
 
-    if not is_valid:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+        if not is_valid:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+
+        # The configured cost changed since this hash was made
+        if password_hasher.needs_rehash(stored_hash):
+            await admin.set({Admin.password_hash: await password_hasher.hash(credentials.password)})
     
     full_name = f"{admin.first_name} {admin.last_name}"
 
@@ -78,4 +78,21 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
 
 @router.get("/me", description="Get current admin info")
 async def get_current_admin_info(admin: TokenData = Depends(auth.get_current_admin)) -> TokenData:
-    return admin
\ No newline at end of file
+    return admin
+
+@router.get("/transaction_stats", description="Get commit, retry and abort counters per transactional route")
+async def get_transaction_stats(admin: TokenData = Depends(auth.get_current_admin)):
+    return transaction_stats.snapshot()
+
+@router.get("/events", description="Server-Sent Events stream of card captures, purchases, payments, user and setting changes")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    admin: TokenData = Depends(auth.get_current_admin),
+):
+    if not admin_events.live:
+        raise HTTPException(503, "Event stream unavailable, poll instead")
+    return StreamingResponse(
+        admin_events.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
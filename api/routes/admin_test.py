@@ -62,6 +62,27 @@ class TestAdminLogin:
         checkpw_mock.reset_mock()
         encode_token_mock.reset_mock()
 
+    @pytest.mark.asyncio
+    async def test_admin_login_rehashes_on_cost_change(self, mocker: MockerFixture):
+        import bcrypt
+        from routes.admin import admin_login
+        from services.passwords import password_hasher
+        mocker.patch.object(password_hasher, "rounds", 5)
+        mocker.patch("services.auth.encode_token", return_value="mocked_token")
+        admin = await Admin(
+            username="testadmin",
+            first_name="Test",
+            last_name="Admin",
+            password_hash=bcrypt.hashpw(b"this_is_password", bcrypt.gensalt(4)).decode()
+        ).insert()
+
+        await admin_login(AdminLogin(username="testadmin", password="this_is_password"))
+
+        stored = await Admin.get(admin.id)
+        assert stored is not None
+        assert stored.password_hash.startswith("$2b$05$")
+        assert bcrypt.checkpw(b"this_is_password", stored.password_hash.encode())
+
     @pytest.mark.asyncio
     async def test_admin_login_invalid_credentials(self, mocker: MockerFixture):
         findone_mock = mocker.patch.object(Admin, "find_one", new_callable=mocker.AsyncMock)
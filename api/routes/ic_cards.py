@@ -1,32 +1,61 @@
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from schema import ICCardCreate, UserStatus
 from datetime import datetime, timezone
-from models import AdminLog, ICCard, Purchase, User, Shelf, SystemSetting
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+from models import AdminLog, ICCard, Purchase, User, utcnow
 from services.ws import WSSchema, ws_connection_manager
-
-from schema import CardRegistrationRequest, ICCardStatus, PurchaseStatus, ScanRequest
+from services.shelf_registry import ShelfEntry, shelf_registry
+from services.scan_idempotency import find_previous_scan
+from services.scan_batch import process_scan_batch
+from services.settings import settings_service
+from services.collection_versions import conditional_get
+from services.delta_sync import delta_sync
+from services.card_cache import card_identity_cache
+from services.card_capture import as_utc, card_captures
+from services.transaction import run_in_transaction
+from services.charge import ChargeMode, ChargeRejected, ChargeRejection, atomic_charge, get_charge_mode
+
+from schema import ADMIN_PORT, CardRegistrationRequest, ICCardChangesOut, ICCardStatus, PurchaseStatus, ScanBatchRequest, ScanRequest
 from services.auth import get_current_admin, TokenData
 
 
 router = APIRouter(prefix="/ic_cards")
 
-@router.get('/', description="Get all active IC cards")
+MAX_CAPTURE_WAIT_SECONDS = 60
+
+@router.get('/', description="Get all active IC cards", dependencies=[conditional_get(ICCard)])
 async def get_active_ic_cards():
     cards = await ICCard.find(ICCard.status == ICCardStatus.active).to_list()
     return cards
 
+@router.get("/changes", response_model=ICCardChangesOut, description="Cards of any status inserted, updated or deleted since a token")
+async def ic_card_changes(since: Optional[str] = Query(None, description="token of the previous response; omit for a full snapshot")):
+    changes = await delta_sync.changes(ICCard, since)
+    return {"cards": changes.pop("documents"), **changes}
+
 @router.get("/captured", description="Get latest captured unlinked IC card for admin registration")
-async def get_captured_ic_cards():
-    card = await (
-        ICCard.find(
-            ICCard.student_id == None,
-            ICCard.status == ICCardStatus.active
-        )
-        .sort(-ICCard.updated_at)
-        .first_or_none()
-    )
-    return {"uid": card.uid} if card else {"uid": None}
+async def get_captured_ic_cards(
+    wait: float = Query(0, ge=0, le=MAX_CAPTURE_WAIT_SECONDS, description="Seconds to wait for a capture newer than `after`"),
+    after: Optional[datetime] = Query(None, description="captured_at of the last card seen; only newer captures are returned"),
+):
+    if wait and after is not None:
+        captured = await card_captures.wait(after, wait)
+        if captured:
+            return {"uid": captured.uid, "captured_at": captured.captured_at}
+
+    filters = [ICCard.student_id == None, ICCard.status == ICCardStatus.active]
+    if after is not None:
+        filters.append(ICCard.updated_at > as_utc(after))
+    card = await ICCard.find(*filters).sort(-ICCard.updated_at).first_or_none()
+    if not card:
+        return {"uid": None, "captured_at": None}
+    return {"uid": card.uid, "captured_at": as_utc(card.updated_at)}
+
+@router.get("/cache_stats", description="Get card identity cache hit/miss counters")
+async def get_card_cache_stats(admin: TokenData = Depends(get_current_admin)):
+    return card_identity_cache.stats()
 
 @router.post("/", description="Create a new IC card")
 async def create_ic_card(card: ICCardCreate):
@@ -47,6 +76,7 @@ async def create_ic_card(card: ICCardCreate):
         updated_at=now
     )
     await ic.insert()
+    card_identity_cache.invalidate_uid(ic.uid)
     return ic
 
 @router.post("/{uid}/register", description="Register an IC card to a student")
@@ -71,102 +101,103 @@ async def register_card(uid: str, data: CardRegistrationRequest, admin: TokenDat
 
     now = datetime.now(timezone.utc)
 
-    client = User.get_pymongo_collection().database.client
-    
-    async with await client.start_session() as session:
-        async with session.start_transaction():
-            card = await ICCard.find_one(ICCard.uid == uid, session=session)
+    async def link(session):
+        card = await ICCard.find_one(ICCard.uid == uid, session=session)
 
-            if card and card.status != ICCardStatus.active:
-                raise HTTPException(400, "Card is deactivated. Cannot link it.")
-            
-            if card:
-                if card.status == ICCardStatus.active and card.student_id is not None:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Card {uid} is already linked to Student {card.student_id}"
-                    )
-                card.student_id = data.student_id
-                card.status = ICCardStatus.active
-                await card.save(session=session)
-            else:
-                await ICCard(
-                    uid=uid.strip().lower(),
-                    student_id=data.student_id,
-                    status=ICCardStatus.active,
-                    created_at=now,
-                    updated_at=now
-                ).insert(session=session) 
-
-            await AdminLog(
-                admin_id=PydanticObjectId(admin.id),
-                admin_name=admin.full_name,
-                action=f"Linked card {uid} to student {data.student_id}",
-                target=f"Student: {student.first_name} {student.last_name}",
-                targeted_student_id=data.student_id,
-                created_at=now
+        if card and card.status != ICCardStatus.active:
+            raise HTTPException(400, "Card is deactivated. Cannot link it.")
+
+        if card:
+            if card.status == ICCardStatus.active and card.student_id is not None:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Card {uid} is already linked to Student {card.student_id}"
+                )
+            card.student_id = data.student_id
+            card.status = ICCardStatus.active
+            await card.save(session=session)
+        else:
+            await ICCard(
+                uid=uid.strip().lower(),
+                student_id=data.student_id,
+                status=ICCardStatus.active,
+                created_at=now,
+                updated_at=now
             ).insert(session=session) 
 
+        await AdminLog(
+            admin_id=PydanticObjectId(admin.id),
+            admin_name=admin.full_name,
+            action=f"Linked card {uid} to student {data.student_id}",
+            target=f"Student: {student.first_name} {student.last_name}",
+            targeted_student_id=data.student_id,
+            created_at=now
+        ).insert(session=session) 
+
+    await run_in_transaction("register_card", link)
+
+    card_identity_cache.invalidate_uid(uid)
     return {"message": f"Card {uid} linked to student {data.student_id} by {admin.full_name}"}
 
 @router.post("/{uid}/deactivate", description="Deactivate an IC card")
 async def deactivate_card(uid: str, admin: TokenData = Depends(get_current_admin)):
-    client = User.get_pymongo_collection().database.client
     now = datetime.now(timezone.utc)
-    
-    async with await client.start_session() as session:
-        async with session.start_transaction():
 
-            card = await ICCard.find_one(ICCard.uid == uid, session=session)
-            if not card:
-                raise HTTPException(404, "Card not found")
+    async def deactivate(session):
+        card = await ICCard.find_one(ICCard.uid == uid, session=session)
+        if not card:
+            raise HTTPException(404, "Card not found")
 
-            old_id = card.student_id
+        old_id = card.student_id
 
-            card.status = ICCardStatus.deactivated
-            card.student_id = None 
-            await card.save(session=session)
+        card.status = ICCardStatus.deactivated
+        card.student_id = None 
+        await card.save(session=session)
+
+        await AdminLog(
+            admin_id=PydanticObjectId(admin.id),
+            admin_name=admin.full_name,
+            action=f"Deactivated card {uid}",
+            target=f"Disconnected from Student: {old_id}",
+            targeted_student_id=old_id,
+            created_at=now
+        ).insert(session=session)
 
-            await AdminLog(
-                admin_id=PydanticObjectId(admin.id),
-                admin_name=admin.full_name,
-                action=f"Deactivated card {uid}",
-                target=f"Disconnected from Student: {old_id}",
-                targeted_student_id=old_id,
-                created_at=now
-            ).insert(session=session)
+    await run_in_transaction("deactivate_card", deactivate)
 
+    card_identity_cache.invalidate_uid(uid)
     return {"message": f"Card {uid} successfully deactivated and logged."}
 
 @router.post("/{uid}/unlink", description="Unlink an IC card from its student (keep card active)")
 async def unlink_card(uid: str, admin: TokenData = Depends(get_current_admin)):
-    client = User.get_pymongo_collection().database.client
     now = datetime.now(timezone.utc)
 
-    async with await client.start_session() as session:
-        async with session.start_transaction():
-            card = await ICCard.find_one(ICCard.uid == uid, session=session)
-            if not card:
-                raise HTTPException(404, "Card not found")
+    async def unlink(session):
+        card = await ICCard.find_one(ICCard.uid == uid, session=session)
+        if not card:
+            raise HTTPException(404, "Card not found")
 
-            old_id = card.student_id
-            if old_id is None:
-                raise HTTPException(400, "Card is not linked to any student")
+        old_id = card.student_id
+        if old_id is None:
+            raise HTTPException(400, "Card is not linked to any student")
 
-            # Keep active, just unlink
-            card.student_id = None
-            card.updated_at = now
-            await card.save(session=session)
+        # Keep active, just unlink
+        card.student_id = None
+        card.updated_at = now
+        await card.save(session=session)
+
+        await AdminLog(
+            admin_id=PydanticObjectId(admin.id),
+            admin_name=admin.full_name,
+            action=f"Unlinked card {uid}",
+            target=f"Was linked to Student: {old_id}",
+            targeted_student_id=old_id,
+            created_at=now
+        ).insert(session=session)
 
-            await AdminLog(
-                admin_id=PydanticObjectId(admin.id),
-                admin_name=admin.full_name,
-                action=f"Unlinked card {uid}",
-                target=f"Was linked to Student: {old_id}",
-                targeted_student_id=old_id,
-                created_at=now
-            ).insert(session=session)
+    await run_in_transaction("unlink_card", unlink)
 
+    card_identity_cache.invalidate_uid(uid)
     return {"message": f"Card {uid} unlinked"}
 
 @router.post("/scan", description="Scan an IC card")
@@ -175,16 +206,17 @@ async def card_scan(scan: ScanRequest):
     usb_port = scan.usb_port
 
     now = scan.timestamp or datetime.now(timezone.utc)
-    card = await ICCard.find_one(ICCard.uid == uid)
-    
-    ADMIN_PORT = 5
 
     if usb_port == ADMIN_PORT:
         print(f">>> ADMIN MODE ACTIVATED ON PORT [{usb_port}] FOR UID: {uid}")
+        card = await ICCard.find_one(ICCard.uid == uid)
         
         if not card or card.student_id is None:
+            # Server time, not the scan's: delta sync tokens and capture waiters
+            # compare against it, and a replayed or clock-skewed scan must still show up
+            captured_at = utcnow()
             if card:
-                await card.set({ICCard.updated_at: now})
+                await card.set({ICCard.updated_at: captured_at})
                 print(">>> Updated existing unlinked card.")
             else:
                 new_card = ICCard(
@@ -192,10 +224,12 @@ async def card_scan(scan: ScanRequest):
                     student_id=None, 
                     status=ICCardStatus.active,
                     created_at=now,
-                    updated_at=now
+                    updated_at=captured_at
                 )
                 await new_card.insert()
+                card_identity_cache.invalidate_uid(uid)
                 print(">>> Successfully inserted NEW card to DB.")
+            card_captures.notify(uid, captured_at)
             return {"status": "new_card", "message": "Card captured. Register in Admin."}
         if card.status != ICCardStatus.active:
             return {"status": "error", "message": "Card is not active"}
@@ -223,61 +257,135 @@ async def card_scan(scan: ScanRequest):
             "message": f"Hi {student.first_name}, choose payment amount."
         }
 
-    if not card or card.student_id is None:
+    identity = await card_identity_cache.resolve(uid)
+    if not identity or identity.student_id is None:
         raise HTTPException(404, "Card not registered to a student")
     
-    if card.status != ICCardStatus.active:
+    if identity.card_status != ICCardStatus.active:
         raise HTTPException(403, "Card is not active")
 
-    client = User.get_pymongo_collection().database.client
-    
-    async with await client.start_session() as session:
-        async with session.start_transaction():
-            
-            student = await User.find_one(User.student_id == card.student_id, session=session)
-            if not student:
-                raise HTTPException(404, "Student record not found")
-            if getattr(student, "status", None) == UserStatus.inactive:
-                raise HTTPException(403, "User is inactive")
-            shelf = await Shelf.find_one(Shelf.usb_port == usb_port, session=session)
-            if not shelf:
-                raise HTTPException(404, f"Shelf on USB port {usb_port} not found")
-
-            price = shelf.price
-            limit_doc = await SystemSetting.find_one(SystemSetting.key == "max_debt_limit", session=session)
-            max_limit = int(limit_doc.value) if limit_doc else 2000
-            
-            if student.account_balance + price > max_limit:
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "error_code": "LIMIT_REACHED",
-                        "message": "Debt limit reached",
-                        "current_debt": student.account_balance
-                    }
-                )
-
-            # Update Student Balance
-            student.account_balance += price
-            student.updated_at = now
-            await student.save(session=session)
-
-            new_purchase = Purchase(
-                student_id=student.student_id,
-                shelf_id=shelf.shelf_id,
-                price=price,
-                status=PurchaseStatus.completed,
-                created_at=now
+    if identity.student_status is None:
+        raise HTTPException(404, "Student record not found")
+    if identity.student_status == UserStatus.inactive:
+        raise HTTPException(403, "User is inactive")
+
+    shelf = await shelf_registry.get_by_port(usb_port)
+    if not shelf:
+        raise HTTPException(404, f"Shelf on USB port {usb_port} not found")
+
+    scan_key = scan.scan_key
+    previous = await find_previous_scan(scan_key, identity.student_id, shelf.shelf_id, now)
+    if previous:
+        return await _replayed_scan_result(previous)
+
+    try:
+        if get_charge_mode() == ChargeMode.atomic:
+            return await _atomic_card_scan(identity.student_id, shelf, now, scan_key)
+        return await _transactional_card_scan(identity.student_id, shelf, now, scan_key)
+    except DuplicateKeyError:
+        # A retry of this scan was charged concurrently
+        if not scan_key:
+            raise
+        previous = await Purchase.find_one(Purchase.idempotency_key == scan_key)
+        if not previous:
+            raise
+        return await _replayed_scan_result(previous)
+
+
+@router.post("/scan/batch", description="Process a buffered, ordered batch of IC card scans")
+async def card_scan_batch(batch: ScanBatchRequest):
+    return {"results": await process_scan_batch(batch.scans)}
+
+
+async def _transactional_card_scan(student_id: int, shelf: ShelfEntry, now: datetime, scan_key: Optional[str]):
+    async def charge(session):
+        student = await User.find_one(User.student_id == student_id, session=session)
+        if not student:
+            raise HTTPException(404, "Student record not found")
+        if getattr(student, "status", None) == UserStatus.inactive:
+            raise HTTPException(403, "User is inactive")
+
+        price = shelf.price
+        max_limit = await settings_service.max_debt_limit()
+
+        if student.account_balance + price > max_limit:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error_code": "LIMIT_REACHED",
+                    "message": "Debt limit reached",
+                    "current_debt": student.account_balance
+                }
             )
-            await new_purchase.insert(session=session)
 
-            return {
-                "status": "success",
-                "student_name": student.first_name,
-                "amount_charged": price,
-                "new_balance": student.account_balance
-            }
+        # Update Student Balance
+        student.account_balance += price
+        student.updated_at = now
+        await student.save(session=session)
+
+        new_purchase = Purchase(
+            student_id=student.student_id,
+            shelf_id=shelf.shelf_id,
+            price=price,
+            status=PurchaseStatus.completed,
+            idempotency_key=scan_key,
+            balance_after=student.account_balance,
+            created_at=now
+        )
+        await new_purchase.insert(session=session)
+
+        return {
+            "status": "success",
+            "student_name": student.first_name,
+            "amount_charged": price,
+            "new_balance": student.account_balance
+        }
+
+    return await run_in_transaction("card_scan", charge)
 
 
+async def _atomic_card_scan(student_id: int, shelf: ShelfEntry, now: datetime, scan_key: Optional[str]):
+    max_limit = await settings_service.max_debt_limit()
+
+    try:
+        student, _ = await atomic_charge(student_id, shelf.shelf_id, shelf.price, max_limit, now, scan_key)
+    except ChargeRejected as e:
+        if e.reason == ChargeRejection.student_not_found:
+            raise HTTPException(404, "Student record not found")
+        if e.reason == ChargeRejection.user_inactive:
+            raise HTTPException(403, "User is inactive")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "LIMIT_REACHED",
+                "message": "Debt limit reached",
+                "current_debt": e.current_debt
+            }
+        )
 
-    
\ No newline at end of file
+    return {
+        "status": "success",
+        "student_name": student.first_name,
+        "amount_charged": shelf.price,
+        "new_balance": student.account_balance
+    }
+
+
+async def _replayed_scan_result(purchase: Purchase):
+    """
+    Answer a duplicate scan with the result of the purchase it duplicates, without charging again.
+
+    `new_balance` is the balance right after that purchase, not the current one,
+    which later purchases and payments may have moved. Purchases recorded
+    before balances were kept with them are replayed without it.
+    """
+    student = await User.find_one(User.student_id == purchase.student_id)
+    result = {
+        "status": "success",
+        "student_name": student.first_name if student else None,
+        "amount_charged": purchase.price,
+        "replayed": True
+    }
+    if purchase.balance_after is not None:
+        result["new_balance"] = purchase.balance_after
+    return result
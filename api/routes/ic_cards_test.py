@@ -1,7 +1,9 @@
+import asyncio
 import json
 
 import pytest
 import pytest_asyncio
+from datetime import datetime, timedelta, timezone
 from pytest_mock import MockerFixture, mocker
 from unittest.mock import AsyncMock, MagicMock
 from mongomock_motor import AsyncMongoMockClient
@@ -10,7 +12,8 @@ from beanie import PydanticObjectId, init_beanie
 from schema import ICCardCreate, ICCardStatus, CardRegistrationRequest, ScanRequest
 from services.auth import TokenData
 from fastapi import HTTPException
-from routes.ic_cards import register_card, create_ic_card, card_scan
+from routes.ic_cards import register_card, create_ic_card, card_scan, get_captured_ic_cards
+from services.card_capture import CardCaptureNotifier
 from services.ws import ConnectionManager, WSSchema
 
 
@@ -249,6 +252,46 @@ class TestRegisterCard:
     
 
 
+class TestCapturedCard:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self, mocker: MockerFixture):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[User, ICCard]) # type: ignore
+        self.notifier = CardCaptureNotifier()
+        mocker.patch("routes.ic_cards.card_captures", self.notifier)
+        self.seen_at = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        await ICCard(uid="seen", student_id=None, updated_at=self.seen_at).insert()
+
+    @pytest.mark.asyncio
+    async def test_latest_without_wait(self):
+        res = await get_captured_ic_cards(wait=0, after=None)
+        assert res == {"uid": "seen", "captured_at": self.seen_at}
+
+    @pytest.mark.asyncio
+    async def test_long_poll_returns_on_admin_port_scan(self, mocker: MockerFixture):
+        find_mock = mocker.spy(ICCard, "find")
+        poll = asyncio.create_task(get_captured_ic_cards(wait=30, after=self.seen_at))
+        await asyncio.sleep(0)
+
+        # Replayed from the spool: the scan itself happened before the last capture seen
+        await card_scan(ScanRequest(idm="fresh", usb_port=5, timestamp=self.seen_at - timedelta(minutes=1)))
+
+        res = await asyncio.wait_for(poll, 1)
+        assert res["uid"] == "fresh"
+        assert res["captured_at"] > self.seen_at
+        card = await ICCard.find_one(ICCard.uid == "fresh")
+        assert card is not None
+        assert card.created_at.replace(tzinfo=timezone.utc) == self.seen_at - timedelta(minutes=1)
+        assert card.updated_at.replace(tzinfo=timezone.utc) == res["captured_at"]
+        # Woken without querying for captured cards
+        find_mock.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_long_poll_timeout_checks_database_once(self):
+        res = await get_captured_ic_cards(wait=0.01, after=self.seen_at)
+        assert res == {"uid": None, "captured_at": None}
+
+
 @pytest.mark.asyncio
 class TestICCardScan:
 
@@ -528,3 +571,70 @@ class TestICCardScan:
         assert base_purchase.price == 50
         assert base_purchase.status == PurchaseStatus.completed
         
+
+    async def test_non_admin_retried_scan_is_replayed(self, mocker: MockerFixture):
+        """
+        Simulate a scanner retrying a scan whose idempotency key was already charged.
+        Expectation: Return the original purchase result without charging again.
+        """
+        await Purchase(
+            student_id=1, shelf_id="shelf1", price=50, balance_after=100,
+            status=PurchaseStatus.completed, idempotency_key="scan-key-1"
+        ).insert()
+        req = ScanRequest(idm="validcarduid123", usb_port=2, idempotency_key="scan-key-1")
+
+        iccard_findone_mock = mocker.patch.object(ICCard, "find_one", new_callable=mocker.AsyncMock)
+        iccard_findone_mock.return_value = ICCard(uid="validcarduid123", student_id=1, status=ICCardStatus.active)
+
+        user_findone_mock = mocker.patch.object(User, "find_one", new_callable=mocker.AsyncMock)
+        user_findone_mock.return_value = User(student_id=1, first_name="Test", last_name="Student", account_balance=150)
+
+        shelf_findone_mock = mocker.patch.object(Shelf, "find_one", new_callable=mocker.AsyncMock)
+        shelf_findone_mock.return_value = Shelf(shelf_id="shelf1", usb_port=2, price=50)
+
+        purchase_insert_mock = mocker.patch("models.Purchase.insert", autospec=True)
+
+        res = await card_scan(req)
+
+        assert res["status"] == "success"
+        assert res["replayed"] is True
+        assert res["amount_charged"] == 50
+        # The balance right after the original purchase, not the current 150
+        assert res["new_balance"] == 100
+        purchase_insert_mock.assert_not_called()
+
+    async def test_non_admin_double_tap_is_suppressed(self, mocker: MockerFixture):
+        """
+        Simulate the same card tapped twice on the same shelf within the duplicate window.
+        Expectation: The second tap returns the first purchase instead of creating another.
+        """
+        first_tap = datetime.now(timezone.utc)
+        await Purchase(
+            student_id=1, shelf_id="shelf1", price=50,
+            status=PurchaseStatus.completed, created_at=first_tap
+        ).insert()
+        req = ScanRequest(idm="validcarduid123", usb_port=2, timestamp=first_tap + timedelta(milliseconds=300))
+
+        iccard_findone_mock = mocker.patch.object(ICCard, "find_one", new_callable=mocker.AsyncMock)
+        iccard_findone_mock.return_value = ICCard(uid="validcarduid123", student_id=1, status=ICCardStatus.active)
+
+        user_findone_mock = mocker.patch.object(User, "find_one", new_callable=mocker.AsyncMock)
+        user_findone_mock.return_value = User(student_id=1, first_name="Test", last_name="Student", account_balance=150)
+
+        shelf_findone_mock = mocker.patch.object(Shelf, "find_one", new_callable=mocker.AsyncMock)
+        shelf_findone_mock.return_value = Shelf(shelf_id="shelf1", usb_port=2, price=50)
+
+        purchase_insert_mock = mocker.patch("models.Purchase.insert", autospec=True)
+
+        res = await card_scan(req)
+
+        assert res["replayed"] is True
+        # The first tap's purchase carries no recorded balance
+        assert "new_balance" not in res
+        purchase_insert_mock.assert_not_called()
+
+    async def test_scan_key_derived_from_timestamp(self):
+        ts = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        assert ScanRequest(idm=" ABCD1234 ", usb_port=3, timestamp=ts).scan_key == f"abcd1234:3:{ts.isoformat()}"
+        assert ScanRequest(idm="abcd1234", usb_port=3, timestamp=ts, idempotency_key="k").scan_key == "k"
+        assert ScanRequest(idm="abcd1234", usb_port=3).scan_key is None
@@ -1,46 +1,72 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from schema import PaymentCreate, PaymentOut, PaymentsOut
 from datetime import datetime, timezone
 from models import Payment, PaymentStatus, User
+from services.transaction import run_in_transaction
+from services.auth import get_current_admin, TokenData
+from services.export import MEDIA_TYPES, ExportFormat, export_filename, export_query, stream_export
+from services.collection_versions import conditional_get
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 
 router = APIRouter(prefix="/payments")
 
-@router.get("/", response_model=PaymentsOut)
-async def list_payments():
-    return {"payments": await Payment.find().to_list()}
+@router.get("/", response_model=PaymentsOut, dependencies=[conditional_get(Payment)])
+async def list_payments(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    if limit is None and cursor is None:
+        return {"payments": await Payment.find().to_list()}
+    page, next_cursor = await paginate(Payment, cursor=cursor, limit=limit or DEFAULT_PAGE_SIZE)
+    return {"payments": page, "next_cursor": next_cursor}
+
+@router.get("/export", description="Stream payments as NDJSON or CSV, oldest first")
+async def export_payments(
+    format: ExportFormat = ExportFormat.ndjson,
+    student_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+    admin: TokenData = Depends(get_current_admin),
+):
+    return StreamingResponse(
+        stream_export(Payment, export_query(student_id, start, end), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("payments", format)}"'},
+    )
 
 @router.post("/", response_model=PaymentOut)
 async def create_payment(p: PaymentCreate):
     now = datetime.now(timezone.utc)
     
-    client = User.get_pymongo_collection().database.client
-    
-    async with await client.start_session() as session:
-        async with session.start_transaction():
-            student = await User.find_one(User.student_id == p.student_id, session=session)
-            if not student:
-                raise HTTPException(404, "Student not found")
-
-            amount = int(p.amount_paid)
-            if amount <= 0:
-                raise HTTPException(400, "Payment amount must be greater than zero.")
-
-            if p.idempotency_key:
-                existing = await Payment.find_one(Payment.idempotency_key == p.idempotency_key, session=session)
-                if existing:
-                    return existing
-            
-            payment = Payment(
-                student_id=p.student_id,
-                amount_paid=amount,
-                status=PaymentStatus.completed,
-                idempotency_key=p.idempotency_key,
-                created_at=now,
-            )
-
-            await payment.insert(session=session)
-            # Deduct the amount from student's balance
-            student.account_balance -= amount
-            await student.save(session=session)
-            return payment
+    async def pay(session):
+        student = await User.find_one(User.student_id == p.student_id, session=session)
+        if not student:
+            raise HTTPException(404, "Student not found")
+
+        amount = int(p.amount_paid)
+        if amount <= 0:
+            raise HTTPException(400, "Payment amount must be greater than zero.")
+
+        if p.idempotency_key:
+            existing = await Payment.find_one(Payment.idempotency_key == p.idempotency_key, session=session)
+            if existing:
+                return existing
+
+        payment = Payment(
+            student_id=p.student_id,
+            amount_paid=amount,
+            status=PaymentStatus.completed,
+            idempotency_key=p.idempotency_key,
+            created_at=now,
+        )
+
+        await payment.insert(session=session)
+        # Deduct the amount from student's balance
+        student.account_balance -= amount
+        await student.save(session=session)
+        return payment
+
+    return await run_in_transaction("create_payment", pay)
 
@@ -1,63 +1,109 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from schema import PurchaseCreate, PurchaseOut
 from datetime import datetime, timezone
-from models import Purchase, User, Shelf, SystemSetting, PurchaseStatus, UserStatus
+from models import Purchase, User, Shelf, PurchaseStatus, UserStatus
 from schema import PurchasesOut
+from services.settings import settings_service
+from services.transaction import run_in_transaction
+from services.auth import get_current_admin, TokenData
+from services.export import MEDIA_TYPES, ExportFormat, export_filename, export_query, stream_export
+from services.collection_versions import conditional_get
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from services.charge import ChargeMode, ChargeRejected, ChargeRejection, atomic_charge, get_charge_mode
 
 router = APIRouter(prefix="/purchases")
 
-@router.get("/", response_model=PurchasesOut)
-async def list_purchases():
-    return {"purchases": await Purchase.find().to_list()}
+@router.get("/", response_model=PurchasesOut, dependencies=[conditional_get(Purchase)])
+async def list_purchases(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    if limit is None and cursor is None:
+        return {"purchases": await Purchase.find().to_list()}
+    page, next_cursor = await paginate(Purchase, cursor=cursor, limit=limit or DEFAULT_PAGE_SIZE)
+    return {"purchases": page, "next_cursor": next_cursor}
+
+@router.get("/export", description="Stream purchases as NDJSON or CSV, oldest first")
+async def export_purchases(
+    format: ExportFormat = ExportFormat.ndjson,
+    student_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+    admin: TokenData = Depends(get_current_admin),
+):
+    return StreamingResponse(
+        stream_export(Purchase, export_query(student_id, start, end), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("purchases", format)}"'},
+    )
 
 @router.post("/", response_model=PurchaseOut)
 async def create_purchase(p: PurchaseCreate):
     now = datetime.now(timezone.utc)
 
-    client = Purchase.get_pymongo_collection().database.client
-    
-    async with client.start_session() as session:
-        async with await session.start_transaction():
-            student = await User.find_one(
-                User.student_id == p.student_id,
-                session=session
-            )
-            if not student:
-                raise HTTPException(400, "Student does not exist")
-            
-            if getattr(student, "status", None) == UserStatus.inactive:
-                raise HTTPException(403, "User is inactive")
-
-            shelf = await Shelf.find_one(
-                Shelf.shelf_id == p.shelf_id,
-                session=session
-            )
-            if not shelf:
-                raise HTTPException(400, "Shelf does not exist")
-
-            price = shelf.price
-            limit_doc = await SystemSetting.find_one(
-                SystemSetting.key == "max_debt_limit",
-                session=session
-            )
-            max_limit = int(limit_doc.value) if limit_doc else 2000
-
-            if student.account_balance + price > max_limit:
-                raise HTTPException(400, "Debt limit reached")
-
-            student.account_balance += price
-            student.updated_at = now
-            await student.save(session=session)
-
-            purchase = Purchase(
-                student_id=p.student_id,
-                shelf_id=p.shelf_id,
-                price=price,
-                status=PurchaseStatus.completed,
-                created_at=now,
-            )
-
-            await purchase.insert(session=session)
-
-            return purchase
+    if get_charge_mode() == ChargeMode.atomic:
+        return await _atomic_create_purchase(p, now)
+
+    async def charge(session):
+        student = await User.find_one(
+            User.student_id == p.student_id,
+            session=session
+        )
+        if not student:
+            raise HTTPException(400, "Student does not exist")
+
+        if getattr(student, "status", None) == UserStatus.inactive:
+            raise HTTPException(403, "User is inactive")
+
+        shelf = await Shelf.find_one(
+            Shelf.shelf_id == p.shelf_id,
+            session=session
+        )
+        if not shelf:
+            raise HTTPException(400, "Shelf does not exist")
+
+        price = shelf.price
+        max_limit = await settings_service.max_debt_limit()
+
+        if student.account_balance + price > max_limit:
+            raise HTTPException(400, "Debt limit reached")
+
+        student.account_balance += price
+        student.updated_at = now
+        await student.save(session=session)
+
+        purchase = Purchase(
+            student_id=p.student_id,
+            shelf_id=p.shelf_id,
+            price=price,
+            status=PurchaseStatus.completed,
+            balance_after=student.account_balance,
+            created_at=now,
+        )
+
+        await purchase.insert(session=session)
+
+        return purchase
+
+    return await run_in_transaction("create_purchase", charge)
+
+
+async def _atomic_create_purchase(p: PurchaseCreate, now: datetime):
+    shelf = await Shelf.find_one(Shelf.shelf_id == p.shelf_id)
+    if not shelf:
+        raise HTTPException(400, "Shelf does not exist")
+
+    max_limit = await settings_service.max_debt_limit()
+
+    try:
+        _, purchase = await atomic_charge(p.student_id, shelf.shelf_id, shelf.price, max_limit, now)
+    except ChargeRejected as e:
+        if e.reason == ChargeRejection.student_not_found:
+            raise HTTPException(400, "Student does not exist")
+        if e.reason == ChargeRejection.user_inactive:
+            raise HTTPException(403, "User is inactive")
+        raise HTTPException(400, "Debt limit reached")
 
+    return purchase
@@ -3,12 +3,13 @@ from models import SystemSetting, AdminLog
 from schema import SystemSettingCreate, SystemSettingOut
 from datetime import datetime, timezone
 from services.auth import get_current_admin, TokenData
+from services.settings import settings_service, parse_setting_value
 
 router = APIRouter(prefix="/settings")
 
 @router.get("/{key}", response_model=SystemSettingOut)
 async def get_system_setting(key: str):
-    setting = await SystemSetting.find_one(SystemSetting.key == key)
+    setting = await settings_service.get(key)
     if not setting:
         raise HTTPException(status_code=404, detail="System setting not found")
     return setting
@@ -17,6 +18,11 @@ async def get_system_setting(key: str):
 @router.put("/", response_model=SystemSettingOut)
 async def create_or_update_system_setting(s: SystemSettingCreate, admin: TokenData = Depends(get_current_admin)):
     now = datetime.now(timezone.utc)
+
+    try:
+        parse_setting_value(s.key, s.value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid value for {s.key}")
     
     setting = await SystemSetting.find_one(SystemSetting.key == s.key)
 
@@ -28,6 +34,8 @@ async def create_or_update_system_setting(s: SystemSettingCreate, admin: TokenDa
         await setting.insert()
         action_msg = f"Created new setting {s.key} with value {s.value}"
 
+    settings_service.apply(setting)
+
     await AdminLog(
         admin_id=admin.id,
         admin_name=admin.full_name,
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from schema import ShelfCreate, ShelfOut
 from models import Shelf
 from datetime import datetime, timezone
+from services.shelf_registry import shelf_registry
 
 
 router = APIRouter(prefix="/shelves")
@@ -20,6 +21,7 @@ async def create_shelf(s: ShelfCreate):
         updated_at=now
     )
     await shelf.insert()
+    await shelf_registry.refresh()
     return shelf
 
 @router.get("/")
@@ -1,18 +1,58 @@
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
 from models import User, AdminLog, UserStatus
-from schema import UserOut, UserCreate, UsersOut
+from schema import LedgerOut, UserChangesOut, UserOut, UserCreate, UserSort, UsersOut
 from services.auth import get_current_admin, TokenData
+from services.card_cache import card_identity_cache
+from services.collection_versions import conditional_get
+from services.delta_sync import delta_sync
+from services.ledger import ledger_page
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 from datetime import datetime, timezone
 from beanie import PydanticObjectId
+from pymongo import ASCENDING, DESCENDING
 
 
 router = APIRouter(prefix="/users")
 
 
-@router.get("/", response_model=UsersOut)
-async def list_users():
-    return {"users": await User.find().to_list()}
+@router.get("/", response_model=UsersOut, dependencies=[conditional_get(User)])
+async def list_users(
+    min_balance: Optional[int] = Query(None, description="Only users with account_balance >= min_balance"),
+    max_balance: Optional[int] = Query(None, description="Only users with account_balance <= max_balance"),
+    status: Optional[UserStatus] = None,
+    sort: Optional[UserSort] = Query(None, description="Sort order; pages default to -created_at"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables cursor pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    filters = []
+    if min_balance is not None:
+        filters.append(User.account_balance >= min_balance)
+    if max_balance is not None:
+        filters.append(User.account_balance <= max_balance)
+    if status is not None:
+        filters.append(User.status == status)
+
+    if limit is None and cursor is None:
+        query = User.find(*filters)
+        if sort:
+            direction = DESCENDING if sort.descending else ASCENDING
+            query = query.sort([(sort.field, direction), ("_id", direction)])
+        return {"users": await query.to_list()}
+
+    sort = sort or UserSort.newest
+    page, next_cursor = await paginate(
+        User, *filters,
+        cursor=cursor, limit=limit or DEFAULT_PAGE_SIZE,
+        order_by=sort.field, descending=sort.descending,
+    )
+    return {"users": page, "next_cursor": next_cursor}
+
+@router.get("/changes", response_model=UserChangesOut)
+async def user_changes(since: Optional[str] = Query(None, description="token of the previous response; omit for a full snapshot")):
+    changes = await delta_sync.changes(User, since)
+    return {"users": changes.pop("documents"), **changes}
 
 @router.get("/{student_id}", response_model=UserOut)
 async def get_user(student_id: int):
@@ -21,6 +61,23 @@ async def get_user(student_id: int):
         raise HTTPException(404, "User not found")
     return user
 
+@router.get("/{student_id}/ledger", response_model=LedgerOut)
+async def get_user_ledger(
+    student_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    user = await User.find_one(User.student_id == student_id)
+    if not user:
+        raise HTTPException(404, "User not found")
+    entries, next_cursor = await ledger_page(student_id, limit, cursor)
+    return {
+        "student_id": student_id,
+        "account_balance": user.account_balance,
+        "entries": entries,
+        "next_cursor": next_cursor,
+    }
+
 @router.patch("/{student_id}/status")
 async def set_user_status(
     student_id: int,
@@ -36,6 +93,7 @@ async def set_user_status(
     
     user.status = status
     await user.save()
+    card_identity_cache.invalidate_student(student_id)
     return {"ok": True, "student_id": student_id, "status": user.status}
 
 @router.post("/", response_model=UserOut)
@@ -0,0 +1,69 @@
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import User, UserStatus
+from routes.user import get_user_ledger, list_users
+from schema import UserSort
+
+
+class TestListUsers:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[User]) # type: ignore
+
+        for student_id, balance, status in [
+            (1, 0, UserStatus.active),
+            (2, 300, UserStatus.active),
+            (3, 1200, UserStatus.active),
+            (4, 300, UserStatus.inactive),
+            (5, -100, UserStatus.active),
+        ]:
+            await User(student_id=student_id, first_name=f"S{student_id}", last_name="Student",
+                       account_balance=balance, status=status).insert()
+
+    def ids(self, result) -> list:
+        return [u.student_id for u in result["users"]]
+
+    @pytest.mark.asyncio
+    async def test_debtors_sorted_by_balance(self):
+        result = await list_users(min_balance=1, max_balance=None, status=None, sort=UserSort.balance_desc, limit=None, cursor=None)
+        assert self.ids(result) == [3, 4, 2]
+
+    @pytest.mark.asyncio
+    async def test_filters_by_status_and_range(self):
+        result = await list_users(min_balance=None, max_balance=300, status=UserStatus.active, sort=UserSort.balance, limit=None, cursor=None)
+        assert self.ids(result) == [5, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_paginates_by_balance(self):
+        first = await list_users(min_balance=1, max_balance=None, status=None, sort=UserSort.balance_desc, limit=2, cursor=None)
+        assert self.ids(first) == [3, 4]
+        second = await list_users(min_balance=1, max_balance=None, status=None, sort=UserSort.balance_desc, limit=2, cursor=first["next_cursor"])
+        assert self.ids(second) == [2]
+        assert second["next_cursor"] is None
+
+
+class TestUserLedger:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[User]) # type: ignore
+        await User(student_id=1, first_name="S1", last_name="Student", account_balance=300).insert()
+
+    @pytest.mark.asyncio
+    async def test_returns_page_with_current_balance(self, mocker: MockerFixture):
+        page_mock = mocker.patch("routes.user.ledger_page", return_value=([], None))
+        result = await get_user_ledger(1, limit=50, cursor=None)
+        assert result == {"student_id": 1, "account_balance": 300, "entries": [], "next_cursor": None}
+        page_mock.assert_awaited_once_with(1, 50, None)
+
+    @pytest.mark.asyncio
+    async def test_unknown_student(self):
+        with pytest.raises(HTTPException) as e:
+            await get_user_ledger(2, limit=50, cursor=None)
+        assert e.value.status_code == 404
@@ -1,20 +1,31 @@
-from fastapi import APIRouter, WebSocket
-from services.ws import ws_connection_manager
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from routes.ic_cards import card_scan
+from services.scanner_ws import ScannerChannel
+from services.ws import DEFAULT_STATION, ws_connection_manager
 from services.ws import WSSchema
 
 router = APIRouter(prefix="/ws")
 
 @router.websocket("/tablet")
-async def websocket_endpoint(ws: WebSocket):
-    await ws_connection_manager.connect_tablet(ws)
+async def websocket_endpoint(ws: WebSocket, station: str = DEFAULT_STATION):
+    tablet = await ws_connection_manager.connect_tablet(ws, station)
     try:
         while True:
             data = await ws.receive_text()
-            print(f"Received data from tablet: {data}")
-            await ws.send_json(WSSchema(
+            if tablet.received(data):
+                continue
+            print(f"Received data from tablet '{station}': {data}")
+            tablet.enqueue(WSSchema(
                 action="ECHO"
-            ).model_dump_json())
+            ).model_dump(exclude_none=True))
     except Exception as e:
         print(f"WebSocket connection closed: {e}")
     finally:
-        await ws_connection_manager.disconnect_tablet()
\ No newline at end of file
+        await ws_connection_manager.disconnect_tablet(tablet)
+
+@router.websocket("/scanner")
+async def scanner_endpoint(ws: WebSocket):
+    try:
+        await ScannerChannel(ws, card_scan).serve()
+    except WebSocketDisconnect:
+        pass
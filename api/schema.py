@@ -1,7 +1,8 @@
 from __future__ import annotations
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional, List
+from enum import Enum
+from typing import Optional, List, Union
 from models import UserStatus, PurchaseStatus, ICCardStatus, PaymentStatus, AdminRole
 from beanie import PydanticObjectId
 
@@ -96,16 +97,37 @@ class SystemSettingOut(SystemSettingCreate):
     updated_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
+# Scans on this port identify a student for payback instead of charging a shelf
+ADMIN_PORT = 5
+
 class ScanRequest(BaseModel):
     idm: str = Field(..., min_length=4, max_length=64)
     usb_port: int = Field(ge=1, le=7)
     timestamp: Optional[datetime] = None
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=128)
 
     @property
     def normalized_uid(self) -> str:
         return self.idm.strip().lower()
+
+    @property
+    def scan_key(self) -> Optional[str]:
+        """Explicit idempotency key, or one derived from uid + usb_port + timestamp."""
+        if self.idempotency_key:
+            return self.idempotency_key
+        if self.timestamp:
+            return f"{self.normalized_uid}:{self.usb_port}:{self.timestamp.isoformat()}"
+        return None
     
 
+class ScanBatchRequest(BaseModel):
+    scans: List[ScanRequest] = Field(..., min_length=1, max_length=500)
+
+class ScanFrame(BaseModel):
+    """A scan sent over /ws/scanner; `id` is echoed back on the response frame."""
+    id: Union[str, int]
+    scan: ScanRequest
+
 class CardRegistrationRequest(BaseModel): 
     student_id: int
 
@@ -117,17 +139,84 @@ class AdminSession(BaseModel):
     admin_id: PydanticObjectId
     admin_name: str
 
+class UserSyncOut(UserOut):
+    id: PydanticObjectId
+
+class UserChangesOut(BaseModel):
+    users: List[UserSyncOut]
+    deleted: List[PydanticObjectId]
+    token: str
+    full: bool
+
+class ICCardChangesOut(BaseModel):
+    cards: List[ICCardOut]
+    deleted: List[PydanticObjectId]
+    token: str
+    full: bool
+
+class ActivityKind(str, Enum):
+    purchase = "purchase"
+    payment = "payment"
+    admin_log = "admin_log"
+
+class ActivityItemOut(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    kind: ActivityKind
+    created_at: datetime
+    student_id: Optional[int] = None
+    amount: Optional[int] = None
+    shelf_id: Optional[str] = None
+    admin_name: Optional[str] = None
+    action: Optional[str] = None
+    model_config = ConfigDict(populate_by_name=True)
+
+class ActivityOut(BaseModel):
+    activity: List[ActivityItemOut]
+    next_cursor: Optional[str] = None
+
+class LedgerEntryOut(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    kind: ActivityKind
+    created_at: datetime
+    amount: int
+    balance: int
+    shelf_id: Optional[str] = None
+    model_config = ConfigDict(populate_by_name=True)
+
+class LedgerOut(BaseModel):
+    student_id: int
+    account_balance: int
+    entries: List[LedgerEntryOut]
+    next_cursor: Optional[str] = None
+
+class UserSort(str, Enum):
+    newest = "-created_at"
+    oldest = "created_at"
+    balance = "account_balance"
+    balance_desc = "-account_balance"
+
+    @property
+    def field(self) -> str:
+        return self.value.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.value.startswith("-")
+
 class UsersOut(BaseModel):
     users: List[UserOut]
+    next_cursor: Optional[str] = None
 
 class AdminsOut(BaseModel):
     admins: List[AdminOut]
 
 class PurchasesOut(BaseModel):
     purchases: List[PurchaseOut]
+    next_cursor: Optional[str] = None
 
 class PaymentsOut(BaseModel):
     payments: List[PaymentOut]
+    next_cursor: Optional[str] = None
 
 class ICCardsOut(BaseModel):
     iccards: List[ICCardOut]
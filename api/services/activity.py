@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from models import AdminLog, Payment, Purchase
+from schema import ActivityKind
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+
+NEWEST_FIRST = {"created_at": -1, "_id": -1}
+
+# Fields of each source mapped onto the feed's item shape
+PROJECTIONS: Dict[ActivityKind, dict] = {
+    ActivityKind.purchase: {
+        "kind": {"$literal": ActivityKind.purchase.value},
+        "created_at": 1,
+        "student_id": 1,
+        "amount": "$price",
+        "shelf_id": 1,
+    },
+    ActivityKind.payment: {
+        "kind": {"$literal": ActivityKind.payment.value},
+        "created_at": 1,
+        "student_id": 1,
+        "amount": "$amount_paid",
+    },
+    ActivityKind.admin_log: {
+        "kind": {"$literal": ActivityKind.admin_log.value},
+        "created_at": 1,
+        "student_id": "$targeted_student_id",
+        "admin_name": 1,
+        "action": 1,
+    },
+}
+
+
+def _branch(kind: ActivityKind, limit: int, match: dict) -> List[dict]:
+    # Sorted and cut per source first, so each one walks its (created_at, _id) index
+    return [
+        {"$match": match},
+        {"$sort": NEWEST_FIRST},
+        {"$limit": limit},
+        {"$project": PROJECTIONS[kind]},
+    ]
+
+
+def activity_pipeline(
+    limit: int,
+    after: Optional[Tuple[Any, Any]] = None,
+    student_id: Optional[int] = None,
+    include_admin_logs: bool = False,
+) -> List[dict]:
+    """
+    Aggregation on the purchase collection that returns up to `limit` feed
+    items newest first, starting strictly after the (created_at, _id) `after`.
+    """
+    match: Dict[str, Any] = {}
+    if after is not None:
+        created_at, id = after
+        match["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": id}},
+        ]
+    log_match = dict(match)
+    if student_id is not None:
+        match["student_id"] = student_id
+        log_match["targeted_student_id"] = student_id
+
+    pipeline = _branch(ActivityKind.purchase, limit, match)
+    pipeline.append({"$unionWith": {
+        "coll": Payment.get_settings().name,
+        "pipeline": _branch(ActivityKind.payment, limit, match),
+    }})
+    if include_admin_logs:
+        pipeline.append({"$unionWith": {
+            "coll": AdminLog.get_settings().name,
+            "pipeline": _branch(ActivityKind.admin_log, limit, log_match),
+        }})
+    pipeline += [{"$sort": NEWEST_FIRST}, {"$limit": limit}]
+    return pipeline
+
+
+async def activity_page(
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    student_id: Optional[int] = None,
+    include_admin_logs: bool = False,
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of the merged purchase / payment (/ admin log) feed and the cursor of the next one."""
+    after = None
+    if cursor:
+        field, created_at, id = decode_cursor(cursor)
+        if field != "created_at":
+            raise HTTPException(400, "Cursor does not belong to the activity feed")
+        after = (created_at, id)
+
+    pipeline = activity_pipeline(limit + 1, after, student_id, include_admin_logs)
+    items = await Purchase.get_pymongo_collection().aggregate(pipeline).to_list(None)
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor("created_at", last["created_at"], last["_id"])
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from beanie import init_beanie
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from pytest_mock import MockerFixture
+
+from models import AdminLog, Payment, Purchase
+from schema import ActivityItemOut, ActivityKind
+from services.activity import activity_page, activity_pipeline
+from services.pagination import encode_cursor
+
+
+class TestActivityPipeline:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[Purchase, Payment, AdminLog]) # type: ignore
+
+    @pytest.mark.asyncio
+    async def test_merges_sources_newest_first(self):
+        pipeline = activity_pipeline(11)
+
+        assert pipeline[:3] == [{"$match": {}}, {"$sort": {"created_at": -1, "_id": -1}}, {"$limit": 11}]
+        union = pipeline[4]["$unionWith"]
+        assert union["coll"] == "payment"
+        assert union["pipeline"][3]["$project"]["amount"] == "$amount_paid"
+        assert pipeline[-2:] == [{"$sort": {"created_at": -1, "_id": -1}}, {"$limit": 11}]
+        assert not any(stage.get("$unionWith", {}).get("coll") == "admin_log" for stage in pipeline)
+
+    @pytest.mark.asyncio
+    async def test_admin_logs_filtered_by_targeted_student(self):
+        at, id = datetime(2026, 1, 1, tzinfo=timezone.utc), ObjectId()
+        pipeline = activity_pipeline(11, after=(at, id), student_id=7, include_admin_logs=True)
+
+        keyset = [{"created_at": {"$lt": at}}, {"created_at": at, "_id": {"$lt": id}}]
+        assert pipeline[0]["$match"] == {"$or": keyset, "student_id": 7}
+        logs = pipeline[5]["$unionWith"]
+        assert logs["coll"] == "admin_log"
+        assert logs["pipeline"][0]["$match"] == {"$or": keyset, "targeted_student_id": 7}
+
+
+@pytest.mark.asyncio
+class TestActivityPage:
+
+    def items(self, n: int) -> list:
+        now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        return [
+            {"_id": ObjectId(), "kind": "purchase", "created_at": now - timedelta(minutes=i), "student_id": 1, "amount": 100}
+            for i in range(n)
+        ]
+
+    def mock_aggregate(self, mocker: MockerFixture, items: list):
+        collection = mocker.Mock()
+        collection.aggregate.return_value.to_list = mocker.AsyncMock(return_value=items)
+        mocker.patch.object(Purchase, "get_pymongo_collection", return_value=collection)
+        return collection
+
+    async def test_next_cursor_points_at_last_item(self, mocker: MockerFixture):
+        items = self.items(3)
+        collection = self.mock_aggregate(mocker, items)
+
+        page, next_cursor = await activity_page(limit=2)
+
+        assert page == items[:2]
+        assert next_cursor == encode_cursor("created_at", items[1]["created_at"], items[1]["_id"])
+        # One extra item is fetched to know whether there is a next page
+        assert collection.aggregate.call_args[0][0][-1] == {"$limit": 3}
+        assert ActivityItemOut.model_validate(page[0]).kind == ActivityKind.purchase
+
+    async def test_last_page(self, mocker: MockerFixture):
+        self.mock_aggregate(mocker, self.items(2))
+        page, next_cursor = await activity_page(limit=2)
+        assert len(page) == 2
+        assert next_cursor is None
+
+    async def test_rejects_cursor_of_another_sort(self):
+        with pytest.raises(HTTPException) as e:
+            await activity_page(cursor=encode_cursor("account_balance", 100, ObjectId()))
+        assert e.value.status_code == 400
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import secrets
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional, Set
+
+from bson import json_util
+
+from models import ICCard, ICCardStatus, Payment, Purchase, SystemSetting, User
+from services.change_stream import watch_events
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_REPLAY_SIZE = 256
+KEEPALIVE_SECONDS = 15.0
+
+
+class AdminEventType(str, Enum):
+    card_captured = "card_captured"
+    card_changed = "card_changed"
+    purchase = "purchase"
+    payment = "payment"
+    user_created = "user_created"
+    user_status = "user_status"
+    setting_changed = "setting_changed"
+    # Events were lost for this subscriber: reload everything
+    resync = "resync"
+
+
+class AdminEvent(NamedTuple):
+    id: str
+    type: AdminEventType
+    data: dict
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type.value}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, max_size: int):
+        self.queue: "asyncio.Queue[AdminEvent]" = asyncio.Queue(max_size)
+
+    def push(self, event: AdminEvent):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and have it reload instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(AdminEvent(event.id, AdminEventType.resync, {}))
+
+    async def next(self, timeout: float) -> Optional[AdminEvent]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _document(event: dict) -> dict:
+    # Extended JSON turns ObjectIds and datetimes into plain JSON values
+    return json.loads(json_util.dumps(event.get("fullDocument") or {}, json_options=json_util.RELAXED_JSON_OPTIONS))
+
+
+def card_events(event: dict) -> List[tuple]:
+    card = _document(event)
+    if not card:
+        return []
+    updated = event.get("updateDescription", {}).get("updatedFields", {})
+    # An unlinked card inserted or touched by a port 5 scan; unlinking also
+    # leaves the card unlinked and active, but changes student_id
+    if card.get("student_id") is None and card.get("status") == ICCardStatus.active.value and "student_id" not in updated:
+        return [(AdminEventType.card_captured, {"uid": card["uid"]})]
+    return [(AdminEventType.card_changed, {"uid": card["uid"], "student_id": card.get("student_id"), "status": card.get("status")})]
+
+
+def purchase_events(event: dict) -> List[tuple]:
+    purchase = _document(event)
+    return [(AdminEventType.purchase, {
+        "student_id": purchase["student_id"],
+        "shelf_id": purchase["shelf_id"],
+        "price": purchase["price"],
+        "created_at": purchase["created_at"],
+    })]
+
+
+def payment_events(event: dict) -> List[tuple]:
+    payment = _document(event)
+    return [(AdminEventType.payment, {
+        "student_id": payment["student_id"],
+        "amount_paid": payment["amount_paid"],
+        "created_at": payment["created_at"],
+    })]
+
+
+def user_events(event: dict) -> List[tuple]:
+    user = _document(event)
+    if not user:
+        return []
+    if event["operationType"] == "insert":
+        return [(AdminEventType.user_created, {"student_id": user["student_id"]})]
+    return [(AdminEventType.user_status, {"student_id": user["student_id"], "status": user["status"]})]
+
+
+def setting_events(event: dict) -> List[tuple]:
+    setting = _document(event)
+    if not setting:
+        return []
+    return [(AdminEventType.setting_changed, {"key": setting["key"], "value": setting["value"]})]
+
+
+# (model, change stream pipeline, event mapper)
+SOURCES = [
+    (ICCard, [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}], card_events),
+    (Purchase, [{"$match": {"operationType": "insert"}}], purchase_events),
+    (Payment, [{"$match": {"operationType": "insert"}}], payment_events),
+    (User, [{"$match": {"$or": [
+        {"operationType": "insert"},
+        # Balance changes are covered by purchase and payment events
+        {"updateDescription.updatedFields.status": {"$exists": True}},
+    ]}}], user_events),
+    (SystemSetting, [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}], setting_events),
+]
+
+
+class AdminEventHub:
+    """
+    Fan-out of dashboard events to the open /admin/events streams.
+
+    Events come from change stream watchers, so writes made by any worker are
+    seen. Every subscriber has a bounded queue; one that falls behind gets a
+    `resync` event instead of an ever growing backlog. The last events are
+    kept so a reconnecting client can pass Last-Event-ID and miss nothing.
+    The stream is only offered while all watchers are open (`live`).
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, replay_size: int = DEFAULT_REPLAY_SIZE):
+        self.queue_size = queue_size
+        self.__epoch = secrets.token_hex(4)
+        self.__sequence = 0
+        self.__recent: Deque[AdminEvent] = deque(maxlen=replay_size)
+        self.__subscriptions: Set[Subscription] = set()
+        self.__open: Set[type] = set()
+        self.__seen: Set[type] = set()
+
+    @property
+    def live(self) -> bool:
+        return len(self.__open) == len(SOURCES)
+
+    def subscriber_count(self) -> int:
+        return len(self.__subscriptions)
+
+    def publish(self, type: AdminEventType, data: Dict[str, Any]) -> AdminEvent:
+        self.__sequence += 1
+        event = AdminEvent(f"{self.__epoch}-{self.__sequence}", type, data)
+        self.__recent.append(event)
+        for subscription in self.__subscriptions:
+            subscription.push(event)
+        return event
+
+    @contextmanager
+    def subscribe(self, last_event_id: Optional[str] = None) -> Iterator[Subscription]:
+        subscription = Subscription(self.queue_size)
+        if last_event_id:
+            for event in self.__missed_since(last_event_id):
+                subscription.push(event)
+        self.__subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self.__subscriptions.discard(subscription)
+
+    def __missed_since(self, last_event_id: str) -> List[AdminEvent]:
+        recent = list(self.__recent)
+        for index, event in enumerate(recent):
+            if event.id == last_event_id:
+                return recent[index + 1:]
+        # From another process, or too old to replay
+        return [AdminEvent(last_event_id, AdminEventType.resync, {})]
+
+    async def watch(self):
+        await asyncio.gather(*(self.__watch(*source) for source in SOURCES))
+
+    async def __watch(self, model, pipeline, to_events):
+        async def on_event(event: dict):
+            for type, data in to_events(event):
+                self.publish(type, data)
+
+        def on_open(resumed: bool):
+            if not resumed and model in self.__seen:
+                # Reopened without resuming: changes in between are unknown
+                self.publish(AdminEventType.resync, {})
+            self.__seen.add(model)
+            self.__open.add(model)
+
+        def on_close():
+            self.__open.discard(model)
+
+        await watch_events(model, on_event, pipeline, full_document="updateLookup", on_open=on_open, on_close=on_close)
+
+
+    async def stream(self, last_event_id: Optional[str] = None, keepalive: float = KEEPALIVE_SECONDS):
+        """Server-Sent Events body for one subscriber, with comment lines to keep idle proxies from closing it."""
+        with self.subscribe(last_event_id) as subscription:
+            # How long EventSource waits before reconnecting
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.next(keepalive)
+                yield event.to_sse() if event else ": keep-alive\n\n"
+
+
+admin_events = AdminEventHub()
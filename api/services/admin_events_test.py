@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from pytest_mock import MockerFixture
+
+from services import admin_events as module
+from services.admin_events import AdminEventHub, AdminEventType, card_events, purchase_events, user_events
+
+
+@pytest.mark.asyncio
+class TestAdminEventHub:
+
+    async def test_fans_out_to_subscribers(self):
+        hub = AdminEventHub()
+        with hub.subscribe() as first, hub.subscribe() as second:
+            event = hub.publish(AdminEventType.payment, {"student_id": 1, "amount_paid": 100})
+            assert await first.next(0.1) == event
+            assert await second.next(0.1) == event
+        assert hub.subscriber_count() == 0
+
+    async def test_slow_subscriber_gets_resync(self):
+        hub = AdminEventHub(queue_size=2)
+        with hub.subscribe() as subscription:
+            for i in range(3):
+                hub.publish(AdminEventType.purchase, {"n": i})
+            event = await subscription.next(0.1)
+            assert event.type == AdminEventType.resync # type: ignore
+            assert await subscription.next(0.01) is None
+
+    async def test_replays_after_last_event_id(self):
+        hub = AdminEventHub()
+        first = hub.publish(AdminEventType.user_created, {"student_id": 1})
+        second = hub.publish(AdminEventType.user_created, {"student_id": 2})
+
+        with hub.subscribe(first.id) as subscription:
+            assert await subscription.next(0.1) == second
+        with hub.subscribe("other-process-7") as subscription:
+            assert (await subscription.next(0.1)).type == AdminEventType.resync # type: ignore
+
+    async def test_stream_format(self):
+        hub = AdminEventHub()
+        stream = hub.stream(keepalive=0.01)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        assert await stream.__anext__() == ": keep-alive\n\n"
+        event = hub.publish(AdminEventType.setting_changed, {"key": "max_debt_limit", "value": "5000"})
+        assert await stream.__anext__() == (
+            f"id: {event.id}\nevent: setting_changed\n"
+            'data: {"key": "max_debt_limit", "value": "5000"}\n\n'
+        )
+        await stream.aclose()
+        assert hub.subscriber_count() == 0
+
+    async def test_live_only_while_all_streams_are_open(self, mocker: MockerFixture):
+        hub = AdminEventHub()
+        opened = asyncio.Event()
+        reopen = asyncio.Event()
+        calls = []
+
+        async def fake_watch_events(model, on_event, pipeline, full_document, on_open, on_close):
+            on_open(False)
+            calls.append(model)
+            if len(calls) == len(module.SOURCES):
+                opened.set()
+            if model is module.Payment:
+                await reopen.wait()
+                on_close()
+                on_open(False)
+
+        mocker.patch.object(module, "watch_events", side_effect=fake_watch_events)
+        with hub.subscribe() as subscription:
+            task = asyncio.create_task(hub.watch())
+            await opened.wait()
+            assert hub.live
+            reopen.set()
+            await task
+            # Reopened without resuming, so the dashboard must reload
+            assert (await subscription.next(0.1)).type == AdminEventType.resync # type: ignore
+
+
+class TestEventMapping:
+
+    def test_port_5_capture(self):
+        event = {
+            "operationType": "update",
+            "updateDescription": {"updatedFields": {"updated_at": datetime.now(timezone.utc)}},
+            "fullDocument": {"_id": ObjectId(), "uid": "abc", "student_id": None, "status": "active"},
+        }
+        assert card_events(event) == [(AdminEventType.card_captured, {"uid": "abc"})]
+
+    def test_unlink_is_not_a_capture(self):
+        event = {
+            "operationType": "update",
+            "updateDescription": {"updatedFields": {"student_id": None}},
+            "fullDocument": {"_id": ObjectId(), "uid": "abc", "student_id": None, "status": "active"},
+        }
+        assert card_events(event) == [(AdminEventType.card_changed, {"uid": "abc", "student_id": None, "status": "active"})]
+
+    def test_deleted_before_lookup(self):
+        assert card_events({"operationType": "update", "fullDocument": None}) == []
+
+    def test_purchase_dates_are_json(self):
+        created_at = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        event = {"operationType": "insert", "fullDocument": {
+            "_id": ObjectId(), "student_id": 1, "shelf_id": "s1", "price": 100, "created_at": created_at,
+        }}
+        [(type, data)] = purchase_events(event)
+        assert type == AdminEventType.purchase
+        assert data == {"student_id": 1, "shelf_id": "s1", "price": 100, "created_at": {"$date": "2026-01-02T03:04:05Z"}}
+
+    def test_user_status(self):
+        event = {"operationType": "update", "fullDocument": {"_id": ObjectId(), "student_id": 7, "status": "inactive"}}
+        assert user_events(event) == [(AdminEventType.user_status, {"student_id": 7, "status": "inactive"})]
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from enum import Enum
+from typing import Callable, List, Optional
+from uuid import uuid4
+
+from pymongo import UpdateOne
+
+from models import TABLET_PRESENCE_TTL_SECONDS, TabletMessage, TabletPresence, utcnow
+from services.change_stream import watch_events
+
+logger = logging.getLogger(__name__)
+
+BACKPLANE_ENV = "TABLET_BACKPLANE"
+PRESENCE_REFRESH_SECONDS = TABLET_PRESENCE_TTL_SECONDS / 3
+
+# Queue `message` for this worker's tablet at `station` (every tablet if None); returns how many took it
+Deliver = Callable[[dict, Optional[str]], int]
+LocalStations = Callable[[], List[str]]
+
+
+class BackplaneKind(str, Enum):
+    # Single worker: payloads go straight to the local tablets
+    inprocess = "inprocess"
+    # Several workers: payloads are relayed through a change stream on tablet_message
+    mongo = "mongo"
+
+
+class Backplane(ABC):
+    """
+    Carries tablet payloads to whichever API worker holds the tablet.
+
+    The ConnectionManager attaches its local delivery and station list; the
+    backplane decides which stations exist across workers and how a payload
+    reaches them.
+    """
+
+    def __init__(self):
+        self._deliver: Deliver = lambda message, station: 0
+        self._local_stations: LocalStations = lambda: []
+
+    def attach(self, deliver: Deliver, local_stations: LocalStations):
+        self._deliver = deliver
+        self._local_stations = local_stations
+
+    async def run(self):
+        """Receive payloads published by other workers until cancelled."""
+
+    async def joined(self, station: str):
+        """A tablet connected to this worker under `station`."""
+
+    async def left(self, station: str):
+        """The last tablet of `station` on this worker disconnected."""
+
+    @abstractmethod
+    async def stations(self) -> List[str]:
+        """Stations with a tablet connected to any worker."""
+
+    @abstractmethod
+    async def publish(self, message: dict, station: Optional[str] = None) -> int:
+        """Deliver `message` to `station`, or to every tablet; returns how many stations it was sent to."""
+
+
+class InProcessBackplane(Backplane):
+    async def stations(self) -> List[str]:
+        return self._local_stations()
+
+    async def publish(self, message: dict, station: Optional[str] = None) -> int:
+        return self._deliver(message, station)
+
+
+class MongoBackplane(Backplane):
+    """
+    Relays payloads through the `tablet_message` collection.
+
+    Every worker watches its inserts and delivers the ones published elsewhere
+    to its own tablets; payloads for local tablets skip the round trip. Each
+    worker advertises its stations in `tablet_presence`, refreshed every
+    `refresh_interval` seconds, so any worker can tell whether a station is
+    connected anywhere. A worker whose change stream is down stops refreshing
+    and its stations expire, since payloads could not reach them.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, refresh_interval: float = PRESENCE_REFRESH_SECONDS):
+        super().__init__()
+        self.worker_id = worker_id or uuid4().hex
+        self.refresh_interval = refresh_interval
+        self.__open = False
+
+    @property
+    def live(self) -> bool:
+        return self.__open
+
+    async def run(self):
+        refresher = asyncio.create_task(self.__refresh_presence())
+        try:
+            await watch_events(
+                TabletMessage,
+                self.receive,
+                pipeline=[{"$match": {"operationType": "insert"}}],
+                on_open=self.__on_open,
+                on_close=self.__on_close,
+            )
+        finally:
+            refresher.cancel()
+            self.__open = False
+            await TabletPresence.get_pymongo_collection().delete_many({"worker_id": self.worker_id})
+
+    async def receive(self, event: dict):
+        document = event["fullDocument"]
+        if document.get("origin") == self.worker_id:
+            return
+        self._deliver(document["payload"], document.get("station"))
+
+    async def joined(self, station: str):
+        if self.__open:
+            await self.__advertise([station])
+
+    async def left(self, station: str):
+        if station not in self._local_stations():
+            await TabletPresence.get_pymongo_collection().delete_one({"station": station, "worker_id": self.worker_id})
+
+    async def stations(self) -> List[str]:
+        cutoff = utcnow() - timedelta(seconds=TABLET_PRESENCE_TTL_SECONDS)
+        remote = await TabletPresence.get_pymongo_collection().distinct(
+            "station", {"worker_id": {"$ne": self.worker_id}, "seen_at": {"$gte": cutoff}}
+        )
+        return sorted(set(remote) | set(self._local_stations()))
+
+    async def publish(self, message: dict, station: Optional[str] = None) -> int:
+        local = self._local_stations()
+        remote = [s for s in await self.stations() if s not in local]
+        if station is not None:
+            remote = [s for s in remote if s == station]
+        sent = self._deliver(message, station) if station is None or station in local else 0
+        if remote:
+            await TabletMessage(station=station, payload=message, origin=self.worker_id).insert()
+        return sent + len(remote)
+
+    def __on_open(self, resumed: bool):
+        self.__open = True
+
+    def __on_close(self):
+        self.__open = False
+
+    async def __advertise(self, stations: List[str]):
+        if not stations:
+            return
+        now = utcnow()
+        await TabletPresence.get_pymongo_collection().bulk_write([
+            UpdateOne({"station": station, "worker_id": self.worker_id}, {"$set": {"seen_at": now}}, upsert=True)
+            for station in stations
+        ])
+
+    async def __refresh_presence(self):
+        while True:
+            try:
+                if self.__open:
+                    local = self._local_stations()
+                    await self.__advertise(local)
+                    await TabletPresence.get_pymongo_collection().delete_many(
+                        {"worker_id": self.worker_id, "station": {"$nin": local}}
+                    )
+            except Exception as e:
+                logger.warning(f"Refreshing tablet presence failed: {e!r}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+def backplane_from_env() -> Backplane:
+    if BackplaneKind(os.getenv(BACKPLANE_ENV, BackplaneKind.inprocess.value)) == BackplaneKind.mongo:
+        return MongoBackplane()
+    return InProcessBackplane()
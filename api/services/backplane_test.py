@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+from pytest_mock import MockerFixture
+from pymongo.errors import OperationFailure
+
+from models import TABLET_PRESENCE_TTL_SECONDS, TabletMessage, TabletPresence, utcnow
+from services.backplane import BACKPLANE_ENV, InProcessBackplane, MongoBackplane, backplane_from_env
+
+
+@pytest.mark.asyncio
+class TestMongoBackplane:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self, mocker: MockerFixture):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[TabletMessage, TabletPresence]) # type: ignore
+        self.local = ["a"]
+        self.deliver = mocker.Mock(return_value=1)
+        self.backplane = MongoBackplane(worker_id="worker-1")
+        self.backplane.attach(self.deliver, lambda: list(self.local))
+
+    async def test_stations_merge_other_workers(self):
+        await TabletPresence(station="b", worker_id="worker-2").insert()
+        # Expired, and this worker's own (stale) entry
+        await TabletPresence(station="c", worker_id="worker-2", seen_at=utcnow() - timedelta(seconds=TABLET_PRESENCE_TTL_SECONDS + 1)).insert()
+        await TabletPresence(station="d", worker_id="worker-1").insert()
+
+        assert await self.backplane.stations() == ["a", "b"]
+
+    async def test_publish_to_local_station_skips_the_collection(self):
+        assert await self.backplane.publish({"action": "PAY_BACK"}, "a") == 1
+
+        self.deliver.assert_called_once_with({"action": "PAY_BACK"}, "a")
+        assert await TabletMessage.count() == 0
+
+    async def test_publish_to_remote_station(self):
+        await TabletPresence(station="b", worker_id="worker-2").insert()
+
+        assert await self.backplane.publish({"action": "PAY_BACK"}, "b") == 1
+
+        self.deliver.assert_not_called()
+        message = await TabletMessage.find_one()
+        assert message is not None
+        assert (message.station, message.payload, message.origin) == ("b", {"action": "PAY_BACK"}, "worker-1")
+
+    async def test_broadcast_reaches_local_and_remote(self):
+        await TabletPresence(station="b", worker_id="worker-2").insert()
+
+        assert await self.backplane.publish({"action": "ECHO"}) == 2
+
+        self.deliver.assert_called_once_with({"action": "ECHO"}, None)
+        assert await TabletMessage.count() == 1
+
+    async def test_receive_skips_own_messages(self):
+        await self.backplane.receive({"fullDocument": {"station": "a", "payload": {"action": "X"}, "origin": "worker-1"}})
+        self.deliver.assert_not_called()
+
+        await self.backplane.receive({"fullDocument": {"station": "a", "payload": {"action": "X"}, "origin": "worker-2"}})
+        self.deliver.assert_called_once_with({"action": "X"}, "a")
+
+    async def test_left_and_shutdown_clear_presence(self, mocker: MockerFixture):
+        await TabletPresence(station="a", worker_id="worker-1").insert()
+        await TabletPresence(station="e", worker_id="worker-1").insert()
+        await TabletPresence(station="b", worker_id="worker-2").insert()
+
+        # Still connected locally (a newer connection took over)
+        await self.backplane.left("a")
+        assert await TabletPresence.find(TabletPresence.worker_id == "worker-1").count() == 2
+        await self.backplane.left("e")
+        assert await TabletPresence.find(TabletPresence.worker_id == "worker-1").count() == 1
+
+        # Standalone server: the watcher stops and the worker withdraws its stations
+        collection = mocker.Mock()
+        collection.name = "tablet_message"
+        collection.watch.side_effect = OperationFailure("The $changeStream stage is only supported on replica sets")
+        mocker.patch.object(TabletMessage, "get_pymongo_collection", return_value=collection)
+        await self.backplane.run()
+
+        assert not self.backplane.live
+        assert [p.worker_id for p in await TabletPresence.find_all().to_list()] == ["worker-2"]
+
+
+def test_backplane_from_env(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(BACKPLANE_ENV, raising=False)
+    assert isinstance(backplane_from_env(), InProcessBackplane)
+    monkeypatch.setenv(BACKPLANE_ENV, "mongo")
+    assert isinstance(backplane_from_env(), MongoBackplane)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from models import User
+from services.change_stream import watch_events
+from services.ws import ConnectionManager, WSSchema, ws_connection_manager
+
+logger = logging.getLogger(__name__)
+
+BALANCE_UPDATED = "BALANCE_UPDATED"
+USERS_RESYNC = "USERS_RESYNC"
+COALESCE_WINDOW_SECONDS = 0.25
+
+# Fields the tablet roster can patch in place; other user changes make it reload
+PATCHABLE_FIELDS = {"account_balance", "status", "updated_at"}
+
+USER_ROSTER_CHANGES = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.account_balance": {"$exists": True}},
+        {"updateDescription.updatedFields.status": {"$exists": True}},
+        {"updateDescription.updatedFields.first_name": {"$exists": True}},
+        {"updateDescription.updatedFields.last_name": {"$exists": True}},
+    ]}},
+]
+
+
+class BalanceUpdates:
+    """
+    Pushes user balance and status changes to the tablets as BALANCE_UPDATED.
+
+    Changes are collected for `window` seconds and each student is sent once
+    per window with their latest balance, so a burst of scans is one frame.
+    Every worker watches the user collection, so each one only delivers to its
+    own tablets. Changes the tablet cannot patch (new, deleted or renamed
+    users, or events missed while the stream was down) send USERS_RESYNC
+    instead, and the tablet reloads its list.
+    """
+
+    def __init__(self, manager: ConnectionManager = ws_connection_manager, window: float = COALESCE_WINDOW_SECONDS):
+        self.manager = manager
+        self.window = window
+        self.__pending: Dict[int, WSSchema] = {}
+        self.__resync = False
+        self.__flush: Optional[asyncio.Task] = None
+        self.__seen = False
+
+    async def on_event(self, event: dict):
+        document = event.get("fullDocument")
+        updated = event.get("updateDescription", {}).get("updatedFields", {})
+        if event["operationType"] == "update" and set(updated) <= PATCHABLE_FIELDS:
+            if document is None:
+                # Deleted since; the delete event follows
+                return
+            self.__pending[document["student_id"]] = WSSchema(
+                action=BALANCE_UPDATED,
+                student_id=str(document["student_id"]),
+                balance=document["account_balance"],
+                status=document["status"],
+            )
+        else:
+            self.__resync = True
+        self.__schedule()
+
+    def on_open(self, resumed: bool):
+        if not resumed and self.__seen:
+            self.__resync = True
+            self.__schedule()
+        self.__seen = True
+
+    async def watch(self):
+        await watch_events(User, self.on_event, USER_ROSTER_CHANGES, full_document="updateLookup", on_open=self.on_open)
+
+    def __schedule(self):
+        if self.__flush is None or self.__flush.done():
+            self.__flush = asyncio.create_task(self.__flush_later())
+
+    async def __flush_later(self):
+        await asyncio.sleep(self.window)
+        pending, self.__pending = self.__pending, {}
+        resync, self.__resync = self.__resync, False
+        # A reload picks up every pending balance as well
+        payloads = [WSSchema(action=USERS_RESYNC)] if resync else list(pending.values())
+        for payload in payloads:
+            self.manager.deliver(payload.model_dump(exclude_none=True))
+
+
+balance_updates = BalanceUpdates()
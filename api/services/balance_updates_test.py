@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from services.balance_updates import BalanceUpdates
+
+
+def balance_event(student_id: int, balance: int, status: str = "active", fields=("account_balance", "updated_at")):
+    return {
+        "operationType": "update",
+        "updateDescription": {"updatedFields": {field: None for field in fields}},
+        "fullDocument": {"student_id": student_id, "account_balance": balance, "status": status},
+    }
+
+
+@pytest.mark.asyncio
+class TestBalanceUpdates:
+    @pytest.fixture(autouse=True)
+    def test_setup(self, mocker: MockerFixture):
+        self.manager = mocker.Mock()
+        self.updates = BalanceUpdates(self.manager, window=0.01)
+
+    def delivered(self):
+        return [call.args[0] for call in self.manager.deliver.call_args_list]
+
+    async def test_burst_is_coalesced_per_student(self):
+        await self.updates.on_event(balance_event(1, 100))
+        await self.updates.on_event(balance_event(2, 50))
+        await self.updates.on_event(balance_event(1, 250))
+        await asyncio.sleep(0.05)
+
+        assert self.delivered() == [
+            {"action": "BALANCE_UPDATED", "student_id": "1", "balance": 250, "status": "active"},
+            {"action": "BALANCE_UPDATED", "student_id": "2", "balance": 50, "status": "active"},
+        ]
+
+        await self.updates.on_event(balance_event(1, 0, "inactive", fields=("status",)))
+        await asyncio.sleep(0.05)
+        assert self.delivered()[-1] == {"action": "BALANCE_UPDATED", "student_id": "1", "balance": 0, "status": "inactive"}
+
+    async def test_roster_change_sends_one_resync(self):
+        await self.updates.on_event(balance_event(1, 100))
+        await self.updates.on_event({"operationType": "insert", "fullDocument": {"student_id": 3}})
+        await self.updates.on_event(balance_event(2, 10, fields=("first_name",)))
+        await asyncio.sleep(0.05)
+
+        assert self.delivered() == [{"action": "USERS_RESYNC"}]
+
+    async def test_deleted_user_update_is_skipped(self):
+        event = balance_event(1, 100)
+        event["fullDocument"] = None
+        await self.updates.on_event(event)
+        await asyncio.sleep(0.05)
+
+        self.manager.deliver.assert_not_called()
+
+    async def test_fresh_reopen_resyncs(self):
+        self.updates.on_open(False)
+        self.updates.on_open(True)
+        await asyncio.sleep(0.05)
+        self.manager.deliver.assert_not_called()
+
+        self.updates.on_open(False)
+        await asyncio.sleep(0.05)
+        assert self.delivered() == [{"action": "USERS_RESYNC"}]
@@ -0,0 +1,153 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Set
+
+from models import ICCard, ICCardStatus, User, UserStatus
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_NEGATIVE_TTL_SECONDS = 5.0
+
+
+class CardIdentity(NamedTuple):
+    card_status: ICCardStatus
+    student_id: Optional[int]
+    student_status: Optional[UserStatus]
+    first_name: Optional[str]
+
+
+class _Entry(NamedTuple):
+    identity: Optional[CardIdentity]
+    expires_at: float
+
+
+class CardIdentityCache:
+    """
+    Bounded LRU cache of normalized UID -> CardIdentity used on the scan path.
+
+    Unknown UIDs are cached as None for a short negative TTL so a wrong card
+    waved repeatedly does not hit the database. Routes that change cards or
+    student status invalidate the affected entries; the change stream watchers
+    cover writes made by other workers. Disabled until `enable()` is called,
+    in which case every lookup goes to the database.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.__clock = clock
+        self.__enabled = False
+        self.__entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.__uids_by_student: Dict[int, Set[str]] = {}
+        # Bumped on every invalidation so a lookup that raced with one is not stored
+        self.__generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def enable(self):
+        self.__enabled = True
+
+    def disable(self):
+        self.__enabled = False
+        self.clear()
+
+    async def resolve(self, uid: str) -> Optional[CardIdentity]:
+        now = self.__clock()
+        entry = self.__entries.get(uid)
+        if entry is not None and entry.expires_at > now:
+            self.__entries.move_to_end(uid)
+            if entry.identity is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry.identity
+
+        self.misses += 1
+        generation = self.__generation
+        identity = await self.__load(uid)
+        if self.__enabled and generation == self.__generation:
+            self.__store(uid, identity, now)
+        return identity
+
+    async def __load(self, uid: str) -> Optional[CardIdentity]:
+        card = await ICCard.find_one(ICCard.uid == uid)
+        if not card:
+            return None
+
+        student = None
+        if card.student_id is not None:
+            student = await User.find_one(User.student_id == card.student_id)
+
+        return CardIdentity(
+            card_status=card.status,
+            student_id=card.student_id,
+            student_status=student.status if student else None,
+            first_name=student.first_name if student else None,
+        )
+
+    def __store(self, uid: str, identity: Optional[CardIdentity], now: float):
+        self.__remove(uid)
+        ttl = self.ttl if identity is not None else self.negative_ttl
+        self.__entries[uid] = _Entry(identity=identity, expires_at=now + ttl)
+        if identity is not None and identity.student_id is not None:
+            self.__uids_by_student.setdefault(identity.student_id, set()).add(uid)
+
+        while len(self.__entries) > self.max_size:
+            oldest = next(iter(self.__entries))
+            self.__remove(oldest)
+            self.evictions += 1
+
+    def __remove(self, uid: str):
+        entry = self.__entries.pop(uid, None)
+        if entry is None or entry.identity is None or entry.identity.student_id is None:
+            return
+        uids = self.__uids_by_student.get(entry.identity.student_id)
+        if uids is not None:
+            uids.discard(uid)
+            if not uids:
+                del self.__uids_by_student[entry.identity.student_id]
+
+    def invalidate_uid(self, uid: str):
+        self.__generation += 1
+        self.__remove(uid.strip().lower())
+
+    def invalidate_student(self, student_id: int):
+        self.__generation += 1
+        for uid in list(self.__uids_by_student.get(student_id, ())):
+            self.__remove(uid)
+
+    def clear(self):
+        self.__generation += 1
+        self.__entries.clear()
+        self.__uids_by_student.clear()
+
+    async def refresh(self):
+        self.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "enabled": self.__enabled,
+            "size": len(self.__entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+card_identity_cache = CardIdentityCache(
+    max_size=int(os.getenv("CARD_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+)
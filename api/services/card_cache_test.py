@@ -0,0 +1,108 @@
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import ICCard, ICCardStatus, User, UserStatus
+from services.card_cache import CardIdentity, CardIdentityCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+class TestCardIdentityCache:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[User, ICCard]) # type: ignore
+        await User(student_id=1, first_name="Test", last_name="Student").insert()
+        await User(student_id=2, first_name="Other", last_name="Student").insert()
+        await ICCard(uid="carda", student_id=1).insert()
+        await ICCard(uid="cardb", student_id=2).insert()
+        await ICCard(uid="unlinked").insert()
+
+    def make_cache(self, **kwargs) -> CardIdentityCache:
+        cache = CardIdentityCache(**kwargs)
+        cache.enable()
+        return cache
+
+    async def test_resolve_and_hit(self, mocker: MockerFixture):
+        cache = self.make_cache()
+        identity = await cache.resolve("carda")
+        assert identity == CardIdentity(ICCardStatus.active, 1, UserStatus.active, "Test")
+
+        findone_mock = mocker.patch.object(ICCard, "find_one", new_callable=mocker.AsyncMock)
+        assert await cache.resolve("carda") == identity
+        findone_mock.assert_not_called()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_unlinked_card(self):
+        cache = self.make_cache()
+        identity = await cache.resolve("unlinked")
+        assert identity == CardIdentity(ICCardStatus.active, None, None, None)
+
+    async def test_negative_cache_expires(self):
+        clock = FakeClock()
+        cache = self.make_cache(negative_ttl=5.0, clock=clock)
+        assert await cache.resolve("unknown") is None
+        assert await cache.resolve("unknown") is None
+        assert cache.stats()["negative_hits"] == 1
+
+        await ICCard(uid="unknown", student_id=1).insert()
+        assert await cache.resolve("unknown") is None
+
+        clock.now = 6.0
+        identity = await cache.resolve("unknown")
+        assert identity is not None and identity.student_id == 1
+
+    async def test_lru_eviction(self):
+        cache = self.make_cache(max_size=2)
+        await cache.resolve("carda")
+        await cache.resolve("cardb")
+        await cache.resolve("carda")
+        await cache.resolve("unlinked")
+
+        stats = cache.stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+
+        # cardb was least recently used
+        await cache.resolve("carda")
+        await cache.resolve("cardb")
+        assert cache.stats()["hits"] == 2
+
+    async def test_invalidate_uid(self):
+        cache = self.make_cache()
+        await cache.resolve("carda")
+        await ICCard.find_one(ICCard.uid == "carda").set({ICCard.status: ICCardStatus.deactivated}) # type: ignore
+
+        cache.invalidate_uid(" CARDA ")
+        identity = await cache.resolve("carda")
+        assert identity is not None and identity.card_status == ICCardStatus.deactivated
+
+    async def test_invalidate_student(self):
+        cache = self.make_cache()
+        await cache.resolve("carda")
+        await cache.resolve("cardb")
+        await User.find_one(User.student_id == 1).set({User.status: UserStatus.inactive}) # type: ignore
+
+        cache.invalidate_student(1)
+        assert cache.stats()["size"] == 1
+        identity = await cache.resolve("carda")
+        assert identity is not None and identity.student_status == UserStatus.inactive
+
+    async def test_disabled_cache_does_not_store(self):
+        cache = CardIdentityCache()
+        await cache.resolve("carda")
+        await cache.resolve("carda")
+        assert cache.stats()["size"] == 0
+        assert cache.stats()["misses"] == 2
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+
+class CapturedCard(NamedTuple):
+    uid: str
+    captured_at: datetime
+
+
+def as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes; scans and query strings may carry an offset
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class CardCaptureNotifier:
+    """
+    Wakes the long-polling GET /ic_cards/captured requests when an unlinked
+    card is scanned on the admin port.
+
+    Only scans handled by this process are seen; the route falls back to one
+    database query when the wait times out, so a capture handled by another
+    worker is reported at the end of the wait instead of being lost.
+    """
+
+    def __init__(self):
+        self.__latest: Optional[CapturedCard] = None
+        self.__captured = asyncio.Event()
+
+    def notify(self, uid: str, captured_at: datetime):
+        captured_at = as_utc(captured_at)
+        # Millisecond precision, like the updated_at the database returns for the same capture
+        captured_at = captured_at.replace(microsecond=captured_at.microsecond // 1000 * 1000)
+        self.__latest = CapturedCard(uid, captured_at)
+        # Wake every waiter, then start a fresh event for the next capture
+        captured, self.__captured = self.__captured, asyncio.Event()
+        captured.set()
+
+    def latest(self, after: Optional[datetime] = None) -> Optional[CapturedCard]:
+        if self.__latest and (after is None or self.__latest.captured_at > as_utc(after)):
+            return self.__latest
+        return None
+
+    async def wait(self, after: Optional[datetime], timeout: float) -> Optional[CapturedCard]:
+        """The first card captured after `after`, or None if there is none within `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (card := self.latest(after)) is None:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self.__captured.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+        return card
+
+
+card_captures = CardCaptureNotifier()
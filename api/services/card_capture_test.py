@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.card_capture import CardCaptureNotifier
+
+
+@pytest.mark.asyncio
+class TestCardCaptureNotifier:
+
+    async def test_wakes_waiters_on_capture(self):
+        notifier = CardCaptureNotifier()
+        after = datetime.now(timezone.utc)
+        waiters = [asyncio.create_task(notifier.wait(after, timeout=5)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        notifier.notify("abc", after + timedelta(seconds=1))
+
+        for card in await asyncio.gather(*waiters):
+            assert card.uid == "abc" # type: ignore
+
+    async def test_returns_at_once_when_already_captured(self):
+        notifier = CardCaptureNotifier()
+        captured_at = datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+        notifier.notify("abc", captured_at)
+
+        card = await notifier.wait(captured_at - timedelta(seconds=1), timeout=0.01)
+        assert card.captured_at == captured_at.replace(microsecond=123000) # type: ignore
+
+    async def test_times_out_without_newer_capture(self):
+        notifier = CardCaptureNotifier()
+        captured_at = datetime(2026, 1, 1, 12, 0, 0)
+        notifier.notify("abc", captured_at)
+
+        # Naive datetimes are UTC
+        assert await notifier.wait(captured_at, timeout=0.01) is None
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Type
+
+from beanie import Document
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY_SECONDS = 5.0
+
+
+async def watch_collection(
+    document_model: Type[Document],
+    on_change: Callable[[], Awaitable[None]],
+    pipeline: Optional[List[dict]] = None,
+    retry_delay: float = RETRY_DELAY_SECONDS,
+    on_close: Optional[Callable[[], None]] = None,
+):
+    """
+    Call `on_change` whenever the collection behind `document_model` changes.
+
+    `on_change` is also called every time the stream is (re)opened, so events
+    missed while disconnected are never lost. `pipeline` narrows the events that
+    trigger a call. `on_close` is called whenever the stream is lost, i.e.
+    while changes may go unnoticed until the next (re)open. Change streams need
+    a replica set; on a standalone server the watcher logs a warning and stops.
+    """
+    collection = document_model.get_pymongo_collection()
+    name = collection.name
+
+    while True:
+        try:
+            async with collection.watch(pipeline) as stream:
+                await on_change()
+                async for _ in stream:
+                    await on_change()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if on_close:
+                on_close()
+            logger.warning(f"Change stream on '{name}' unavailable, watcher stopped: {e}")
+            return
+        except PyMongoError as e:
+            if on_close:
+                on_close()
+            logger.warning(f"Change stream on '{name}' interrupted, retrying in {retry_delay}s: {e}")
+            await asyncio.sleep(retry_delay)
+
+
+async def watch_events(
+    document_model: Type[Document],
+    on_event: Callable[[dict], Awaitable[None]],
+    pipeline: Optional[List[dict]] = None,
+    full_document: Optional[str] = None,
+    retry_delay: float = RETRY_DELAY_SECONDS,
+    on_open: Optional[Callable[[bool], None]] = None,
+    on_close: Optional[Callable[[], None]] = None,
+):
+    """
+    Call `on_event` with every change event on the collection behind `document_model`.
+
+    Unlike `watch_collection`, a reconnect resumes after the last event seen,
+    so no event is skipped or repeated unless the resume point has fallen off
+    the oplog; the stream is then reopened from the current point. `on_open`
+    is called on every (re)open with whether the stream was resumed,
+    `on_close` whenever the stream is lost.
+    """
+    collection = document_model.get_pymongo_collection()
+    name = collection.name
+    resume_token = None
+
+    while True:
+        try:
+            async with collection.watch(pipeline, full_document=full_document, resume_after=resume_token) as stream:
+                if on_open:
+                    on_open(resume_token is not None)
+                resume_token = stream.resume_token
+                async for event in stream:
+                    await on_event(event)
+                    resume_token = stream.resume_token
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if on_close:
+                on_close()
+            if resume_token is None:
+                logger.warning(f"Change stream on '{name}' unavailable, watcher stopped: {e}")
+                return
+            logger.warning(f"Change stream on '{name}' cannot resume, reopening in {retry_delay}s: {e}")
+            resume_token = None
+            await asyncio.sleep(retry_delay)
+        except PyMongoError as e:
+            if on_close:
+                on_close()
+            logger.warning(f"Change stream on '{name}' interrupted, retrying in {retry_delay}s: {e}")
+            await asyncio.sleep(retry_delay)
@@ -0,0 +1,119 @@
+import logging
+import os
+from datetime import datetime
+from enum import Enum
+from typing import Optional, Tuple
+
+from beanie import UpdateResponse
+from beanie.operators import Inc, Set
+
+from models import Purchase, PurchaseStatus, User, UserStatus, utcnow
+
+logger = logging.getLogger(__name__)
+
+CHARGE_MODE_ENV = "CHARGE_MODE"
+
+
+class ChargeMode(str, Enum):
+    # Read the student, check the limit and save it inside a multi-document transaction
+    transaction = "transaction"
+    # Enforce the limit with one conditional $inc, then insert the purchase (compensated on failure)
+    atomic = "atomic"
+
+
+def load_charge_mode() -> ChargeMode:
+    """Read CHARGE_MODE; raises RuntimeError on an unknown value so a typo stops startup."""
+    value = os.getenv(CHARGE_MODE_ENV, ChargeMode.transaction.value)
+    try:
+        return ChargeMode(value)
+    except ValueError:
+        choices = ", ".join(mode.value for mode in ChargeMode)
+        raise RuntimeError(f"{CHARGE_MODE_ENV} must be one of {choices}, got {value!r}")
+
+
+class ChargeSettings:
+    """Charge mode of the running app, read once by `load` at startup."""
+
+    def __init__(self):
+        self.mode = ChargeMode.transaction
+
+    def load(self) -> ChargeMode:
+        self.mode = load_charge_mode()
+        return self.mode
+
+
+charge_settings = ChargeSettings()
+
+
+def get_charge_mode() -> ChargeMode:
+    return charge_settings.mode
+
+
+class ChargeRejection(str, Enum):
+    student_not_found = "student_not_found"
+    user_inactive = "user_inactive"
+    limit_reached = "limit_reached"
+
+
+class ChargeRejected(Exception):
+    def __init__(self, reason: ChargeRejection, current_debt: Optional[int] = None):
+        super().__init__(reason.value)
+        self.reason = reason
+        self.current_debt = current_debt
+
+
+async def atomic_charge(
+    student_id: int,
+    shelf_id: str,
+    price: int,
+    max_limit: int,
+    now: datetime,
+    idempotency_key: Optional[str] = None,
+) -> Tuple[User, Purchase]:
+    """
+    Charge a student without a transaction.
+
+    The balance is only incremented when the student is active and
+    balance + price <= max_limit, in a single find-and-modify. If the purchase
+    record cannot be written afterwards, the increment is rolled back.
+    """
+    student = await User.find_one(
+        User.student_id == student_id,
+        User.status != UserStatus.inactive,
+        User.account_balance <= max_limit - price,
+    ).update(
+        Inc({User.account_balance: price}),
+        # Server time rather than the scan time, which is old for replayed scans
+        Set({User.updated_at: utcnow()}),
+        response_type=UpdateResponse.NEW_DOCUMENT,
+    )
+
+    if student is None:
+        # Rare path: find out which condition failed.
+        existing = await User.find_one(User.student_id == student_id)
+        if not existing:
+            raise ChargeRejected(ChargeRejection.student_not_found)
+        if existing.status == UserStatus.inactive:
+            raise ChargeRejected(ChargeRejection.user_inactive)
+        raise ChargeRejected(ChargeRejection.limit_reached, current_debt=existing.account_balance)
+
+    purchase = Purchase(
+        student_id=student_id,
+        shelf_id=shelf_id,
+        price=price,
+        status=PurchaseStatus.completed,
+        idempotency_key=idempotency_key,
+        balance_after=student.account_balance,
+        created_at=now,
+    )
+    try:
+        await purchase.insert()
+    except Exception:
+        logger.exception(f"Purchase insert failed for student {student_id}, reverting charge of {price}")
+        await User.find_one(User.student_id == student_id).update(
+            Inc({User.account_balance: -price}),
+            Set({User.updated_at: utcnow()}),
+        )
+        raise
+
+    return student, purchase # type: ignore
@@ -0,0 +1,76 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import Purchase, User, UserStatus
+from services.charge import (
+    ChargeMode, ChargeRejected, ChargeRejection, ChargeSettings, atomic_charge, get_charge_mode, load_charge_mode
+)
+
+
+@pytest.mark.asyncio
+class TestAtomicCharge:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[User, Purchase]) # type: ignore
+        await User(student_id=1, first_name="Test", last_name="Student", account_balance=100).insert()
+        await User(student_id=2, first_name="Gone", last_name="Student", status=UserStatus.inactive).insert()
+
+    async def test_charge_success(self):
+        now = datetime.now(timezone.utc)
+        student, purchase = await atomic_charge(1, "shelf1", 50, 2000, now)
+
+        assert student.account_balance == 150
+        assert purchase.student_id == 1
+        assert purchase.shelf_id == "shelf1"
+        assert purchase.price == 50
+        assert (await User.find_one(User.student_id == 1)).account_balance == 150 # type: ignore
+        assert await Purchase.find(Purchase.student_id == 1).count() == 1
+
+    async def test_charge_up_to_exact_limit(self):
+        student, _ = await atomic_charge(1, "shelf1", 100, 200, datetime.now(timezone.utc))
+        assert student.account_balance == 200
+
+    async def test_limit_reached(self):
+        with pytest.raises(ChargeRejected) as exc_info:
+            await atomic_charge(1, "shelf1", 150, 200, datetime.now(timezone.utc))
+        assert exc_info.value.reason == ChargeRejection.limit_reached
+        assert exc_info.value.current_debt == 100
+        assert (await User.find_one(User.student_id == 1)).account_balance == 100 # type: ignore
+        assert await Purchase.find().count() == 0
+
+    async def test_student_not_found(self):
+        with pytest.raises(ChargeRejected) as exc_info:
+            await atomic_charge(999, "shelf1", 50, 2000, datetime.now(timezone.utc))
+        assert exc_info.value.reason == ChargeRejection.student_not_found
+
+    async def test_user_inactive(self):
+        with pytest.raises(ChargeRejected) as exc_info:
+            await atomic_charge(2, "shelf1", 50, 2000, datetime.now(timezone.utc))
+        assert exc_info.value.reason == ChargeRejection.user_inactive
+
+    async def test_purchase_insert_failure_is_compensated(self, mocker: MockerFixture):
+        mocker.patch.object(Purchase, "insert", side_effect=RuntimeError("insert failed"))
+        with pytest.raises(RuntimeError):
+            await atomic_charge(1, "shelf1", 50, 2000, datetime.now(timezone.utc))
+        assert (await User.find_one(User.student_id == 1)).account_balance == 100 # type: ignore
+
+    async def test_get_charge_mode(self, monkeypatch: pytest.MonkeyPatch):
+        settings = ChargeSettings()
+        monkeypatch.setattr("services.charge.charge_settings", settings)
+        monkeypatch.delenv("CHARGE_MODE", raising=False)
+        assert settings.load() == ChargeMode.transaction
+        monkeypatch.setenv("CHARGE_MODE", "atomic")
+        assert get_charge_mode() == ChargeMode.transaction
+        settings.load()
+        assert get_charge_mode() == ChargeMode.atomic
+
+    async def test_unknown_charge_mode_fails_at_load(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("CHARGE_MODE", "atomc")
+        with pytest.raises(RuntimeError, match="CHARGE_MODE must be one of transaction, atomic"):
+            load_charge_mode()
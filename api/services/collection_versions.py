@@ -0,0 +1,77 @@
+import secrets
+import zlib
+from typing import Dict, Optional, Set, Type
+
+from beanie import Document
+from fastapi import Depends, HTTPException, Request, Response
+
+from services.change_stream import watch_collection
+
+
+class CollectionVersions:
+    """
+    Change counters for polled collections, used as ETags on their list routes.
+
+    A collection's counter is bumped by a change stream watcher on every write,
+    from any worker. ETags are only handed out while that watcher's stream is
+    open: without it a write could go unnoticed and a stale list would be
+    answered with 304. The epoch keeps ETags from another process or an
+    earlier run from ever matching.
+    """
+
+    def __init__(self):
+        self.__epoch = secrets.token_hex(4)
+        self.__versions: Dict[Type[Document], int] = {}
+        self.__tracked: Set[Type[Document]] = set()
+
+    def version(self, model: Type[Document]) -> Optional[int]:
+        return self.__versions.get(model, 0) if model in self.__tracked else None
+
+    def bump(self, model: Type[Document]):
+        self.__versions[model] = self.__versions.get(model, 0) + 1
+
+    def track(self, model: Type[Document]):
+        # Bumped as well, which covers anything missed while untracked
+        self.bump(model)
+        self.__tracked.add(model)
+
+    def untrack(self, model: Type[Document]):
+        self.__tracked.discard(model)
+
+    async def watch(self, model: Type[Document]):
+        async def changed():
+            self.track(model)
+
+        await watch_collection(model, changed, on_close=lambda: self.untrack(model))
+
+    def etag(self, model: Type[Document], query: str = "") -> Optional[str]:
+        """ETag of the list of `model` requested with `query`, or None while changes are not tracked."""
+        version = self.version(model)
+        if version is None:
+            return None
+        return f'"{self.__epoch}-{version}-{zlib.crc32(query.encode()):08x}"'
+
+
+collection_versions = CollectionVersions()
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def conditional_get(model: Type[Document]):
+    """
+    Route dependency answering 304 Not Modified when the client's If-None-Match
+    still matches `model`'s version, before the route touches the database.
+    """
+    async def check(request: Request, response: Response):
+        etag = collection_versions.etag(model, str(request.url.query))
+        if etag is None:
+            return
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match", ""), etag):
+            raise HTTPException(304, headers=headers)
+        response.headers.update(headers)
+
+    return Depends(check)
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+
+from models import Payment, User
+from services import collection_versions as module
+from services.collection_versions import CollectionVersions, conditional_get
+
+
+@pytest.mark.asyncio
+class TestCollectionVersions:
+
+    async def test_tracks_while_stream_is_open(self, mocker: MockerFixture):
+        versions = CollectionVersions()
+        assert versions.etag(User) is None
+
+        async def fake_watch(model, on_change, on_close):
+            await on_change()  # stream opened
+            first = versions.etag(User, "limit=10")
+            await on_change()  # a write
+            assert versions.etag(User, "limit=10") != first
+            assert versions.etag(User, "limit=10") != versions.etag(User, "limit=20")
+            on_close()
+
+        mocker.patch.object(module, "watch_collection", side_effect=fake_watch)
+        await versions.watch(User)
+
+        assert versions.etag(User) is None
+        assert versions.etag(Payment) is None
+
+
+class TestConditionalGet:
+
+    def setup_method(self):
+        self.versions = CollectionVersions()
+        self.calls = 0
+        app = FastAPI()
+
+        @app.get("/users/", dependencies=[conditional_get(User)])
+        async def list_users():
+            self.calls += 1
+            return {"users": []}
+
+        self.client = TestClient(app)
+
+    def test_no_etag_while_untracked(self, mocker: MockerFixture):
+        mocker.patch.object(module, "collection_versions", self.versions)
+        response = self.client.get("/users/")
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+
+    def test_not_modified_until_collection_changes(self, mocker: MockerFixture):
+        mocker.patch.object(module, "collection_versions", self.versions)
+        self.versions.track(User)
+
+        first = self.client.get("/users/?min_balance=1")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+
+        cached = self.client.get("/users/?min_balance=1", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.content == b""
+        assert self.calls == 1
+
+        # A different query is a different representation
+        assert self.client.get("/users/", headers={"If-None-Match": etag}).status_code == 200
+
+        self.versions.bump(User)
+        changed = self.client.get("/users/?min_balance=1", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
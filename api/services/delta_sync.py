@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Type
+
+from beanie import Document
+from bson import json_util
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from models import TOMBSTONE_RETENTION_SECONDS, Tombstone, utcnow
+from services.change_stream import RETRY_DELAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Documents written this long before a token was issued are sent again, which
+# covers clock skew between workers and transactions still committing when the
+# previous delta was read
+OVERLAP = timedelta(seconds=5)
+
+TOKEN_JSON_OPTIONS = json_util.JSONOptions(tz_aware=True, tzinfo=timezone.utc)
+
+
+def encode_token(at: datetime) -> str:
+    raw = json_util.dumps({"t": at})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        at = json_util.loads(raw, json_options=TOKEN_JSON_OPTIONS)["t"]
+        if not isinstance(at, datetime):
+            raise TypeError("t")
+        return at
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Invalid sync token")
+
+
+class DeltaSync:
+    """
+    "What changed since <token>" for replicated collections.
+
+    Inserts and updates are found through `updated_at`, which every write to a
+    synced collection must set to the server's current time. Deletions leave
+    no document behind, so a change stream watcher records a Tombstone for
+    each one. Deltas are only served while tombstones are known to be
+    complete, i.e. for tokens issued after the watcher's stream first opened
+    and younger than the tombstone TTL; other tokens (and every token while
+    the stream is unavailable) get a full snapshot instead.
+    """
+
+    def __init__(self):
+        self.__complete_since: Dict[Type[Document], datetime] = {}
+
+    def complete_since(self, model: Type[Document]) -> Optional[datetime]:
+        return self.__complete_since.get(model)
+
+    async def record_deletions(self, model: Type[Document], retry_delay: float = RETRY_DELAY_SECONDS):
+        collection = model.get_pymongo_collection()
+        name = collection.name
+        pipeline = [{"$match": {"operationType": "delete"}}]
+        resume_token = None
+
+        while True:
+            try:
+                async with collection.watch(pipeline, resume_after=resume_token) as stream:
+                    if resume_token is None:
+                        self.__complete_since[model] = utcnow()
+                    resume_token = stream.resume_token
+                    async for event in stream:
+                        await self.__tombstone(name, event["documentKey"]["_id"])
+                        resume_token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self.__complete_since.pop(model, None)
+                if resume_token is not None:
+                    # Resume point fell off the oplog: deletions since then are lost
+                    logger.warning(f"Deletions on '{name}' lost, restarting watcher in {retry_delay}s: {e}")
+                    resume_token = None
+                    await asyncio.sleep(retry_delay)
+                    continue
+                logger.warning(f"Change stream on '{name}' unavailable, deletions not recorded: {e}")
+                return
+            except PyMongoError as e:
+                logger.warning(f"Change stream on '{name}' interrupted, retrying in {retry_delay}s: {e}")
+                await asyncio.sleep(retry_delay)
+
+    async def __tombstone(self, collection: str, document_id):
+        # deleted_at is the time of recording, not of the deletion, so a
+        # deletion caught up on after a reconnect still lands in the next delta
+        try:
+            await Tombstone(collection=collection, document_id=document_id).insert()
+        except DuplicateKeyError:
+            # Already recorded by another worker
+            pass
+
+    async def changes(self, model: Type[Document], since: Optional[str]) -> dict:
+        """
+        Documents of `model` inserted or updated since the `since` token, ids
+        deleted since then, and the token to send next time. `full` is True
+        when the whole collection is returned and the client must drop
+        anything it holds that is not in it.
+        """
+        now = utcnow()
+        token = encode_token(now)
+        name = model.get_pymongo_collection().name
+
+        if since is not None:
+            issued_at = decode_token(since)
+            after = issued_at - OVERLAP
+            complete_since = self.complete_since(model)
+            expired = issued_at < now - timedelta(seconds=TOMBSTONE_RETENTION_SECONDS)
+            if complete_since is not None and issued_at >= complete_since and not expired:
+                documents = await (
+                    model.find({"updated_at": {"$gte": after}})
+                    .sort([("updated_at", 1), ("_id", 1)])
+                    .to_list()
+                )
+                tombstones = await Tombstone.find(
+                    Tombstone.collection == name,
+                    Tombstone.deleted_at >= after,
+                ).to_list()
+                deleted: List = [t.document_id for t in tombstones]
+                return {"documents": documents, "deleted": deleted, "token": token, "full": False}
+
+        documents = await model.find_all().to_list()
+        return {"documents": documents, "deleted": [], "token": token, "full": True}
+
+
+delta_sync = DeltaSync()
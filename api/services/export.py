@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+
+from beanie import Document
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+from models import Payment, Purchase
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+EXPORT_FIELDS: Dict[Type[Document], List[str]] = {
+    Purchase: ["id", "student_id", "shelf_id", "price", "status", "idempotency_key", "created_at"],
+    Payment: ["id", "student_id", "amount_paid", "status", "external_transaction_id", "idempotency_key", "created_at"],
+}
+
+# Rows per chunk handed to the response; small enough that the first bytes go out at once
+CHUNK_ROWS = 200
+CURSOR_BATCH_SIZE = 1000
+
+
+def export_query(
+    student_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    """Mongo filter for an export: one student and/or created_at in [start, end)."""
+    if start and end and start >= end:
+        raise HTTPException(400, "start must be before end")
+    query: Dict[str, Any] = {}
+    if student_id is not None:
+        query["student_id"] = student_id
+    created_at: Dict[str, datetime] = {}
+    if start:
+        created_at["$gte"] = start
+    if end:
+        created_at["$lt"] = end
+    if created_at:
+        query["created_at"] = created_at
+    return query
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # Mongo hands datetimes back naive (UTC)
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    return value
+
+
+def _row(document: dict, fields: List[str]) -> dict:
+    return {field: _cell(document.get("_id" if field == "id" else field)) for field in fields}
+
+
+async def stream_export(model: Type[Document], query: dict, fmt: ExportFormat) -> AsyncIterator[str]:
+    """
+    Yield `model` documents matching `query` as NDJSON lines or CSV rows, oldest first.
+
+    Reads straight from a Motor cursor (no model validation) and yields chunks
+    of CHUNK_ROWS rows, so memory stays flat however long the history is. A
+    CSV export starts with its header row.
+    """
+    fields = EXPORT_FIELDS[model]
+    projection = {field: 1 for field in fields if field != "id"}
+    cursor = model.get_pymongo_collection().find(
+        query,
+        projection,
+        sort=[("created_at", ASCENDING), ("_id", ASCENDING)],
+        batch_size=CURSOR_BATCH_SIZE,
+    )
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, lineterminator="\n") if fmt == ExportFormat.csv else None
+    if writer:
+        writer.writeheader()
+        yield _drain(buffer)
+
+    rows = 0
+    async for document in cursor:
+        row = _row(document, fields)
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write("\n")
+        rows += 1
+        if rows % CHUNK_ROWS == 0:
+            yield _drain(buffer)
+
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def export_filename(name: str, fmt: ExportFormat) -> str:
+    return f"{name}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{fmt.value}"
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import Payment, PaymentStatus, Purchase, PurchaseStatus
+from services import export
+from services.export import ExportFormat, export_query, stream_export
+
+BASE = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def collect(chunks) -> str:
+    return "".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+class TestStreamExport:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(
+            database=client.get_database("labshop_test"),
+            document_models=[Purchase, Payment]
+        ) # type: ignore
+
+        for i in range(5):
+            await Purchase(
+                student_id=i % 2, shelf_id="shelf,1", price=100 + i,
+                status=PurchaseStatus.completed, idempotency_key=f"key{i}",
+                created_at=BASE + timedelta(days=i)
+            ).insert()
+        await Payment(student_id=1, amount_paid=300, status=PaymentStatus.completed, created_at=BASE).insert()
+
+    async def test_ndjson_oldest_first(self):
+        body = await collect(stream_export(Purchase, export_query(), ExportFormat.ndjson))
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        assert [r["price"] for r in rows] == [100, 101, 102, 103, 104]
+        assert rows[0]["created_at"] == "2026-01-01T12:00:00+00:00"
+        assert set(rows[0]) == {"id", "student_id", "shelf_id", "price", "status", "idempotency_key", "created_at"}
+
+    async def test_csv_with_filters(self):
+        query = export_query(student_id=0, start=BASE + timedelta(days=1), end=BASE + timedelta(days=4))
+        body = await collect(stream_export(Purchase, query, ExportFormat.csv))
+
+        rows = list(csv.DictReader(io.StringIO(body)))
+        assert [r["price"] for r in rows] == ["102"]
+        assert rows[0]["shelf_id"] == "shelf,1"
+
+    async def test_payments_and_chunking(self, mocker):
+        mocker.patch.object(export, "CHUNK_ROWS", 2)
+        chunks = [c async for c in stream_export(Purchase, export_query(), ExportFormat.csv)]
+        # header, two full chunks, remainder
+        assert len(chunks) == 4
+
+        body = await collect(stream_export(Payment, export_query(student_id=1), ExportFormat.csv))
+        assert body.splitlines()[0] == "id,student_id,amount_paid,status,external_transaction_id,idempotency_key,created_at"
+        assert body.splitlines()[1].split(",")[2] == "300"
+
+    async def test_rejects_empty_range(self):
+        with pytest.raises(HTTPException) as e:
+            export_query(start=BASE, end=BASE)
+        assert e.value.status_code == 400
@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from models import Payment, PaymentStatus, Purchase, PurchaseStatus
+from schema import ActivityKind
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor_state, encode_cursor
+
+OLDEST_FIRST = {"created_at": 1, "_id": 1}
+CURSOR_FIELD = "ledger"
+
+
+def _signature(cursor: str) -> str:
+    # The cursor carries the running balance, which is served as-is: sign it
+    secret = os.getenv("SECRET_KEY")
+    if not secret:
+        raise RuntimeError("SECRET_KEY is not set")
+    return hmac.new(secret.encode(), cursor.encode(), hashlib.sha256).hexdigest()
+
+
+def _branch(match: dict, limit: int, project: dict) -> List[dict]:
+    # Walks STUDENT_HISTORY_INDEX: equality on student_id, then (created_at, _id) order
+    return [
+        {"$match": match},
+        {"$sort": OLDEST_FIRST},
+        {"$limit": limit},
+        {"$project": project},
+    ]
+
+
+def ledger_pipeline(
+    student_id: int,
+    limit: int,
+    after: Optional[Tuple[Any, Any]] = None,
+    opening_balance: int = 0,
+) -> List[dict]:
+    """
+    Aggregation on the purchase collection returning up to `limit` of the
+    student's completed purchases and payments oldest first, starting strictly
+    after the (created_at, _id) `after`, each with the balance after it.
+
+    Purchases add their price and payments subtract their amount, like the
+    charge and payment routes do to `account_balance`. The running sum is a
+    window over the page only; `opening_balance` is the balance before it.
+    """
+    keyset: Dict[str, Any] = {}
+    if after is not None:
+        created_at, id = after
+        keyset["$or"] = [
+            {"created_at": {"$gt": created_at}},
+            {"created_at": created_at, "_id": {"$gt": id}},
+        ]
+
+    purchases = _branch(
+        {"student_id": student_id, "status": PurchaseStatus.completed.value, **keyset},
+        limit,
+        {"kind": {"$literal": ActivityKind.purchase.value}, "created_at": 1, "shelf_id": 1, "amount": "$price", "delta": "$price"},
+    )
+    payments = _branch(
+        {"student_id": student_id, "status": PaymentStatus.completed.value, **keyset},
+        limit,
+        {"kind": {"$literal": ActivityKind.payment.value}, "created_at": 1, "amount": "$amount_paid", "delta": {"$multiply": ["$amount_paid", -1]}},
+    )
+    return purchases + [
+        {"$unionWith": {"coll": Payment.get_settings().name, "pipeline": payments}},
+        {"$sort": OLDEST_FIRST},
+        {"$limit": limit},
+        {"$setWindowFields": {
+            "sortBy": OLDEST_FIRST,
+            "output": {"balance": {"$sum": "$delta", "window": {"documents": ["unbounded", "current"]}}},
+        }},
+        {"$set": {"balance": {"$add": ["$balance", opening_balance]}}},
+        {"$unset": "delta"},
+    ]
+
+
+async def ledger_page(
+    student_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a student's ledger and the cursor of the next one.
+
+    The cursor carries the balance at the end of the page, so every page costs
+    the same however long the history before it is. It is signed with
+    SECRET_KEY, so a cursor whose balance was edited is rejected.
+    """
+    after, opening_balance = None, 0
+    if cursor:
+        # base64url never contains ".", so the signature is everything after the last one
+        signed, _, signature = cursor.rpartition(".")
+        if not signed or not hmac.compare_digest(signature, _signature(signed)):
+            raise HTTPException(400, "Invalid cursor")
+        field, created_at, id, state = decode_cursor_state(signed)
+        if field != CURSOR_FIELD or state.get("student_id") != student_id or "balance" not in state:
+            raise HTTPException(400, "Cursor does not belong to this ledger")
+        after, opening_balance = (created_at, id), state["balance"]
+
+    pipeline = ledger_pipeline(student_id, limit + 1, after, opening_balance)
+    entries = await Purchase.get_pymongo_collection().aggregate(pipeline).to_list(None)
+    if len(entries) <= limit:
+        return entries, None
+    entries = entries[:limit]
+    last = entries[-1]
+    state = {"student_id": student_id, "balance": last["balance"]}
+    next_cursor = encode_cursor(CURSOR_FIELD, last["created_at"], last["_id"], state)
+    return entries, f"{next_cursor}.{_signature(next_cursor)}"
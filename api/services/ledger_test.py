@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from beanie import init_beanie
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from pytest_mock import MockerFixture
+
+from models import Payment, Purchase
+from schema import LedgerEntryOut
+from services.ledger import ledger_page, ledger_pipeline
+from services.pagination import decode_cursor_state, encode_cursor
+
+
+class TestLedgerPipeline:
+    @pytest_asyncio.fixture(autouse=True, scope="function")
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[Purchase, Payment]) # type: ignore
+
+    @pytest.mark.asyncio
+    async def test_running_balance_starts_from_opening(self):
+        at, id = datetime(2026, 1, 1, tzinfo=timezone.utc), ObjectId()
+        pipeline = ledger_pipeline(7, limit=51, after=(at, id), opening_balance=300)
+
+        keyset = [{"created_at": {"$gt": at}}, {"created_at": at, "_id": {"$gt": id}}]
+        assert pipeline[0]["$match"] == {"student_id": 7, "status": "completed", "$or": keyset}
+        payments = pipeline[4]["$unionWith"]
+        assert payments["coll"] == "payment"
+        assert payments["pipeline"][3]["$project"]["delta"] == {"$multiply": ["$amount_paid", -1]}
+        window = pipeline[7]["$setWindowFields"]
+        assert window["output"]["balance"]["window"] == {"documents": ["unbounded", "current"]}
+        assert pipeline[8] == {"$set": {"balance": {"$add": ["$balance", 300]}}}
+
+
+@pytest.mark.asyncio
+class TestLedgerPage:
+    @pytest.fixture(autouse=True)
+    def test_setup(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SECRET_KEY", "ledger-test-secret")
+
+    def entries(self, balances: list) -> list:
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        return [
+            {"_id": ObjectId(), "kind": "purchase", "created_at": start + timedelta(minutes=i), "amount": 100, "balance": balance}
+            for i, balance in enumerate(balances)
+        ]
+
+    def mock_aggregate(self, mocker: MockerFixture, entries: list):
+        collection = mocker.Mock()
+        collection.aggregate.return_value.to_list = mocker.AsyncMock(return_value=entries)
+        mocker.patch.object(Purchase, "get_pymongo_collection", return_value=collection)
+        return collection
+
+    async def test_cursor_carries_balance_to_next_page(self, mocker: MockerFixture):
+        self.mock_aggregate(mocker, self.entries([100, 200, 300]))
+        page, next_cursor = await ledger_page(7, limit=2)
+        assert [e["balance"] for e in page] == [100, 200]
+        assert LedgerEntryOut.model_validate(page[0]).amount == 100
+
+        collection = self.mock_aggregate(mocker, self.entries([300]))
+        page, last_cursor = await ledger_page(7, limit=2, cursor=next_cursor)
+
+        assert last_cursor is None
+        pipeline = collection.aggregate.call_args[0][0]
+        assert pipeline[-2] == {"$set": {"balance": {"$add": ["$balance", 200]}}}
+
+    async def test_rejects_cursor_of_another_student(self, mocker: MockerFixture):
+        self.mock_aggregate(mocker, self.entries([100, 200, 300]))
+        _, next_cursor = await ledger_page(7, limit=2)
+
+        with pytest.raises(HTTPException) as e:
+            await ledger_page(8, limit=2, cursor=next_cursor)
+        assert e.value.status_code == 400
+
+    async def test_rejects_tampered_balance(self, mocker: MockerFixture):
+        self.mock_aggregate(mocker, self.entries([100, 200, 300]))
+        _, next_cursor = await ledger_page(7, limit=2)
+        signed, _, signature = next_cursor.rpartition(".") # type: ignore
+        field, created_at, id, state = decode_cursor_state(signed)
+
+        forged = encode_cursor(field, created_at, id, {**state, "balance": -1_000_000})
+        for cursor in (f"{forged}.{signature}", forged, f"{signed}.{'0' * len(signature)}"):
+            with pytest.raises(HTTPException) as e:
+                await ledger_page(7, limit=2, cursor=cursor)
+            assert e.value.status_code == 400
@@ -0,0 +1,106 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from beanie import Document
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+D = TypeVar("D", bound=Document)
+
+# Type of the value each cursor field carries. Cursors come from clients and
+# their value ends up in a query filter, so anything else (operator dicts in
+# particular) is rejected.
+CURSOR_VALUE_TYPES: Dict[str, type] = {
+    "created_at": datetime,
+    "account_balance": int,
+    "price": int,
+    # services/ledger.py: created_at, with the balance in the cursor's state
+    "ledger": datetime,
+}
+
+
+def encode_cursor(field: str, value: Any, id: ObjectId, state: Optional[Dict[str, int]] = None) -> str:
+    # Extended JSON keeps datetimes and ObjectIds typed across the round trip
+    data = {"f": field, "v": value, "id": id}
+    if state is not None:
+        data["s"] = state
+    raw = json_util.dumps(data)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor_state(cursor: str) -> Tuple[str, Any, ObjectId, Dict[str, int]]:
+    """
+    Field, value, _id and state of a cursor; 400 unless the value has the type
+    of its field and the state only holds ints.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json_util.loads(raw)
+        field, value, id, state = data["f"], data["v"], data["id"], data.get("s", {})
+        expected = CURSOR_VALUE_TYPES[field]
+        # bool is an int subclass, but no sort field holds one
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise TypeError("v")
+        if not isinstance(id, ObjectId):
+            raise TypeError("id")
+        if not isinstance(state, dict) or not all(
+            isinstance(v, int) and not isinstance(v, bool) for v in state.values()
+        ):
+            raise TypeError("s")
+        return field, value, id, state
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any, ObjectId]:
+    field, value, id, _ = decode_cursor_state(cursor)
+    return field, value, id
+
+
+async def paginate(
+    model: Type[D],
+    *filters,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    order_by: str = "created_at",
+    descending: bool = True,
+) -> Tuple[List[D], Optional[str]]:
+    """
+    One page of `model` documents matching `filters`, sorted by `order_by`.
+
+    Returns the page and the cursor of the next one (None on the last page).
+    The cursor is opaque to clients; it encodes the (order_by, _id) of the
+    last document returned, and the next page starts strictly after it. _id
+    breaks ties, so the sort needs an (order_by, _id) index to stay cheap;
+    the default newest-first order uses models.CREATED_AT_PAGE_INDEX.
+    """
+    direction = DESCENDING if descending else ASCENDING
+    after = "$lt" if descending else "$gt"
+
+    conditions = list(filters)
+    if cursor:
+        field, value, id = decode_cursor(cursor)
+        if field != order_by:
+            raise HTTPException(400, "Cursor does not match the requested sort order")
+        conditions.append({"$or": [
+            {order_by: {after: value}},
+            {order_by: value, "_id": {after: id}},
+        ]})
+
+    documents = await (
+        model.find(*conditions)
+        .sort([(order_by, direction), ("_id", direction)])
+        .limit(limit + 1)
+        .to_list()
+    )
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    last = documents[-1]
+    return documents, encode_cursor(order_by, getattr(last, order_by), last.id) # type: ignore
@@ -0,0 +1,90 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import Purchase, PurchaseStatus
+from services.pagination import decode_cursor, encode_cursor, paginate
+
+
+@pytest.mark.asyncio
+class TestPaginate:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(
+            database=client.get_database("labshop_test"),
+            document_models=[Purchase]
+        ) # type: ignore
+
+        base = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        # Pairs of purchases share a created_at, so _id has to break the tie
+        for i in range(7):
+            await Purchase(
+                student_id=i % 2, shelf_id="shelf1", price=i,
+                status=PurchaseStatus.completed, created_at=base + timedelta(seconds=i // 2),
+                # mongomock ignores the partial filter of the idempotency_key index
+                idempotency_key=f"key{i}"
+            ).insert()
+
+    async def test_walks_all_pages_newest_first_without_gaps(self):
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            page, cursor = await paginate(Purchase, cursor=cursor, limit=3)
+            seen.extend(p.price for p in page)
+            pages += 1
+            if cursor is None:
+                break
+
+        assert pages == 3
+        assert seen == [6, 5, 4, 3, 2, 1, 0]
+
+    async def test_applies_filters(self):
+        page, cursor = await paginate(Purchase, Purchase.student_id == 1, limit=2)
+        assert [p.price for p in page] == [5, 3]
+
+        page, cursor = await paginate(Purchase, Purchase.student_id == 1, cursor=cursor, limit=2)
+        assert [p.price for p in page] == [1]
+        assert cursor is None
+
+    async def test_cursor_round_trip_and_invalid_cursor(self):
+        purchase = await Purchase.find_one(Purchase.price == 3)
+        field, created_at, id = decode_cursor(encode_cursor("created_at", purchase.created_at, purchase.id)) # type: ignore
+        assert field == "created_at"
+        assert created_at.replace(tzinfo=None) == purchase.created_at # type: ignore
+        assert id == purchase.id # type: ignore
+
+        with pytest.raises(HTTPException) as e:
+            await paginate(Purchase, cursor="not-a-cursor")
+        assert e.value.status_code == 400
+
+        with pytest.raises(HTTPException) as e:
+            await paginate(Purchase, cursor=encode_cursor("price", 3, purchase.id), limit=2) # type: ignore
+        assert e.value.status_code == 400
+
+    async def test_rejects_operator_and_mistyped_values(self):
+        purchase = await Purchase.find_one(Purchase.price == 3)
+        for cursor in (
+            encode_cursor("account_balance", {"$gte": -1e9}, purchase.id), # type: ignore
+            encode_cursor("created_at", [1, 2], purchase.id), # type: ignore
+            encode_cursor("created_at", "2026-01-01", purchase.id), # type: ignore
+            encode_cursor("price", True, purchase.id), # type: ignore
+            encode_cursor("student_id", 1, purchase.id), # type: ignore
+            encode_cursor("ledger", purchase.created_at, purchase.id, {"balance": {"$gt": 0}}), # type: ignore
+        ):
+            with pytest.raises(HTTPException) as e:
+                decode_cursor(cursor)
+            assert e.value.status_code == 400
+
+    async def test_orders_by_other_field(self):
+        page, cursor = await paginate(Purchase, limit=4, order_by="price", descending=False)
+        assert [p.price for p in page] == [0, 1, 2, 3]
+
+        page, cursor = await paginate(Purchase, cursor=cursor, limit=4, order_by="price", descending=False)
+        assert [p.price for p in page] == [4, 5, 6]
+        assert cursor is None
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import bcrypt
+from fastapi import HTTPException
+
+ROUNDS_ENV = "BCRYPT_ROUNDS"
+WORKERS_ENV = "PASSWORD_HASH_WORKERS"
+MAX_LOGINS_ENV = "MAX_CONCURRENT_LOGINS"
+DEFAULT_ROUNDS = 12
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_LOGINS = 8
+LOGIN_WAIT_SECONDS = 10.0
+
+BCRYPT_ROUNDS_PATTERN = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+def _env_int(name: str, default: int) -> int:
+    # os.environ rather than os.getenv: tests patch os.getenv to inject SECRET_KEY
+    return int(os.environ.get(name, default))
+
+
+class PasswordHasher:
+    """
+    bcrypt on a small dedicated thread pool, off the event loop.
+
+    bcrypt releases the GIL, so a login never stalls the scans being served
+    meanwhile; `workers` bounds the CPU it can take from them. `login` caps
+    the logins in flight at once, so a burst queues instead of piling up work
+    on the pool. Hashes made with a cost other than `rounds` are reported by
+    `needs_rehash`, so they can be upgraded (or downgraded) at the next login.
+    """
+
+    def __init__(self, rounds: int = 0, workers: int = 0, max_logins: int = 0):
+        self.rounds = rounds or _env_int(ROUNDS_ENV, DEFAULT_ROUNDS)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers or _env_int(WORKERS_ENV, DEFAULT_WORKERS),
+            thread_name_prefix="bcrypt",
+        )
+        self.__logins = asyncio.Semaphore(max_logins or _env_int(MAX_LOGINS_ENV, DEFAULT_MAX_LOGINS))
+
+    async def hash(self, password: str) -> str:
+        hashed = await self.__run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self.__run(bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        match = BCRYPT_ROUNDS_PATTERN.match(password_hash)
+        # Not a bcrypt hash we can read the cost of: leave it alone
+        return bool(match) and int(match.group(1)) != self.rounds
+
+    @asynccontextmanager
+    async def login(self, wait: float = LOGIN_WAIT_SECONDS) -> AsyncIterator[None]:
+        """Hold one of the login slots; 503 if none frees up within `wait` seconds."""
+        try:
+            await asyncio.wait_for(self.__logins.acquire(), wait)
+        except asyncio.TimeoutError:
+            raise HTTPException(503, "Too many logins in progress, try again")
+        try:
+            yield
+        finally:
+            self.__logins.release()
+
+    def close(self):
+        self.__executor.shutdown(wait=False)
+
+    async def __run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+
+password_hasher = PasswordHasher()
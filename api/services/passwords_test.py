@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from pytest_mock import MockerFixture
+
+from services.passwords import PasswordHasher
+
+
+@pytest.mark.asyncio
+class TestPasswordHasher:
+    @pytest.fixture(autouse=True)
+    def test_setup(self):
+        # Lowest cost bcrypt accepts, to keep the tests fast
+        self.hasher = PasswordHasher(rounds=4, workers=1, max_logins=1)
+        yield
+        self.hasher.close()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("secret")
+
+        assert hashed.startswith("$2b$04$")
+        assert await self.hasher.verify("secret", hashed)
+        assert not await self.hasher.verify("wrong", hashed)
+
+    async def test_hashing_runs_off_the_event_loop(self, mocker: MockerFixture):
+        threads = []
+        mocker.patch("bcrypt.checkpw", side_effect=lambda *args: threads.append(threading.current_thread().name) or True)
+
+        assert await self.hasher.verify("secret", "hash")
+        assert threads[0].startswith("bcrypt")
+
+    async def test_needs_rehash(self):
+        assert not self.hasher.needs_rehash(bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode())
+        assert self.hasher.needs_rehash(bcrypt.hashpw(b"secret", bcrypt.gensalt(5)).decode())
+        assert not self.hasher.needs_rehash("not a bcrypt hash")
+
+    async def test_login_slots(self):
+        async with self.hasher.login():
+            with pytest.raises(HTTPException) as exc_info:
+                async with self.hasher.login(wait=0.01):
+                    pass
+            assert exc_info.value.status_code == 503
+
+        async with self.hasher.login(wait=0.01):
+            pass
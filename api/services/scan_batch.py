@@ -0,0 +1,191 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from beanie.operators import In, Inc, Set
+from pymongo.errors import DuplicateKeyError
+
+from models import ICCard, ICCardStatus, Purchase, PurchaseStatus, User, UserStatus
+from schema import ADMIN_PORT, ScanRequest
+from services.scan_idempotency import get_duplicate_window
+from services.settings import settings_service
+from services.shelf_registry import ShelfEntry, shelf_registry
+from services.transaction import run_in_transaction
+
+MAX_ATTEMPTS = 2
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Mongo hands datetimes back naive (UTC); scanners may send either form
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _error(status_code: int, detail) -> dict:
+    return {"status": "error", "status_code": status_code, "detail": detail}
+
+
+def _success(student: User, amount: int, new_balance: Optional[int], replayed: bool = False) -> dict:
+    result = {
+        "status": "success",
+        "student_name": student.first_name,
+        "amount_charged": amount,
+    }
+    # Replays report the balance recorded with the original purchase, when there is one
+    if new_balance is not None:
+        result["new_balance"] = new_balance
+    if replayed:
+        result["replayed"] = True
+    return result
+
+
+class _PendingScan(NamedTuple):
+    index: int
+    key: Optional[str]
+    student_id: int
+    shelf: ShelfEntry
+    scanned_at: datetime
+
+
+async def process_scan_batch(scans: List[ScanRequest]) -> List[dict]:
+    """
+    Apply a buffered list of scans in order and return one result per scan.
+
+    Each result has the same meaning as the response (or error) of card_scan
+    for that scan. Cards, students and earlier purchases are read with one query
+    each, and every charge in the batch is written in a single transaction:
+    one $inc per student plus one insert of all purchases.
+    """
+    attempt = 1
+    while True:
+        try:
+            return await _process(scans)
+        except DuplicateKeyError:
+            # A scan in the batch was charged concurrently; the next attempt replays it
+            if attempt >= MAX_ATTEMPTS:
+                raise
+            attempt += 1
+
+
+async def _process(scans: List[ScanRequest]) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    results: List[Optional[dict]] = [None] * len(scans)
+
+    uids = list({scan.normalized_uid for scan in scans})
+    cards = {card.uid: card for card in await ICCard.find(In(ICCard.uid, uids)).to_list()}
+
+    pending: List[_PendingScan] = []
+    for index, scan in enumerate(scans):
+        if scan.usb_port == ADMIN_PORT:
+            results[index] = _error(400, "Admin port scans cannot be batched")
+            continue
+        card = cards.get(scan.normalized_uid)
+        if not card or card.student_id is None:
+            results[index] = _error(404, "Card not registered to a student")
+            continue
+        if card.status != ICCardStatus.active:
+            results[index] = _error(403, "Card is not active")
+            continue
+        shelf = await shelf_registry.get_by_port(scan.usb_port)
+        if not shelf:
+            results[index] = _error(404, f"Shelf on USB port {scan.usb_port} not found")
+            continue
+        pending.append(_PendingScan(index, scan.scan_key, card.student_id, shelf, _as_utc(scan.timestamp or now)))
+
+    if not pending:
+        return results # type: ignore
+
+    student_ids = list({p.student_id for p in pending})
+    keys = [p.key for p in pending if p.key]
+    purchases_by_key: Dict[str, Purchase] = {}
+    if keys:
+        purchases_by_key = {
+            p.idempotency_key: p # type: ignore
+            for p in await Purchase.find(In(Purchase.idempotency_key, keys)).to_list()
+        }
+
+    window = get_duplicate_window()
+    recent: Dict[Tuple[int, str], List[Purchase]] = defaultdict(list)
+    if window > timedelta(0):
+        earliest = min(p.scanned_at for p in pending) - window
+        latest = max(p.scanned_at for p in pending) + window
+        for purchase in await Purchase.find(
+            In(Purchase.student_id, student_ids),
+            Purchase.status == PurchaseStatus.completed,
+            Purchase.created_at >= earliest,
+            Purchase.created_at <= latest,
+        ).to_list():
+            recent[(purchase.student_id, purchase.shelf_id)].append(purchase)
+
+    max_limit = await settings_service.max_debt_limit()
+
+    async def charge(session):
+        # Copies, so a retried attempt does not see purchases from an aborted one
+        seen_by_key = dict(purchases_by_key)
+        seen_recent = defaultdict(list, {k: list(v) for k, v in recent.items()})
+
+        students = {
+            u.student_id: u
+            for u in await User.find(In(User.student_id, student_ids), session=session).to_list()
+        }
+        balances = {sid: u.account_balance for sid, u in students.items()}
+        charges: Dict[int, int] = defaultdict(int)
+        new_purchases: List[Purchase] = []
+
+        for p in pending:
+            student = students.get(p.student_id)
+            if not student:
+                results[p.index] = _error(404, "Student record not found")
+                continue
+            if student.status == UserStatus.inactive:
+                results[p.index] = _error(403, "User is inactive")
+                continue
+
+            previous = seen_by_key.get(p.key) if p.key else None
+            if previous is None and window > timedelta(0):
+                previous = next(
+                    (
+                        r for r in seen_recent[(p.student_id, p.shelf.shelf_id)]
+                        if abs(_as_utc(r.created_at) - p.scanned_at) <= window
+                    ),
+                    None,
+                )
+            if previous is not None:
+                results[p.index] = _success(student, previous.price, previous.balance_after, replayed=True)
+                continue
+
+            price = p.shelf.price
+            if balances[p.student_id] + price > max_limit:
+                results[p.index] = _error(400, {
+                    "error_code": "LIMIT_REACHED",
+                    "message": "Debt limit reached",
+                    "current_debt": balances[p.student_id]
+                })
+                continue
+
+            balances[p.student_id] += price
+            charges[p.student_id] += price
+            purchase = Purchase(
+                student_id=p.student_id,
+                shelf_id=p.shelf.shelf_id,
+                price=price,
+                status=PurchaseStatus.completed,
+                idempotency_key=p.key,
+                balance_after=balances[p.student_id],
+                created_at=p.scanned_at,
+            )
+            new_purchases.append(purchase)
+            seen_recent[(p.student_id, p.shelf.shelf_id)].append(purchase)
+            if p.key:
+                seen_by_key[p.key] = purchase
+            results[p.index] = _success(student, price, balances[p.student_id])
+
+        for sid, amount in charges.items():
+            await User.find_one(User.student_id == sid, session=session).update(
+                Inc({User.account_balance: amount}),
+                Set({User.updated_at: now}),
+            )
+        if new_purchases:
+            await Purchase.insert_many(new_purchases, session=session)
+
+    await run_in_transaction("card_scan_batch", charge)
+    return results # type: ignore
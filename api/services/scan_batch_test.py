@@ -0,0 +1,103 @@
+import mongomock
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import ICCard, ICCardStatus, Purchase, PurchaseStatus, Shelf, SystemSetting, User, UserStatus
+from schema import ScanRequest
+from services.scan_batch import process_scan_batch
+
+
+@pytest.mark.asyncio
+class TestProcessScanBatch:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self, mocker: MockerFixture):
+        mock_session = mocker.AsyncMock(name="MotorSession")
+        mock_transaction = mocker.AsyncMock(name="MotorTransaction")
+        mock_session.__aenter__.return_value = mock_session
+        mock_session.start_transaction = mocker.Mock(return_value=mock_transaction)
+        mock_transaction.__aenter__.return_value = mock_transaction
+
+        client = AsyncMongoMockClient()
+        client.start_session = mocker.AsyncMock(return_value=mock_session)
+        await init_beanie(
+            database=client.get_database("labshop_test"),
+            document_models=[User, ICCard, Shelf, SystemSetting, Purchase]
+        ) # type: ignore
+
+        await Shelf(shelf_id="shelf1", usb_port=1, price=100).insert()
+        await Shelf(shelf_id="shelf2", usb_port=2, price=300).insert()
+        await SystemSetting(key="max_debt_limit", value="500").insert()
+        await User(student_id=1, first_name="Alice", last_name="Student").insert()
+        await User(student_id=2, first_name="Bob", last_name="Student", status=UserStatus.inactive).insert()
+        await ICCard(uid="alicecard", student_id=1).insert()
+        await ICCard(uid="bobcard", student_id=2).insert()
+        await ICCard(uid="unlinkedcard").insert()
+        await ICCard(uid="deadcard", student_id=1, status=ICCardStatus.deactivated).insert()
+
+        # The transaction itself is mocked; let mongomock accept the session argument
+        mongomock.ignore_feature("session")
+        yield
+        mongomock.warn_on_feature("session")
+
+    def scan(self, idm: str, usb_port: int, seconds: int, **kwargs) -> ScanRequest:
+        ts = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+        return ScanRequest(idm=idm, usb_port=usb_port, timestamp=ts, **kwargs)
+
+    async def test_charges_in_order_until_limit(self):
+        results = await process_scan_batch([
+            self.scan("alicecard", 1, 0),
+            self.scan("alicecard", 2, 10),
+            self.scan("alicecard", 2, 20),
+            self.scan("alicecard", 1, 30),
+        ])
+
+        assert [r["status"] for r in results] == ["success", "success", "error", "success"]
+        assert results[1]["new_balance"] == 400
+        assert results[2]["status_code"] == 400
+        assert results[2]["detail"]["error_code"] == "LIMIT_REACHED"
+        assert results[2]["detail"]["current_debt"] == 400
+        assert results[3]["new_balance"] == 500
+
+        alice = await User.find_one(User.student_id == 1)
+        assert alice.account_balance == 500 # type: ignore
+        assert await Purchase.find(Purchase.student_id == 1).count() == 3
+
+    async def test_per_item_errors(self):
+        results = await process_scan_batch([
+            self.scan("unknowncard", 1, 0),
+            self.scan("unlinkedcard", 1, 1),
+            self.scan("deadcard", 1, 2),
+            self.scan("bobcard", 1, 3),
+            self.scan("alicecard", 7, 4),
+            self.scan("alicecard", 5, 5),
+        ])
+
+        assert [r["status_code"] for r in results] == [404, 404, 403, 403, 404, 400]
+        assert results[3]["detail"] == "User is inactive"
+        assert await Purchase.find_all().count() == 0
+
+    async def test_replays_and_double_taps(self):
+        await Purchase(
+            student_id=1, shelf_id="shelf1", price=100,
+            status=PurchaseStatus.completed, idempotency_key="already-charged"
+        ).insert()
+
+        results = await process_scan_batch([
+            self.scan("alicecard", 1, 0, idempotency_key="already-charged"),
+            self.scan("alicecard", 2, 100),
+            # double tap on the same shelf one second later
+            self.scan("alicecard", 2, 101),
+        ])
+
+        assert results[0]["replayed"] is True
+        # Recorded before balances were kept with purchases
+        assert "new_balance" not in results[0]
+        assert results[1]["status"] == "success"
+        assert results[2]["replayed"] is True
+        assert results[2]["new_balance"] == results[1]["new_balance"]
+        assert await Purchase.find(Purchase.student_id == 1).count() == 2
@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from models import Purchase, PurchaseStatus
+
+DUPLICATE_WINDOW_ENV = "SCAN_DUPLICATE_WINDOW_SECONDS"
+DEFAULT_DUPLICATE_WINDOW_SECONDS = 2.0
+
+
+def load_duplicate_window() -> timedelta:
+    """Read SCAN_DUPLICATE_WINDOW_SECONDS; raises RuntimeError on a malformed value so it stops startup."""
+    value = os.getenv(DUPLICATE_WINDOW_ENV, str(DEFAULT_DUPLICATE_WINDOW_SECONDS))
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = -1.0
+    if not seconds >= 0:
+        raise RuntimeError(f"{DUPLICATE_WINDOW_ENV} must be a number of seconds >= 0, got {value!r}")
+    return timedelta(seconds=seconds)
+
+
+class ScanSettings:
+    """Double-tap window of the running app, read once by `load` at startup."""
+
+    def __init__(self):
+        self.duplicate_window = timedelta(seconds=DEFAULT_DUPLICATE_WINDOW_SECONDS)
+
+    def load(self) -> timedelta:
+        self.duplicate_window = load_duplicate_window()
+        return self.duplicate_window
+
+
+scan_settings = ScanSettings()
+
+
+def get_duplicate_window() -> timedelta:
+    return scan_settings.duplicate_window
+
+
+async def find_previous_scan(
+    idempotency_key: Optional[str],
+    student_id: int,
+    shelf_id: str,
+    scanned_at: datetime,
+    window: Optional[timedelta] = None,
+) -> Optional[Purchase]:
+    """
+    Return the purchase an incoming scan duplicates, if any.
+
+    A scan is a duplicate when a purchase already carries its idempotency key
+    (a retried request), or when the same student bought from the same shelf
+    within the duplicate window around the scan time (a double tap on the
+    reader). `window` defaults to the configured one; 0 disables double-tap
+    suppression.
+    """
+    if idempotency_key:
+        purchase = await Purchase.find_one(Purchase.idempotency_key == idempotency_key)
+        if purchase:
+            return purchase
+
+    if window is None:
+        window = get_duplicate_window()
+    if window <= timedelta(0):
+        return None
+
+    return await Purchase.find_one(
+        Purchase.student_id == student_id,
+        Purchase.shelf_id == shelf_id,
+        Purchase.status == PurchaseStatus.completed,
+        Purchase.created_at >= scanned_at - window,
+        Purchase.created_at <= scanned_at + window,
+    )
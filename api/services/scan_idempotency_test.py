@@ -0,0 +1,42 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import Purchase, PurchaseStatus
+from services.scan_idempotency import ScanSettings, find_previous_scan, get_duplicate_window, load_duplicate_window
+
+
+@pytest.mark.asyncio
+class TestDuplicateWindow:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[Purchase]) # type: ignore
+
+    async def test_get_duplicate_window(self, monkeypatch: pytest.MonkeyPatch):
+        settings = ScanSettings()
+        monkeypatch.setattr("services.scan_idempotency.scan_settings", settings)
+        monkeypatch.delenv("SCAN_DUPLICATE_WINDOW_SECONDS", raising=False)
+        assert settings.load() == timedelta(seconds=2)
+        monkeypatch.setenv("SCAN_DUPLICATE_WINDOW_SECONDS", "0.5")
+        assert get_duplicate_window() == timedelta(seconds=2)
+        settings.load()
+        assert get_duplicate_window() == timedelta(seconds=0.5)
+
+    @pytest.mark.parametrize("value", ["two", "-1", "nan"])
+    async def test_bad_duplicate_window_fails_at_load(self, monkeypatch: pytest.MonkeyPatch, value: str):
+        monkeypatch.setenv("SCAN_DUPLICATE_WINDOW_SECONDS", value)
+        with pytest.raises(RuntimeError, match="SCAN_DUPLICATE_WINDOW_SECONDS must be a number of seconds"):
+            load_duplicate_window()
+
+    async def test_injected_window(self):
+        now = datetime.now(timezone.utc)
+        await Purchase(
+            student_id=1, shelf_id="shelf1", price=50, status=PurchaseStatus.completed, created_at=now
+        ).insert()
+
+        assert await find_previous_scan(None, 1, "shelf1", now + timedelta(seconds=1), timedelta(seconds=2))
+        assert await find_previous_scan(None, 1, "shelf1", now + timedelta(seconds=1), timedelta(0)) is None
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from fastapi import HTTPException, WebSocket
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+from schema import ScanFrame, ScanRequest
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = 32
+
+
+class ScannerChannel:
+    """
+    Serves one reader daemon connected to /ws/scanner.
+
+    Each text frame is a ScanFrame. Scans are processed concurrently (up to
+    `max_in_flight`; reading pauses beyond that) and every response frame
+    carries the request's `id`, so responses may arrive out of order:
+
+        -> {"id": 1, "scan": {"idm": "...", "usb_port": 1, "timestamp": "..."}}
+        <- {"id": 1, "status_code": 200, "result": {...}}
+        <- {"id": 2, "status_code": 400, "detail": {...}}
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        handle_scan: Callable[[ScanRequest], Awaitable[Any]],
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ):
+        self.__websocket = websocket
+        self.__handle_scan = handle_scan
+        self.__slots = asyncio.Semaphore(max_in_flight)
+        self.__send_lock = asyncio.Lock()
+        self.__tasks: Set[asyncio.Task] = set()
+
+    async def serve(self):
+        await self.__websocket.accept()
+        try:
+            while True:
+                raw = await self.__websocket.receive_text()
+                await self.__slots.acquire()
+                task = asyncio.create_task(self.__process(raw))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+        finally:
+            # Scans already received are finished; replies to a closed socket are dropped
+            if self.__tasks:
+                await asyncio.gather(*self.__tasks, return_exceptions=True)
+
+    async def __process(self, raw: str):
+        try:
+            try:
+                frame = ScanFrame.model_validate_json(raw)
+            except ValidationError as e:
+                await self.__send({"id": _frame_id(raw), "status_code": 422, "detail": e.errors(include_url=False)})
+                return
+
+            try:
+                result = await self.__handle_scan(frame.scan)
+            except HTTPException as e:
+                await self.__send({"id": frame.id, "status_code": e.status_code, "detail": e.detail})
+                return
+            except Exception as e:
+                logger.exception(f"Scanner frame {frame.id} failed: {e}")
+                await self.__send({"id": frame.id, "status_code": 500, "detail": "Internal Server Error"})
+                return
+            await self.__send({"id": frame.id, "status_code": 200, "result": result})
+        finally:
+            self.__slots.release()
+
+    async def __send(self, payload: dict):
+        async with self.__send_lock:
+            try:
+                await self.__websocket.send_json(jsonable_encoder(payload))
+            except Exception as e:
+                logger.warning(f"Dropping scanner reply {payload.get('id')}: {e}")
+
+
+def _frame_id(raw: str) -> Optional[Any]:
+    try:
+        frame = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    return frame.get("id") if isinstance(frame, dict) else None
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException, WebSocketDisconnect
+from pytest_mock import MockerFixture
+
+from schema import ScanRequest
+from services.scanner_ws import ScannerChannel
+
+
+def fake_websocket(mocker: MockerFixture, frames):
+    ws = mocker.MagicMock()
+    ws.accept = mocker.AsyncMock()
+    ws.send_json = mocker.AsyncMock()
+    ws.receive_text = mocker.AsyncMock(side_effect=[json.dumps(f) if isinstance(f, dict) else f for f in frames] + [WebSocketDisconnect()])
+    return ws
+
+
+def replies(ws) -> dict:
+    return {call.args[0]["id"]: call.args[0] for call in ws.send_json.await_args_list}
+
+
+@pytest.mark.asyncio
+class TestScannerChannel:
+
+    async def test_replies_with_correlation_ids(self, mocker: MockerFixture):
+        async def handle_scan(scan: ScanRequest):
+            if scan.normalized_uid == "unknown":
+                raise HTTPException(404, "Card not registered to a student")
+            return {"status": "success", "student_name": "Alice", "port": scan.usb_port}
+
+        ws = fake_websocket(mocker, [
+            {"id": "a", "scan": {"idm": "ALICECARD", "usb_port": 1}},
+            {"id": 2, "scan": {"idm": "unknown", "usb_port": 2}},
+            {"id": "bad", "scan": {"idm": "x", "usb_port": 9}},
+            "not json",
+        ])
+
+        with pytest.raises(WebSocketDisconnect):
+            await ScannerChannel(ws, handle_scan).serve()
+
+        ws.accept.assert_awaited_once()
+        by_id = replies(ws)
+        assert by_id["a"] == {"id": "a", "status_code": 200, "result": {"status": "success", "student_name": "Alice", "port": 1}}
+        assert by_id[2] == {"id": 2, "status_code": 404, "detail": "Card not registered to a student"}
+        assert by_id["bad"]["status_code"] == 422
+        assert by_id[None]["status_code"] == 422
+
+    async def test_processes_scans_concurrently(self, mocker: MockerFixture):
+        running = 0
+        peak = 0
+
+        async def handle_scan(scan: ScanRequest):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"status": "success"}
+
+        ws = fake_websocket(mocker, [{"id": n, "scan": {"idm": f"card{n}", "usb_port": 1}} for n in range(10)])
+
+        with pytest.raises(WebSocketDisconnect):
+            await ScannerChannel(ws, handle_scan, max_in_flight=4).serve()
+
+        assert sorted(replies(ws)) == list(range(10))
+        assert peak == 4
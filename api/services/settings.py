@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from models import SystemSetting
+from schema import SystemSettingOut
+
+logger = logging.getLogger(__name__)
+
+MAX_DEBT_LIMIT_KEY = "max_debt_limit"
+DEFAULT_MAX_DEBT_LIMIT = 2000
+
+# Settings with a known type. Values are stored as strings in the database and
+# parsed once, when a snapshot is built, instead of on every request.
+SETTING_PARSERS: Dict[str, Callable[[str], Any]] = {
+    MAX_DEBT_LIMIT_KEY: int,
+}
+
+
+def parse_setting_value(key: str, value: str) -> Any:
+    """Parse a raw setting value. Raises ValueError for an invalid typed value."""
+    parser = SETTING_PARSERS.get(key)
+    return parser(value) if parser else value
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    version: int
+    rows: Mapping[str, SystemSettingOut]
+    max_debt_limit: int
+
+    @classmethod
+    def build(cls, version: int, rows: Dict[str, SystemSettingOut]) -> "SettingsSnapshot":
+        max_debt_limit = DEFAULT_MAX_DEBT_LIMIT
+        if MAX_DEBT_LIMIT_KEY in rows:
+            try:
+                max_debt_limit = parse_setting_value(MAX_DEBT_LIMIT_KEY, rows[MAX_DEBT_LIMIT_KEY].value)
+            except ValueError:
+                logger.warning(
+                    f"Invalid {MAX_DEBT_LIMIT_KEY} value {rows[MAX_DEBT_LIMIT_KEY].value!r}, "
+                    f"using default {DEFAULT_MAX_DEBT_LIMIT}"
+                )
+        return cls(version=version, rows=MappingProxyType(dict(rows)), max_debt_limit=max_debt_limit)
+
+
+class SettingsService:
+    """
+    Holds an immutable, versioned snapshot of every SystemSetting row.
+
+    Writes swap in a new snapshot right away; the change stream watcher reloads
+    it in every worker. Until the first load, reads go to the database.
+    """
+    __snapshot: Optional[SettingsSnapshot]
+
+    def __init__(self):
+        self.__snapshot = None
+        self.__version = 0
+        self.__lock = asyncio.Lock()
+
+    @property
+    def snapshot(self) -> Optional[SettingsSnapshot]:
+        return self.__snapshot
+
+    def __swap(self, rows: Dict[str, SystemSettingOut]) -> SettingsSnapshot:
+        self.__version += 1
+        self.__snapshot = SettingsSnapshot.build(self.__version, rows)
+        return self.__snapshot
+
+    async def load(self):
+        async with self.__lock:
+            settings = await SystemSetting.find().to_list()
+            snapshot = self.__swap({
+                s.key: SystemSettingOut.model_validate(s) for s in settings
+            })
+        logger.info(f"Settings snapshot v{snapshot.version} loaded with {len(snapshot.rows)} settings")
+
+    async def refresh(self):
+        await self.load()
+
+    def apply(self, setting: SystemSetting):
+        """Swap in a snapshot containing a setting that was just written."""
+        if self.__snapshot is None:
+            return
+        rows = dict(self.__snapshot.rows)
+        rows[setting.key] = SystemSettingOut.model_validate(setting)
+        self.__swap(rows)
+
+    async def get(self, key: str) -> Optional[SystemSettingOut]:
+        snapshot = self.__snapshot
+        if snapshot is not None:
+            return snapshot.rows.get(key)
+
+        setting = await SystemSetting.find_one(SystemSetting.key == key)
+        return SystemSettingOut.model_validate(setting) if setting else None
+
+    async def max_debt_limit(self) -> int:
+        snapshot = self.__snapshot
+        if snapshot is not None:
+            return snapshot.max_debt_limit
+
+        limit_doc = await SystemSetting.find_one(SystemSetting.key == MAX_DEBT_LIMIT_KEY)
+        return int(limit_doc.value) if limit_doc else DEFAULT_MAX_DEBT_LIMIT
+
+
+settings_service = SettingsService()
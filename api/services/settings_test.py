@@ -0,0 +1,68 @@
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import SystemSetting
+from services.settings import DEFAULT_MAX_DEBT_LIMIT, SettingsService, parse_setting_value
+
+
+@pytest.mark.asyncio
+class TestSettingsService:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[SystemSetting]) # type: ignore
+        await SystemSetting(key="max_debt_limit", value="3000").insert()
+        await SystemSetting(key="shop_name", value="Lab Shop").insert()
+
+    async def test_load_builds_typed_snapshot(self, mocker: MockerFixture):
+        service = SettingsService()
+        await service.load()
+
+        snapshot = service.snapshot
+        assert snapshot is not None
+        assert snapshot.version == 1
+        assert snapshot.max_debt_limit == 3000
+        assert snapshot.rows["shop_name"].value == "Lab Shop"
+
+        findone_mock = mocker.patch.object(SystemSetting, "find_one", new_callable=mocker.AsyncMock)
+        assert await service.max_debt_limit() == 3000
+        assert (await service.get("shop_name")).value == "Lab Shop" # type: ignore
+        assert await service.get("missing") is None
+        findone_mock.assert_not_called()
+
+    async def test_not_loaded_falls_back_to_db(self):
+        service = SettingsService()
+        assert service.snapshot is None
+        assert await service.max_debt_limit() == 3000
+        assert (await service.get("shop_name")).value == "Lab Shop" # type: ignore
+
+    async def test_apply_swaps_snapshot(self):
+        service = SettingsService()
+        await service.load()
+        before = service.snapshot
+
+        setting = await SystemSetting.find_one(SystemSetting.key == "max_debt_limit")
+        await setting.set({SystemSetting.value: "500"}) # type: ignore
+        service.apply(setting) # type: ignore
+
+        after = service.snapshot
+        assert after is not None and before is not None
+        assert after.version == before.version + 1
+        assert after.max_debt_limit == 500
+        assert before.max_debt_limit == 3000
+
+    async def test_invalid_limit_uses_default(self):
+        await SystemSetting.find_one(SystemSetting.key == "max_debt_limit").set({SystemSetting.value: "lots"}) # type: ignore
+        service = SettingsService()
+        await service.load()
+        assert service.snapshot.max_debt_limit == DEFAULT_MAX_DEBT_LIMIT # type: ignore
+
+    async def test_parse_setting_value(self):
+        assert parse_setting_value("max_debt_limit", "1500") == 1500
+        assert parse_setting_value("shop_name", "Lab Shop") == "Lab Shop"
+        with pytest.raises(ValueError):
+            parse_setting_value("max_debt_limit", "abc")
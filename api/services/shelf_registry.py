@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from typing import Dict, NamedTuple, Optional
+
+from models import Shelf
+
+logger = logging.getLogger(__name__)
+
+
+class ShelfEntry(NamedTuple):
+    shelf_id: str
+    price: int
+
+
+class ShelfRegistry:
+    """
+    In-memory usb_port -> (shelf_id, price) map used on the scan path.
+
+    Loaded once at startup and reloaded whenever a shelf is created or the
+    `shelf` collection changes. Until it is loaded, lookups go to the database;
+    during a reload they keep using the previous map, which the new one
+    replaces in a single assignment.
+    """
+    __by_port: Optional[Dict[int, ShelfEntry]]
+
+    def __init__(self):
+        self.__by_port = None
+        self.__lock = asyncio.Lock()
+
+    def is_loaded(self) -> bool:
+        return self.__by_port is not None
+
+    async def load(self):
+        async with self.__lock:
+            shelves = await Shelf.find().to_list()
+            by_port = {
+                shelf.usb_port: ShelfEntry(shelf_id=shelf.shelf_id, price=shelf.price)
+                for shelf in shelves
+            }
+            self.__by_port = by_port
+        logger.info(f"Shelf registry loaded {len(by_port)} shelves")
+
+    async def refresh(self):
+        await self.load()
+
+    async def get_by_port(self, usb_port: int) -> Optional[ShelfEntry]:
+        by_port = self.__by_port
+        if by_port is not None:
+            return by_port.get(usb_port)
+
+        shelf = await Shelf.find_one(Shelf.usb_port == usb_port)
+        if not shelf:
+            return None
+        return ShelfEntry(shelf_id=shelf.shelf_id, price=shelf.price)
+
+
+shelf_registry = ShelfRegistry()
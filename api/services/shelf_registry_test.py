@@ -0,0 +1,61 @@
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+from mongomock_motor import AsyncMongoMockClient
+from beanie import init_beanie
+
+from models import Shelf
+from services.shelf_registry import ShelfEntry, ShelfRegistry
+
+
+@pytest.mark.asyncio
+class TestShelfRegistry:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self):
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client.get_database("labshop_test"), document_models=[Shelf]) # type: ignore
+        await Shelf(shelf_id="shelf1", usb_port=1, price=100).insert()
+        await Shelf(shelf_id="shelf2", usb_port=2, price=150).insert()
+
+    async def test_load_serves_from_memory(self, mocker: MockerFixture):
+        registry = ShelfRegistry()
+        await registry.load()
+        assert registry.is_loaded()
+
+        findone_mock = mocker.patch.object(Shelf, "find_one", new_callable=mocker.AsyncMock)
+        assert await registry.get_by_port(1) == ShelfEntry(shelf_id="shelf1", price=100)
+        assert await registry.get_by_port(2) == ShelfEntry(shelf_id="shelf2", price=150)
+        assert await registry.get_by_port(3) is None
+        findone_mock.assert_not_called()
+
+    async def test_not_loaded_falls_back_to_db(self):
+        registry = ShelfRegistry()
+        assert not registry.is_loaded()
+        assert await registry.get_by_port(2) == ShelfEntry(shelf_id="shelf2", price=150)
+        assert await registry.get_by_port(6) is None
+
+    async def test_refresh_picks_up_new_shelf(self):
+        registry = ShelfRegistry()
+        await registry.load()
+        await Shelf(shelf_id="shelf3", usb_port=3, price=80).insert()
+        assert await registry.get_by_port(3) is None
+
+        await registry.refresh()
+        assert await registry.get_by_port(3) == ShelfEntry(shelf_id="shelf3", price=80)
+
+    async def test_lookups_stay_in_memory_during_refresh(self, mocker: MockerFixture):
+        registry = ShelfRegistry()
+        await registry.load()
+        findone_mock = mocker.patch.object(Shelf, "find_one", new_callable=mocker.AsyncMock)
+
+        async def find_all():
+            # Scans served while the reload is waiting on the database
+            assert registry.is_loaded()
+            assert await registry.get_by_port(1) == ShelfEntry(shelf_id="shelf1", price=100)
+            return []
+        mocker.patch.object(Shelf, "find", return_value=mocker.Mock(to_list=find_all))
+
+        await registry.refresh()
+        findone_mock.assert_not_called()
+        assert await registry.get_by_port(1) is None
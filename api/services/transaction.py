@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from fastapi import HTTPException
+from pymongo.errors import PyMongoError
+
+from models import User
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 0.01
+MAX_DELAY_SECONDS = 0.5
+
+TRANSIENT_TRANSACTION_ERROR = "TransientTransactionError"
+UNKNOWN_COMMIT_RESULT = "UnknownTransactionCommitResult"
+
+
+def backoff_delay(attempt: int, base: float = BASE_DELAY_SECONDS, cap: float = MAX_DELAY_SECONDS) -> float:
+    """Exponential backoff with full jitter for the given (1-based) failed attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def abort_reason(error: BaseException) -> str:
+    if isinstance(error, HTTPException):
+        return f"http_{error.status_code}"
+    if isinstance(error, PyMongoError):
+        details = getattr(error, "details", None) or {}
+        return details.get("codeName") or type(error).__name__
+    return type(error).__name__
+
+
+class TransactionStats:
+    """
+    Per-route commit, retry and abort counters for transactional units of work.
+
+    Business rejections (HTTPExceptions such as a reached debt limit) are
+    counted apart from aborts, which then only measure contention and failures.
+    """
+
+    def __init__(self):
+        self.commits: Counter = Counter()
+        self.retries: Dict[str, Counter] = defaultdict(Counter)
+        self.aborts: Dict[str, Counter] = defaultdict(Counter)
+        self.rejections: Dict[str, Counter] = defaultdict(Counter)
+
+    def record_commit(self, name: str):
+        self.commits[name] += 1
+
+    def record_retry(self, name: str, reason: str):
+        self.retries[name][reason] += 1
+
+    def record_abort(self, name: str, reason: str):
+        self.aborts[name][reason] += 1
+
+    def record_rejection(self, name: str, reason: str):
+        self.rejections[name][reason] += 1
+
+    def snapshot(self) -> dict:
+        names = set(self.commits) | set(self.retries) | set(self.aborts) | set(self.rejections)
+        return {
+            name: {
+                "commits": self.commits[name],
+                "retries": sum(self.retries[name].values()),
+                "retry_reasons": dict(self.retries[name]),
+                "aborts": dict(self.aborts[name]),
+                "rejected": dict(self.rejections[name]),
+            }
+            for name in sorted(names)
+        }
+
+    def reset(self):
+        self.commits.clear()
+        self.retries.clear()
+        self.aborts.clear()
+        self.rejections.clear()
+
+
+transaction_stats = TransactionStats()
+
+
+async def run_in_transaction(
+    name: str,
+    work: Callable[..., Awaitable[T]],
+    max_attempts: int = MAX_ATTEMPTS,
+) -> T:
+    """
+    Run `work(session)` inside a transaction, retrying transient failures.
+
+    The whole unit of work is retried on TransientTransactionError (e.g. a
+    write conflict); only the commit is retried on
+    UnknownTransactionCommitResult, so a commit that did go through is never
+    applied twice. Retries back off exponentially with jitter and give up after
+    `max_attempts`. Anything else `work` raises (HTTPException included) aborts
+    the transaction and propagates. Outcomes are counted in `transaction_stats`
+    under `name`, HTTPExceptions as rejections rather than aborts.
+    """
+    client = User.get_pymongo_collection().database.client
+
+    async with await client.start_session() as session:
+        attempt = 1
+        while True:
+            session.start_transaction()
+            try:
+                result = await work(session)
+            except BaseException as e:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                if (
+                    isinstance(e, PyMongoError)
+                    and e.has_error_label(TRANSIENT_TRANSACTION_ERROR)
+                    and attempt < max_attempts
+                ):
+                    await _before_retry(name, e, attempt)
+                    attempt += 1
+                    continue
+                if isinstance(e, HTTPException):
+                    transaction_stats.record_rejection(name, abort_reason(e))
+                else:
+                    transaction_stats.record_abort(name, abort_reason(e))
+                raise
+
+            committed = await _commit(name, session, attempt, max_attempts)
+            if committed:
+                transaction_stats.record_commit(name)
+                return result
+            attempt += 1
+
+
+async def _commit(name: str, session, attempt: int, max_attempts: int) -> bool:
+    """Commit, retrying unknown results. Returns False if the whole transaction should be retried."""
+    commit_attempt = 1
+    while True:
+        try:
+            await session.commit_transaction()
+            return True
+        except PyMongoError as e:
+            if e.has_error_label(UNKNOWN_COMMIT_RESULT) and commit_attempt < max_attempts:
+                await _before_retry(name, e, commit_attempt)
+                commit_attempt += 1
+                continue
+            if e.has_error_label(TRANSIENT_TRANSACTION_ERROR) and attempt < max_attempts:
+                await _before_retry(name, e, attempt)
+                return False
+            transaction_stats.record_abort(name, abort_reason(e))
+            raise
+
+
+async def _before_retry(name: str, error: PyMongoError, attempt: int):
+    reason = abort_reason(error)
+    transaction_stats.record_retry(name, reason)
+    delay = backoff_delay(attempt)
+    logger.warning(f"Transaction '{name}' attempt {attempt} failed ({reason}), retrying in {delay * 1000:.0f}ms")
+    await asyncio.sleep(delay)
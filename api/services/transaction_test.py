@@ -0,0 +1,87 @@
+import pytest
+import pytest_asyncio
+from pytest_mock import MockerFixture
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure
+
+from models import User
+from services.transaction import run_in_transaction, transaction_stats
+
+
+def transient_error() -> OperationFailure:
+    return OperationFailure(
+        "Write conflict", code=112,
+        details={"codeName": "WriteConflict", "errorLabels": ["TransientTransactionError"]}
+    )
+
+
+def unknown_commit_error() -> OperationFailure:
+    return OperationFailure(
+        "Commit timed out", code=50,
+        details={"codeName": "MaxTimeMSExpired", "errorLabels": ["UnknownTransactionCommitResult"]}
+    )
+
+
+@pytest.mark.asyncio
+class TestRunInTransaction:
+
+    @pytest_asyncio.fixture(autouse=True)
+    async def test_setup(self, mocker: MockerFixture):
+        self.session = mocker.AsyncMock(name="MotorSession")
+        self.session.__aenter__.return_value = self.session
+        self.session.start_transaction = mocker.Mock()
+        self.session.in_transaction = True
+
+        client = mocker.MagicMock()
+        client.start_session = mocker.AsyncMock(return_value=self.session)
+        collection = mocker.MagicMock()
+        collection.database.client = client
+        mocker.patch.object(User, "get_pymongo_collection", return_value=collection)
+        mocker.patch("services.transaction.asyncio.sleep", new_callable=mocker.AsyncMock)
+        transaction_stats.reset()
+
+    async def test_commits_on_success(self, mocker: MockerFixture):
+        work = mocker.AsyncMock(return_value="done")
+
+        assert await run_in_transaction("route", work) == "done"
+        work.assert_awaited_once_with(self.session)
+        self.session.commit_transaction.assert_awaited_once()
+        assert transaction_stats.snapshot()["route"]["commits"] == 1
+
+    async def test_retries_transient_error(self, mocker: MockerFixture):
+        work = mocker.AsyncMock(side_effect=[transient_error(), transient_error(), "done"])
+
+        assert await run_in_transaction("route", work) == "done"
+        assert work.await_count == 3
+        assert self.session.abort_transaction.await_count == 2
+        stats = transaction_stats.snapshot()["route"]
+        assert stats["retries"] == 2
+        assert stats["retry_reasons"] == {"WriteConflict": 2}
+        assert stats["commits"] == 1
+
+    async def test_gives_up_after_max_attempts(self, mocker: MockerFixture):
+        work = mocker.AsyncMock(side_effect=transient_error())
+
+        with pytest.raises(OperationFailure):
+            await run_in_transaction("route", work, max_attempts=3)
+        assert work.await_count == 3
+        assert transaction_stats.snapshot()["route"]["aborts"] == {"WriteConflict": 1}
+
+    async def test_unknown_commit_result_retries_commit_only(self, mocker: MockerFixture):
+        work = mocker.AsyncMock(return_value="done")
+        self.session.commit_transaction.side_effect = [unknown_commit_error(), None]
+
+        assert await run_in_transaction("route", work) == "done"
+        work.assert_awaited_once()
+        assert self.session.commit_transaction.await_count == 2
+
+    async def test_http_exception_aborts_without_retry(self, mocker: MockerFixture):
+        work = mocker.AsyncMock(side_effect=HTTPException(400, "Debt limit reached"))
+
+        with pytest.raises(HTTPException):
+            await run_in_transaction("route", work)
+        work.assert_awaited_once()
+        self.session.abort_transaction.assert_awaited_once()
+        # A rejection, not contention
+        assert transaction_stats.snapshot()["route"]["aborts"] == {}
+        assert transaction_stats.snapshot()["route"]["rejected"] == {"http_400": 1}
@@ -1,8 +1,30 @@
+import asyncio
+import logging
+import os
+from enum import Enum
 from fastapi import WebSocket
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
+from services.backplane import Backplane, backplane_from_env
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATION = "default"
+DEFAULT_QUEUE_SIZE = 32
+QUEUE_SIZE_ENV = "TABLET_QUEUE_SIZE"
+OVERFLOW_ENV = "TABLET_OVERFLOW"
+DEFAULT_PING_INTERVAL = 15.0
+DEFAULT_PING_TIMEOUT = 10.0
+DEFAULT_SEND_TIMEOUT = 5.0
+PING_INTERVAL_ENV = "TABLET_PING_INTERVAL"
+PING_TIMEOUT_ENV = "TABLET_PING_TIMEOUT"
+SEND_TIMEOUT_ENV = "TABLET_SEND_TIMEOUT"
+
+PING = "PING"
+PONG = "PONG"
+
 class WSSchema(BaseModel):
     action: str
     student_id: Optional[str] = None
@@ -10,35 +32,207 @@ class WSSchema(BaseModel):
     student_name: Optional[str] = None
     debt_amount: Optional[int] = None
     price: Optional[int] = None
+    balance: Optional[int] = None
+    status: Optional[str] = None
 
-class ConnectionManager:
-    __tablet_connection: WebSocket | None
+class OverflowPolicy(str, Enum):
+    # Drop the oldest queued payload to make room: the tablet shows the latest state
+    drop_oldest = "drop_oldest"
+    # Drop the payload being sent
+    drop_newest = "drop_newest"
+    # Disconnect the tablet; it reconnects and starts from a clean slate
+    disconnect = "disconnect"
+
+class TabletConnection:
+    """
+    One tablet's socket with its bounded outbound queue and writer task.
+
+    `enqueue` never waits on the socket, so a slow or stuck tablet only
+    delays its own payloads. A heartbeat task sends a PING every
+    `ping_interval` seconds and closes the connection when nothing has been
+    received from the tablet within `ping_timeout` of it; a send that takes
+    longer than `send_timeout` closes it as well.
+    """
 
-    def __init__(self):
-        self.__tablet_connection = None
+    def __init__(
+        self,
+        websocket: WebSocket,
+        station: str,
+        queue_size: int,
+        overflow: OverflowPolicy,
+        ping_interval: float = DEFAULT_PING_INTERVAL,
+        ping_timeout: float = DEFAULT_PING_TIMEOUT,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+    ):
+        self.websocket = websocket
+        self.station = station
+        self.overflow = overflow
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.last_seen = asyncio.get_running_loop().time()
+        self.__queue: "asyncio.Queue[dict]" = asyncio.Queue(queue_size)
+        self.__tasks: List[asyncio.Task] = []
+        self.__closed = asyncio.Event()
 
     @property
-    def tablet_connection(self) -> WebSocket:
-        if self.__tablet_connection:
-            return self.__tablet_connection
-        raise ConnectionError("No tablet connected")
+    def closed(self) -> bool:
+        return self.__closed.is_set()
 
-    async def connect_tablet(self, websocket: WebSocket):
-        await websocket.accept()
-        self.__tablet_connection = websocket
+    def start(self):
+        self.__tasks = [asyncio.create_task(self.__write()), asyncio.create_task(self.__heartbeat())]
+
+    def received(self, data: str) -> bool:
+        """Record that the tablet is alive; True if `data` was a heartbeat reply and needs no handling."""
+        self.last_seen = asyncio.get_running_loop().time()
+        try:
+            return WSSchema.model_validate_json(data).action == PONG
+        except ValueError:
+            return False
+
+    def enqueue(self, message: dict) -> bool:
+        """Queue `message` for sending; False if it was dropped (or the tablet disconnected) by the overflow policy."""
+        if self.closed:
+            return False
+        if self.__queue.full():
+            self.dropped += 1
+            if self.overflow == OverflowPolicy.drop_newest:
+                return False
+            if self.overflow == OverflowPolicy.disconnect:
+                logger.warning(f"Tablet '{self.station}' fell {self.__queue.qsize()} payloads behind, disconnecting")
+                self.close()
+                return False
+            self.__queue.get_nowait()
+        self.__queue.put_nowait(message)
+        return True
 
-    def is_connected(self) -> bool:
-        return self.__tablet_connection is not None
-    
-    async def disconnect_tablet(self):
-        self.__tablet_connection = None
+    async def wait_closed(self):
+        await self.__closed.wait()
 
-    async def send_payload_to_tablet(self, payload: WSSchema):
-        if self.__tablet_connection:
-            await self.__tablet_connection.send_json(payload.model_dump())
+    def close(self):
+        if self.closed:
             return
-        raise ConnectionError("No tablet connected")
+        self.__closed.set()
+        for task in self.__tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+        asyncio.create_task(self.__close_socket())
 
+    async def __close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            # Already closed by the peer
+            pass
 
-ws_connection_manager = ConnectionManager()
+    async def __write(self):
+        try:
+            while True:
+                message = await self.__queue.get()
+                await asyncio.wait_for(self.websocket.send_json(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Sending to tablet '{self.station}' timed out after {self.send_timeout}s, disconnecting")
+            self.close()
+        except Exception as e:
+            logger.warning(f"Sending to tablet '{self.station}' failed: {e!r}")
+            self.close()
+
+    async def __heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            pinged_at = loop.time()
+            self.enqueue(WSSchema(action=PING).model_dump(exclude_none=True))
+            await asyncio.sleep(self.ping_timeout)
+            if self.last_seen < pinged_at:
+                logger.warning(f"Tablet '{self.station}' missed its heartbeat, disconnecting")
+                self.close()
+                return
+
+class ConnectionManager:
+    """
+    Tablets connected over /ws/tablet, keyed by station.
+
+    A tablet reconnecting under the same station replaces (and closes) its
+    previous connection. Payloads go to one station or to every tablet through
+    the backplane, which reaches tablets connected to other API workers too
+    (see services/backplane.py). Locally they are only queued; each
+    connection's writer task does the sending.
+    """
+
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        overflow: Optional[OverflowPolicy] = None,
+        ping_interval: Optional[float] = None,
+        ping_timeout: Optional[float] = None,
+        send_timeout: Optional[float] = None,
+        backplane: Optional[Backplane] = None,
+    ):
+        self.queue_size = queue_size or int(os.getenv(QUEUE_SIZE_ENV, DEFAULT_QUEUE_SIZE))
+        self.overflow = overflow or OverflowPolicy(os.getenv(OVERFLOW_ENV, OverflowPolicy.drop_oldest.value))
+        self.ping_interval = ping_interval or float(os.getenv(PING_INTERVAL_ENV, DEFAULT_PING_INTERVAL))
+        self.ping_timeout = ping_timeout or float(os.getenv(PING_TIMEOUT_ENV, DEFAULT_PING_TIMEOUT))
+        self.send_timeout = send_timeout or float(os.getenv(SEND_TIMEOUT_ENV, DEFAULT_SEND_TIMEOUT))
+        self.__tablets: Dict[str, TabletConnection] = {}
+        self.backplane = backplane or backplane_from_env()
+        self.backplane.attach(self.deliver, self.stations)
+
+    def stations(self) -> List[str]:
+        """Stations with a tablet connected to this worker."""
+        return [station for station, tablet in self.__tablets.items() if not tablet.closed]
+
+    def is_connected(self, station: Optional[str] = None) -> bool:
+        """Whether a tablet (at `station`) is connected to this worker."""
+        if station is None:
+            return bool(self.stations())
+        return station in self.stations()
+
+    async def connect_tablet(self, websocket: WebSocket, station: str = DEFAULT_STATION) -> TabletConnection:
+        await websocket.accept()
+        tablet = TabletConnection(
+            websocket, station, self.queue_size, self.overflow,
+            self.ping_interval, self.ping_timeout, self.send_timeout,
+        )
+        previous = self.__tablets.get(station)
+        self.__tablets[station] = tablet
+        if previous:
+            logger.info(f"Tablet '{station}' reconnected, closing its previous connection")
+            previous.close()
+        tablet.start()
+        await self.backplane.joined(station)
+        return tablet
 
+    async def disconnect_tablet(self, tablet: TabletConnection):
+        tablet.close()
+        # A newer connection for the station may already have taken its place
+        if self.__tablets.get(tablet.station) is tablet:
+            del self.__tablets[tablet.station]
+            await self.backplane.left(tablet.station)
+
+    async def send_payload_to_tablet(self, payload: WSSchema, station: Optional[str] = None) -> int:
+        """
+        Send `payload` to the tablet at `station`, or to every tablet, on any worker.
+
+        Returns the number of tablets it was sent to; raises ConnectionError
+        when there is none to send to.
+        """
+        stations = await self.backplane.stations()
+        if not stations or (station is not None and station not in stations):
+            raise ConnectionError("No tablet connected")
+        return await self.backplane.publish(payload.model_dump(exclude_none=True), station)
+
+    def deliver(self, message: dict, station: Optional[str] = None) -> int:
+        """Queue `message` for this worker's tablet at `station`, or for all of them."""
+        if station is None:
+            targets = [tablet for tablet in self.__tablets.values() if not tablet.closed]
+        else:
+            tablet = self.__tablets.get(station)
+            targets = [tablet] if tablet and not tablet.closed else []
+        return sum(tablet.enqueue(message) for tablet in targets)
+
+
+ws_connection_manager = ConnectionManager()
@@ -1,64 +1,167 @@
+import asyncio
+
 import pytest
 from pytest_mock import MockerFixture
 
-from services.ws import ConnectionManager, WSSchema
-    
+from services.ws import ConnectionManager, OverflowPolicy, WSSchema
+
+
+def make_ws(mocker: MockerFixture):
+    ws = mocker.MagicMock()
+    ws.accept = mocker.AsyncMock()
+    ws.send_json = mocker.AsyncMock()
+    ws.close = mocker.AsyncMock()
+    return ws
+
+
+async def never_returns(message):
+    await asyncio.Event().wait()
+
+
+def make_schema(student_id: str = "12345") -> WSSchema:
+    return WSSchema(
+        action="test_action",
+        student_id=student_id,
+        shelf_id="shelf_1",
+        student_name="Test Student",
+        debt_amount=100,
+        price=50
+    )
+
+
 @pytest.mark.asyncio
 class TestWebSocketInstance:
 
-        
+
     async def test_connect_tablet(self, mocker: MockerFixture):
         conn = ConnectionManager()
-        ws = mocker.MagicMock()
-        ws.accept = mocker.AsyncMock()
-        await conn.connect_tablet(ws)
+        ws = make_ws(mocker)
+        tablet = await conn.connect_tablet(ws, "station-1")
         ws.accept.assert_awaited_once()
-        assert conn.tablet_connection == ws
-        
+        assert tablet.websocket == ws
+        assert conn.stations() == ["station-1"]
+        assert conn.is_connected("station-1")
+        assert not conn.is_connected("station-2")
+
     async def test_send_payload_to_tablet(self, mocker: MockerFixture):
-        ws = mocker.MagicMock()
-        ws.accept = mocker.AsyncMock()
-        ws.send_json = mocker.AsyncMock()
+        ws = make_ws(mocker)
         conn = ConnectionManager()
         await conn.connect_tablet(ws)
-        
-        schema = WSSchema(
-            action="test_action",
-            student_id="12345",
-            shelf_id="shelf_1",
-            student_name="Test Student",
-            debt_amount=100,
-            price=50
-        )
-        
-        await conn.send_payload_to_tablet(schema)
-        ws.send_json.assert_awaited_once_with(schema.model_dump())
-        
+
+        schema = make_schema()
+
+        assert await conn.send_payload_to_tablet(schema) == 1
+        await asyncio.sleep(0.01)
+        ws.send_json.assert_awaited_once_with(schema.model_dump(exclude_none=True))
+
     async def test_send_payload_no_tablet(self):
         conn = ConnectionManager()
-        schema = WSSchema(
-            action="test_action",
-            student_id="12345",
-            shelf_id="shelf_1",
-            student_name="Test Student",
-            debt_amount=100,
-            price=50
-        )
-        
+
         with pytest.raises(ConnectionError, match="No tablet connected"):
-            await conn.send_payload_to_tablet(schema)
-            
+            await conn.send_payload_to_tablet(make_schema())
+
     async def test_disconnect_tablet(self, mocker: MockerFixture):
-        ws = mocker.MagicMock()
-        ws.accept = mocker.AsyncMock()
+        ws = make_ws(mocker)
         conn = ConnectionManager()
-        await conn.connect_tablet(ws)
-        await conn.disconnect_tablet()
+        tablet = await conn.connect_tablet(ws)
+        await conn.disconnect_tablet(tablet)
         assert not conn.is_connected()
-        
-    async def test_tablet_connection_property_no_tablet(self):
+
+    async def test_fan_out_and_targeted_delivery(self, mocker: MockerFixture):
+        conn = ConnectionManager()
+        first, second = make_ws(mocker), make_ws(mocker)
+        await conn.connect_tablet(first, "a")
+        await conn.connect_tablet(second, "b")
+
+        assert await conn.send_payload_to_tablet(make_schema("1")) == 2
+        assert await conn.send_payload_to_tablet(make_schema("2"), station="b") == 1
+        with pytest.raises(ConnectionError):
+            await conn.send_payload_to_tablet(make_schema("3"), station="c")
+        await asyncio.sleep(0.01)
+
+        assert [c.args[0]["student_id"] for c in first.send_json.await_args_list] == ["1"]
+        assert [c.args[0]["student_id"] for c in second.send_json.await_args_list] == ["1", "2"]
+
+    async def test_reconnect_replaces_previous_connection(self, mocker: MockerFixture):
         conn = ConnectionManager()
+        old_ws, new_ws = make_ws(mocker), make_ws(mocker)
+        old = await conn.connect_tablet(old_ws, "a")
+        await conn.connect_tablet(new_ws, "a")
+        await asyncio.sleep(0)
+
+        assert old.closed
+        old_ws.close.assert_awaited_once()
+        # The old endpoint's cleanup must not remove the new connection
+        await conn.disconnect_tablet(old)
+        assert conn.stations() == ["a"]
+
+    async def test_stuck_tablet_does_not_block_sender(self, mocker: MockerFixture):
+        conn = ConnectionManager(queue_size=2, overflow=OverflowPolicy.drop_oldest)
+        ws = make_ws(mocker)
+        ws.send_json = mocker.AsyncMock(side_effect=never_returns)
+        tablet = await conn.connect_tablet(ws)
+        await asyncio.sleep(0)
+
+        for i in range(5):
+            await asyncio.wait_for(conn.send_payload_to_tablet(make_schema(str(i))), 0.1)
+            await asyncio.sleep(0)
+
+        # One payload is stuck in send_json, two wait in the queue, the rest were dropped
+        assert tablet.dropped == 2
+        assert not tablet.closed
+
+    async def test_overflow_disconnect_policy(self, mocker: MockerFixture):
+        conn = ConnectionManager(queue_size=1, overflow=OverflowPolicy.disconnect)
+        ws = make_ws(mocker)
+        ws.send_json = mocker.AsyncMock(side_effect=never_returns)
+        tablet = await conn.connect_tablet(ws)
+        await asyncio.sleep(0)
+
+        for i in range(2):
+            await conn.send_payload_to_tablet(make_schema(str(i)))
+            await asyncio.sleep(0)
+        assert await conn.send_payload_to_tablet(make_schema("2")) == 0
+        await asyncio.sleep(0)
+
+        assert tablet.closed
+        ws.close.assert_awaited_once()
+        assert not conn.is_connected()
+
+    async def test_heartbeat_evicts_silent_tablet(self, mocker: MockerFixture):
+        conn = ConnectionManager(ping_interval=0.01, ping_timeout=0.02)
+        ws = make_ws(mocker)
+        tablet = await conn.connect_tablet(ws)
+
+        await asyncio.wait_for(tablet.wait_closed(), 0.5)
+
+        ws.send_json.assert_any_await({"action": "PING"})
+        ws.close.assert_awaited_once()
+        assert not conn.is_connected()
         with pytest.raises(ConnectionError, match="No tablet connected"):
-            _ = conn.tablet_connection
-    
-    
\ No newline at end of file
+            await conn.send_payload_to_tablet(make_schema())
+
+    async def test_heartbeat_keeps_responsive_tablet(self, mocker: MockerFixture):
+        conn = ConnectionManager(ping_interval=0.01, ping_timeout=0.02)
+        ws = make_ws(mocker)
+        tablet = await conn.connect_tablet(ws)
+
+        async def pong(message):
+            if message["action"] == "PING":
+                assert tablet.received('{"action": "PONG"}')
+        ws.send_json.side_effect = pong
+
+        await asyncio.sleep(0.1)
+        assert not tablet.closed
+        assert ws.send_json.await_count >= 2
+        assert not tablet.received("hello")
+
+    async def test_send_timeout_disconnects(self, mocker: MockerFixture):
+        conn = ConnectionManager(send_timeout=0.01)
+        ws = make_ws(mocker)
+        ws.send_json = mocker.AsyncMock(side_effect=never_returns)
+        tablet = await conn.connect_tablet(ws)
+
+        await conn.send_payload_to_tablet(make_schema())
+        await asyncio.wait_for(tablet.wait_closed(), 0.5)
+
+        assert not conn.is_connected()
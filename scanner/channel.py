@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import WebSocketException
+
+logger = logging.getLogger(__name__)
+
+SCANNER_WS_PATH = "/ws/scanner"
+
+
+class ScanResult(NamedTuple):
+    status_code: int
+    body: Any
+
+    @property
+    def is_success(self) -> bool:
+        return 200 <= self.status_code < 300
+
+
+class ScanChannel:
+    """
+    Long-lived /ws/scanner connection shared by every reader.
+
+    `request()` sends a scan frame and waits for the response frame with the
+    same id, so any number of scans can be in flight at once. The connection
+    is opened on first use and reopened after it drops; scans in flight when
+    it drops fail with ConnectionError.
+    """
+
+    def __init__(self, api_url: str, timeout: float):
+        self.url = api_url.replace("http", "ws", 1).rstrip("/") + SCANNER_WS_PATH
+        self.__timeout = timeout
+        self.__ids = itertools.count(1)
+        self.__waiting: Dict[int, asyncio.Future] = {}
+        self.__connection: Optional[ClientConnection] = None
+        self.__receiver: Optional[asyncio.Task] = None
+        self.__connect_lock = asyncio.Lock()
+
+    async def request(self, scan: dict) -> ScanResult:
+        connection = await self.__connect()
+        frame_id = next(self.__ids)
+        response = asyncio.get_running_loop().create_future()
+        self.__waiting[frame_id] = response
+        try:
+            await connection.send(json.dumps({"id": frame_id, "scan": scan}))
+            return await asyncio.wait_for(response, self.__timeout)
+        except (WebSocketException, OSError) as e:
+            raise ConnectionError(f"Scanner channel failed: {e!r}") from e
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"No reply to scan frame {frame_id} within {self.__timeout}s")
+        finally:
+            self.__waiting.pop(frame_id, None)
+
+    async def close(self):
+        # The receiver clears self.__connection as it exits, so keep hold of it
+        connection, self.__connection = self.__connection, None
+        if self.__receiver:
+            self.__receiver.cancel()
+            await asyncio.gather(self.__receiver, return_exceptions=True)
+            self.__receiver = None
+        if connection:
+            await connection.close()
+
+    async def __connect(self) -> ClientConnection:
+        async with self.__connect_lock:
+            if self.__connection is None:
+                try:
+                    self.__connection = await asyncio.wait_for(connect(self.url), self.__timeout)
+                except (WebSocketException, OSError, asyncio.TimeoutError) as e:
+                    raise ConnectionError(f"Cannot open {self.url}: {e!r}") from e
+                self.__receiver = asyncio.create_task(self.__receive(self.__connection))
+                logger.info(f"Connected to {self.url}")
+            return self.__connection
+
+    async def __receive(self, connection: ClientConnection):
+        try:
+            async for message in connection:
+                frame = json.loads(message)
+                response = self.__waiting.get(frame.get("id"))
+                if response and not response.done():
+                    body = frame["result"] if "result" in frame else frame.get("detail")
+                    response.set_result(ScanResult(frame["status_code"], body))
+        except WebSocketException as e:
+            logger.warning(f"Scanner channel closed: {e!r}")
+        finally:
+            if self.__connection is connection:
+                self.__connection = None
+            error = ConnectionError("Scanner channel closed")
+            for response in self.__waiting.values():
+                response.done() or response.set_exception(error)
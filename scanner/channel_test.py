@@ -0,0 +1,66 @@
+import asyncio
+import json
+import pytest
+from websockets.asyncio.server import serve
+
+from channel import ScanChannel
+
+
+@pytest.mark.asyncio
+class TestScanChannel:
+
+    async def test_matches_out_of_order_replies(self):
+        async def handler(connection):
+            frames = [json.loads(await connection.recv()) for _ in range(3)]
+            # Answer in reverse order
+            for frame in reversed(frames):
+                if frame["scan"]["idm"] == "unknown":
+                    await connection.send(json.dumps({"id": frame["id"], "status_code": 404, "detail": "Card not registered to a student"}))
+                else:
+                    await connection.send(json.dumps({"id": frame["id"], "status_code": 200, "result": {"idm": frame["scan"]["idm"]}}))
+            await connection.wait_closed()
+
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            channel = ScanChannel(f"http://127.0.0.1:{port}", timeout=5)
+            results = await asyncio.gather(*(
+                channel.request({"idm": idm, "usb_port": 1}) for idm in ["card1", "unknown", "card3"]
+            ))
+            await channel.close()
+
+        assert results[0].body == {"idm": "card1"}
+        assert (results[1].status_code, results[1].body) == (404, "Card not registered to a student")
+        assert results[2].is_success
+
+    async def test_pending_scans_fail_when_connection_drops(self):
+        async def handler(connection):
+            await connection.recv()
+            await connection.close()
+
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            channel = ScanChannel(f"http://127.0.0.1:{port}", timeout=5)
+            with pytest.raises(ConnectionError):
+                await channel.request({"idm": "card1", "usb_port": 1})
+            await channel.close()
+
+    async def test_close_closes_the_websocket(self):
+        closed = asyncio.Event()
+
+        async def handler(connection):
+            async for message in connection:
+                frame = json.loads(message)
+                await connection.send(json.dumps({"id": frame["id"], "status_code": 200, "result": {}}))
+            closed.set()
+
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            channel = ScanChannel(f"http://127.0.0.1:{port}", timeout=5)
+            await channel.request({"idm": "card1", "usb_port": 1})
+            await channel.close()
+            await asyncio.wait_for(closed.wait(), 1)
+
+    async def test_unreachable_api_raises_connection_error(self):
+        channel = ScanChannel("http://127.0.0.1:1", timeout=1)
+        with pytest.raises(ConnectionError):
+            await channel.request({"idm": "card1", "usb_port": 1})
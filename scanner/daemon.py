@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+import httpx
+
+from channel import ScanChannel, ScanResult
+from readers import CardReader, Tap
+from spool import ScanSpool, SpoolEntry, SpoolFull
+
+logger = logging.getLogger(__name__)
+
+SCAN_PATH = "/ic_cards/scan"
+SCAN_BATCH_PATH = "/ic_cards/scan/batch"
+# Same as the API's schema.ADMIN_PORT. Admin taps (card capture, PAY_BACK) act on
+# whatever admin session is open, so they are only ever sent live, never spooled
+ADMIN_PORT = 5
+DEFAULT_TIMEOUT_SECONDS = 5.0
+REPLAY_BATCH_SIZE = 100
+REPLAY_MIN_DELAY_SECONDS = 0.5
+REPLAY_MAX_DELAY_SECONDS = 30.0
+# Percentiles cover the most recent taps only, so a long-running daemon stays bounded
+LATENCY_WINDOW = 10_000
+
+
+class ApiUnavailable(Exception):
+    pass
+
+
+SEND_ERRORS = (httpx.HTTPError, ConnectionError, ApiUnavailable)
+
+
+def create_client(api_url: str, timeout: float = DEFAULT_TIMEOUT_SECONDS, max_connections: int = 7) -> httpx.AsyncClient:
+    """One pooled keep-alive client shared by every reader (one connection per port at most)."""
+    return httpx.AsyncClient(
+        base_url=api_url,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60,
+        ),
+    )
+
+
+class LatencyStats:
+    """
+    Tap-to-response latencies (ms). Percentiles are over the last `window`
+    taps; the tap count, maximum and outcomes cover the daemon's lifetime.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.taps = 0
+        self.max_ms = 0.0
+        self.outcomes: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, outcome: str):
+        self.samples.append(latency_ms)
+        self.taps += 1
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self) -> dict:
+        return {
+            "taps": self.taps,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "outcomes": dict(self.outcomes),
+        }
+
+
+class ScannerDaemon:
+    """
+    Reads every attached reader concurrently and posts each tap to the API.
+
+    Each reader gets its own task, so a slow response on one port never delays
+    taps on another. Live scans go over the shared /ws/scanner channel when one
+    is given, otherwise through the same pooled HTTP client as everything else.
+
+    With a spool, every shelf tap is journaled before it is sent and
+    acknowledged once the API answers. When the API cannot be reached, new
+    shelf taps are only journaled and a replay task sends the backlog in
+    order, in batches, until it is empty; then taps are posted live again.
+    Admin-port taps are never journaled: replayed later they would act on
+    whatever admin session is open by then, so they fail at once instead.
+    """
+
+    def __init__(
+        self,
+        readers: Sequence[CardReader],
+        client: httpx.AsyncClient,
+        spool: Optional[ScanSpool] = None,
+        channel: Optional[ScanChannel] = None,
+        replay_batch_size: int = REPLAY_BATCH_SIZE,
+    ):
+        self.__readers = list(readers)
+        self.__client = client
+        self.__channel = channel
+        self.__spool = spool
+        self.__replay_batch_size = replay_batch_size
+        self.__offline = asyncio.Event()
+        self.stats = LatencyStats()
+
+    @property
+    def offline(self) -> bool:
+        return self.__offline.is_set()
+
+    async def run(self):
+        if self.__spool is not None:
+            await self.__spool.open()
+            if len(self.__spool):
+                self.__offline.set()
+        for reader in self.__readers:
+            await reader.open()
+        logger.info(f"Listening on USB ports {[r.usb_port for r in self.__readers]}")
+        tasks = [self.__read_loop(reader) for reader in self.__readers]
+        if self.__spool is not None:
+            tasks.append(self.__replay_loop())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for reader in self.__readers:
+                await reader.close()
+            if self.__spool is not None:
+                await self.__spool.close()
+            if self.__channel is not None:
+                await self.__channel.close()
+
+    async def __read_loop(self, reader: CardReader):
+        while True:
+            tap = await reader.read_tap()
+            await self.handle_tap(tap)
+
+    async def send_scan(self, scan: dict) -> ScanResult:
+        if self.__channel is not None:
+            return await self.__channel.request(scan)
+        response = await self.__client.post(SCAN_PATH, json=scan)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        return ScanResult(response.status_code, body)
+
+    async def handle_tap(self, tap: Tap) -> Optional[ScanResult]:
+        payload = {
+            "idm": tap.idm,
+            "usb_port": tap.usb_port,
+            # The API derives the idempotency key from uid + port + timestamp
+            "timestamp": tap.scanned_at.isoformat(),
+        }
+        entry: Optional[SpoolEntry] = None
+        if self.__spool is not None and tap.usb_port != ADMIN_PORT:
+            try:
+                entry = await self.__spool.append(payload)
+            except SpoolFull as e:
+                self.__record(tap, "spool_full")
+                logger.error(f"Scan {tap.idm} on port {tap.usb_port} dropped: {e}")
+                return None
+            if self.__offline.is_set():
+                self.__record(tap, "spooled")
+                return None
+
+        try:
+            result = await self.send_scan(payload)
+            if entry is not None and result.status_code >= 500:
+                raise ApiUnavailable(f"HTTP {result.status_code}")
+        except SEND_ERRORS as e:
+            if entry is not None:
+                self.__record(tap, "spooled")
+                self.__go_offline(e)
+                return None
+            self.__record(tap, "network_error")
+            logger.error(f"Scan {tap.idm} on port {tap.usb_port} failed, not retried: {e!r}")
+            return None
+
+        if entry is not None:
+            await self.__spool.ack(entry.seq) # type: ignore
+
+        outcome = "success" if result.is_success else str(result.status_code)
+        latency_ms = self.__record(tap, outcome)
+        if result.is_success:
+            logger.info(f"Scan {tap.idm} on port {tap.usb_port}: {result.body} ({latency_ms:.1f}ms)")
+        else:
+            logger.warning(f"Scan {tap.idm} on port {tap.usb_port} rejected ({result.status_code}): {result.body}")
+        return result
+
+    def __go_offline(self, error: Exception):
+        if not self.__offline.is_set():
+            logger.warning(f"API unavailable ({error!r}); spooling scans until it is back")
+            self.__offline.set()
+
+    async def __replay_loop(self):
+        delay = REPLAY_MIN_DELAY_SECONDS
+        while True:
+            await self.__offline.wait()
+            entries = self.__spool.pending()[:self.__replay_batch_size] # type: ignore
+            if not entries:
+                logger.info("Spooled scans replayed; posting live again")
+                self.__offline.clear()
+                continue
+            try:
+                await self.replay(entries)
+                delay = REPLAY_MIN_DELAY_SECONDS
+            except SEND_ERRORS as e:
+                logger.warning(f"Replay of {len(self.__spool)} spooled scans failed ({e!r}), retrying in {delay:.1f}s") # type: ignore
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, REPLAY_MAX_DELAY_SECONDS)
+
+    async def replay(self, entries: List[SpoolEntry]):
+        """Send `entries` (oldest first) as one batch and acknowledge each answered scan."""
+        run: List[SpoolEntry] = []
+        for entry in entries:
+            if entry.scan["usb_port"] == ADMIN_PORT:
+                # Journaled by an older version of the daemon; too late to act on
+                logger.warning(f"Dropping spooled admin scan {entry.scan['idm']}")
+                await self.__spool.ack(entry.seq) # type: ignore
+                continue
+            run.append(entry)
+        if not run:
+            return
+
+        response = await self.__client.post(SCAN_BATCH_PATH, json={"scans": [e.scan for e in run]})
+        if response.status_code >= 500:
+            raise ApiUnavailable(f"HTTP {response.status_code}")
+        if not response.is_success:
+            # The batch as a whole was refused; let the per-scan endpoint judge each one
+            for entry in run:
+                await self.__replay_one(entry)
+            return
+        for entry, result in zip(run, response.json()["results"]):
+            if result["status"] != "success":
+                logger.warning(f"Spooled scan {entry.scan['idm']} on port {entry.scan['usb_port']} rejected: {result}")
+            await self.__spool.ack(entry.seq) # type: ignore
+
+    async def __replay_one(self, entry: SpoolEntry):
+        result = await self.send_scan(entry.scan)
+        if result.status_code >= 500:
+            raise ApiUnavailable(f"HTTP {result.status_code}")
+        if not result.is_success:
+            logger.warning(f"Spooled scan {entry.scan['idm']} on port {entry.scan['usb_port']} rejected ({result.status_code}): {result.body}")
+        await self.__spool.ack(entry.seq) # type: ignore
+
+    def __record(self, tap: Tap, outcome: str) -> float:
+        latency_ms = (time.monotonic() - tap.detected_at) * 1000
+        self.stats.record(latency_ms, outcome)
+        return latency_ms
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import httpx
+import pytest
+
+from daemon import LatencyStats, ScannerDaemon
+from readers import SimulatedReader, normalize_idm
+from spool import ScanSpool
+
+
+def test_normalize_idm():
+    assert normalize_idm("  01ABCDEF  ") == "01abcdef"
+    assert normalize_idm(b"\x01\x2e\xab") == "012eab"
+
+
+def test_latency_stats_keep_a_bounded_window():
+    stats = LatencyStats(window=3)
+    for latency in [100.0, 1.0, 2.0, 3.0]:
+        stats.record(latency, "success")
+
+    assert list(stats.samples) == [1.0, 2.0, 3.0]
+    summary = stats.summary()
+    assert summary["taps"] == 4
+    assert summary["p99_ms"] == 3.0
+    assert summary["max_ms"] == 100.0
+    assert summary["outcomes"] == {"success": 4}
+
+
+@pytest.mark.asyncio
+class TestScannerDaemon:
+
+    async def test_posts_taps_from_all_ports(self):
+        received = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            received.append(body)
+            if body["idm"] == "unknown":
+                return httpx.Response(404, json={"detail": "Card not registered to a student"})
+            return httpx.Response(200, json={"status": "success"})
+
+        readers = [SimulatedReader(port) for port in range(1, 8)]
+        async with httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(handler)) as client:
+            daemon = ScannerDaemon(readers, client)
+            task = asyncio.create_task(daemon.run())
+            for reader in readers:
+                reader.tap(f" CARD{reader.usb_port} ")
+            readers[0].tap("unknown")
+            while len(received) < 8:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert sorted(r["usb_port"] for r in received) == [1, 1, 2, 3, 4, 5, 6, 7]
+        assert next(r["idm"] for r in received if r["usb_port"] == 3) == "card3"
+        assert all(r["timestamp"] for r in received)
+        summary = daemon.stats.summary()
+        assert summary["taps"] == 8
+        assert summary["outcomes"] == {"success": 7, "404": 1}
+
+    async def test_network_error_is_recorded(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused")
+
+        reader = SimulatedReader(1)
+        async with httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(handler)) as client:
+            daemon = ScannerDaemon([reader], client)
+            assert await daemon.handle_tap(reader.tap("card1")) is None
+
+        assert daemon.stats.summary()["outcomes"] == {"network_error": 1}
+
+    async def test_spools_while_offline_and_replays_in_order(self, tmp_path):
+        online = False
+        live, batches = [], []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if not online:
+                raise httpx.ConnectError("connection refused")
+            body = json.loads(request.content)
+            if request.url.path == "/ic_cards/scan/batch":
+                batches.append([s["idm"] for s in body["scans"]])
+                return httpx.Response(200, json={"results": [{"status": "success"} for _ in body["scans"]]})
+            live.append(body["idm"])
+            return httpx.Response(200, json={"status": "success"})
+
+        spool = ScanSpool(str(tmp_path / "spool.jsonl"), fsync_interval=0)
+        reader = SimulatedReader(1)
+        async with httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(handler)) as client:
+            daemon = ScannerDaemon([reader], client, spool=spool)
+            task = asyncio.create_task(daemon.run())
+            for n in range(3):
+                reader.tap(f"card{n}")
+            while daemon.stats.taps < 3:
+                await asyncio.sleep(0.01)
+            assert daemon.offline
+            assert len(spool) == 3
+
+            online = True
+            while daemon.offline:
+                await asyncio.sleep(0.01)
+            reader.tap("card3")
+            while not live:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert batches == [["card0", "card1", "card2"]]
+        assert live == ["card3"]
+        assert daemon.stats.outcomes == {"spooled": 3, "success": 1}
+        assert len(spool) == 0
+
+    async def test_admin_taps_are_never_spooled(self, tmp_path):
+        online = False
+        live, batches = [], []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if not online:
+                raise httpx.ConnectError("connection refused")
+            body = json.loads(request.content)
+            if request.url.path == "/ic_cards/scan/batch":
+                batches.append([s["idm"] for s in body["scans"]])
+                return httpx.Response(200, json={"results": [{"status": "success"} for _ in body["scans"]]})
+            live.append(body["idm"])
+            return httpx.Response(200, json={"status": "new_card"})
+
+        spool = ScanSpool(str(tmp_path / "spool.jsonl"), fsync_interval=0)
+        await spool.open()
+        # Left behind by an older daemon
+        await spool.append({"idm": "oldadmin", "usb_port": 5, "timestamp": "2026-01-01T00:00:00+00:00"})
+        await spool.close()
+        shelf, admin = SimulatedReader(1), SimulatedReader(5)
+        async with httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(handler)) as client:
+            daemon = ScannerDaemon([shelf, admin], client, spool=spool)
+            await spool.open()
+            assert await daemon.handle_tap(admin.tap("admincard")) is None
+            assert await daemon.handle_tap(shelf.tap("card0")) is None
+            assert len(spool) == 2
+            assert daemon.stats.outcomes == {"network_error": 1, "spooled": 1}
+
+            online = True
+            await daemon.replay(spool.pending())
+            await spool.close()
+
+        assert batches == [["card0"]]
+        assert live == []
+        assert len(spool) == 0
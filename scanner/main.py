@@ -1,5 +1,72 @@
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict, List
+
+from channel import ScanChannel
+from daemon import ScannerDaemon, create_client
+from readers import CardReader, NfcpyReader, SimulatedReader
+from spool import DEFAULT_MAX_PENDING, ScanSpool
+
+USB_PORTS = range(1, 8)
+
+logger = logging.getLogger("scanner")
+
+
+def parse_devices(value: str) -> Dict[int, str]:
+    """Parse "1=usb:001:004,2=usb:001:005" into {usb_port: nfcpy device path}."""
+    devices: Dict[int, str] = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        port, _, path = item.partition("=")
+        devices[int(port)] = path
+    return devices
+
+
+def build_readers(args: argparse.Namespace) -> List[CardReader]:
+    if args.backend == "nfcpy":
+        devices = parse_devices(args.devices)
+        if not devices:
+            raise SystemExit("--devices (or SCANNER_DEVICES) is required for the nfcpy backend")
+        return [NfcpyReader(port, path) for port, path in sorted(devices.items())]
+
+    cards = [card for card in args.simulate_cards.split(",") if card]
+    return [
+        SimulatedReader(port, cards=cards, interval=args.simulate_interval, jitter=args.simulate_interval / 2)
+        for port in USB_PORTS
+    ]
+
+
+async def run(args: argparse.Namespace):
+    async with create_client(args.api_url, timeout=args.timeout) as client:
+        spool = ScanSpool(args.spool_path, max_pending=args.spool_max) if args.spool_path else None
+        channel = ScanChannel(args.api_url, timeout=args.timeout) if args.transport == "ws" else None
+        daemon = ScannerDaemon(build_readers(args), client, spool=spool, channel=channel)
+        try:
+            await daemon.run()
+        finally:
+            logger.info(f"Tap-to-response latency: {daemon.stats.summary()}")
+
+
 def main():
-    print("This is IC card handler program.")
+    argumentParser = argparse.ArgumentParser(description="IC card reader daemon for the seven shelf ports")
+    argumentParser.add_argument("--api-url", default=os.getenv("SCANNER_API_URL", "http://localhost:8000"))
+    argumentParser.add_argument("--backend", choices=["simulated", "nfcpy"], default=os.getenv("SCANNER_BACKEND", "simulated"))
+    argumentParser.add_argument("--devices", default=os.getenv("SCANNER_DEVICES", ""), help="nfcpy device per port, e.g. 1=usb:001:004,2=usb:001:005")
+    argumentParser.add_argument("--transport", choices=["http", "ws"], default=os.getenv("SCANNER_TRANSPORT", "ws"), help="Send live scans over POST /ic_cards/scan or the /ws/scanner channel")
+    argumentParser.add_argument("--timeout", type=float, default=float(os.getenv("SCANNER_TIMEOUT", "5")))
+    argumentParser.add_argument("--spool-path", default=os.getenv("SCANNER_SPOOL_PATH", "scanner-spool.jsonl"), help="Offline scan journal; empty disables spooling")
+    argumentParser.add_argument("--spool-max", type=int, default=int(os.getenv("SCANNER_SPOOL_MAX", DEFAULT_MAX_PENDING)), help="Maximum number of unsent scans kept in the journal")
+    argumentParser.add_argument("--simulate-cards", default=os.getenv("SCANNER_SIMULATE_CARDS", ""), help="Comma separated IDms the simulated readers tap")
+    argumentParser.add_argument("--simulate-interval", type=float, default=float(os.getenv("SCANNER_SIMULATE_INTERVAL", "1")), help="Seconds between simulated taps per port")
+    args = argumentParser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
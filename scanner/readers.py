@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_idm(idm: Union[str, bytes]) -> str:
+    """Same normalization as the API's ScanRequest.normalized_uid (bytes are hex encoded first)."""
+    if isinstance(idm, (bytes, bytearray)):
+        idm = bytes(idm).hex()
+    return idm.strip().lower()
+
+
+class Tap(NamedTuple):
+    usb_port: int
+    idm: str
+    scanned_at: datetime
+    # time.monotonic() when the reader saw the card, for tap-to-response latency
+    detected_at: float
+
+
+def make_tap(usb_port: int, idm: Union[str, bytes]) -> Tap:
+    return Tap(usb_port, normalize_idm(idm), datetime.now(timezone.utc), time.monotonic())
+
+
+class CardReader(ABC):
+    """One IC card reader attached to a USB port."""
+
+    def __init__(self, usb_port: int):
+        self.usb_port = usb_port
+
+    async def open(self):
+        pass
+
+    @abstractmethod
+    async def read_tap(self) -> Tap:
+        """Wait for the next card presented to this reader."""
+
+    async def close(self):
+        pass
+
+
+class SimulatedReader(CardReader):
+    """
+    Reader backend without hardware.
+
+    Taps can be injected with `tap()`. When `cards` is given, the reader also
+    taps a random card from it every `interval` seconds (+/- `jitter`).
+    """
+
+    def __init__(
+        self,
+        usb_port: int,
+        cards: Sequence[str] = (),
+        interval: Optional[float] = None,
+        jitter: float = 0.0,
+    ):
+        super().__init__(usb_port)
+        self.__cards: List[str] = list(cards)
+        self.__interval = interval
+        self.__jitter = jitter
+        self.__taps: asyncio.Queue[Tap] = asyncio.Queue()
+        self.__generator: Optional[asyncio.Task] = None
+
+    def tap(self, idm: Union[str, bytes]) -> Tap:
+        tap = make_tap(self.usb_port, idm)
+        self.__taps.put_nowait(tap)
+        return tap
+
+    async def open(self):
+        if self.__cards and self.__interval:
+            self.__generator = asyncio.create_task(self.__generate())
+
+    async def read_tap(self) -> Tap:
+        return await self.__taps.get()
+
+    async def close(self):
+        if self.__generator:
+            self.__generator.cancel()
+            await asyncio.gather(self.__generator, return_exceptions=True)
+            self.__generator = None
+
+    async def __generate(self):
+        while True:
+            delay = self.__interval + random.uniform(-self.__jitter, self.__jitter) # type: ignore
+            await asyncio.sleep(max(delay, 0))
+            self.tap(random.choice(self.__cards))
+
+
+class NfcpyReader(CardReader):
+    """
+    PaSoRi / FeliCa reader driven by nfcpy (optional dependency).
+
+    nfcpy is blocking, so each reader polls on its own thread and hands taps to
+    the event loop. A card is reported once when it is presented; it has to be
+    removed before the next tap on the same reader is reported.
+    """
+
+    def __init__(self, usb_port: int, path: str):
+        super().__init__(usb_port)
+        self.__path = path
+        self.__clf = None
+        self.__taps: asyncio.Queue[Tap] = asyncio.Queue()
+        self.__closing = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    async def open(self):
+        try:
+            import nfc
+        except ImportError:
+            raise RuntimeError("The nfcpy backend requires the 'nfcpy' package (pip install nfcpy)")
+        self.__clf = await asyncio.to_thread(nfc.ContactlessFrontend, self.__path)
+        self.__thread = threading.Thread(
+            target=self.__poll, args=(asyncio.get_running_loop(),),
+            name=f"reader-{self.usb_port}", daemon=True,
+        )
+        self.__thread.start()
+        logger.info(f"Opened reader {self.__path} for USB port {self.usb_port}")
+
+    async def read_tap(self) -> Tap:
+        return await self.__taps.get()
+
+    async def close(self):
+        self.__closing.set()
+        if self.__thread:
+            await asyncio.to_thread(self.__thread.join)
+            self.__thread = None
+        if self.__clf:
+            await asyncio.to_thread(self.__clf.close)
+            self.__clf = None
+
+    def __poll(self, loop: asyncio.AbstractEventLoop):
+        def on_connect(tag) -> bool:
+            loop.call_soon_threadsafe(self.__taps.put_nowait, make_tap(self.usb_port, tag.identifier))
+            # Returning True makes connect() block until the card is removed
+            return True
+
+        while not self.__closing.is_set():
+            try:
+                self.__clf.connect(rdwr={"on-connect": on_connect}, terminate=self.__closing.is_set) # type: ignore
+            except Exception as e:
+                logger.error(f"Reader {self.__path} on USB port {self.usb_port} failed: {e}")
+                self.__closing.wait(1.0)
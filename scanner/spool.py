@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_FSYNC_INTERVAL_SECONDS = 0.005
+DEFAULT_COMPACT_AFTER = 1000
+
+
+class SpoolFull(Exception):
+    pass
+
+
+class SpoolEntry(NamedTuple):
+    seq: int
+    scan: dict
+
+
+def read_journal(path: str) -> Tuple[Dict[int, SpoolEntry], int, int]:
+    """
+    Replay a journal file into (pending entries by seq, last seq, line count).
+
+    A torn last line left by a crash mid-write is ignored; the scan it held was
+    never acknowledged to the user.
+    """
+    pending: Dict[int, SpoolEntry] = {}
+    last_seq = 0
+    lines = 0
+    if not os.path.exists(path):
+        return pending, last_seq, lines
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring torn record at line {lines + 1} of {path}")
+                continue
+            lines += 1
+            if "ack" in record:
+                pending.pop(record["ack"], None)
+            else:
+                pending[record["seq"]] = SpoolEntry(record["seq"], record["scan"])
+                last_seq = max(last_seq, record["seq"])
+    return pending, last_seq, lines
+
+
+class ScanSpool:
+    """
+    Append-only journal of scans that have not been confirmed by the API yet.
+
+    `append()` returns once the scan is on disk. Concurrent appends share one
+    fsync: the flusher waits `fsync_interval` for more records, then syncs them
+    as a group. Acknowledgements are journaled too, but are not waited for; a
+    lost ack only means the scan is replayed, which the API deduplicates by its
+    idempotency key. Once `compact_after` journal lines are acknowledged, the
+    file is rewritten with only the pending scans, so its size is bounded by
+    `max_pending` plus one compaction interval.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL_SECONDS,
+        compact_after: int = DEFAULT_COMPACT_AFTER,
+    ):
+        self.path = path
+        self.__max_pending = max_pending
+        self.__fsync_interval = fsync_interval
+        self.__compact_after = compact_after
+        self.__pending: Dict[int, SpoolEntry] = {}
+        self.__last_seq = 0
+        self.__lines = 0
+        self.__file = None
+        self.__lock = asyncio.Lock()
+        self.__dirty = asyncio.Event()
+        self.__waiters: List[asyncio.Future] = []
+        self.__flusher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    def pending(self) -> List[SpoolEntry]:
+        """Unacknowledged scans, oldest first."""
+        return [self.__pending[seq] for seq in sorted(self.__pending)]
+
+    async def open(self):
+        self.__pending, self.__last_seq, self.__lines = await asyncio.to_thread(read_journal, self.path)
+        if self.__pending:
+            logger.info(f"Recovered {len(self.__pending)} unconfirmed scans from {self.path}")
+        # Start from a compacted file, which also drops a torn last line
+        await self.__compact()
+        self.__flusher = asyncio.create_task(self.__flush_loop())
+
+    async def close(self):
+        if self.__flusher:
+            self.__flusher.cancel()
+            await asyncio.gather(self.__flusher, return_exceptions=True)
+            self.__flusher = None
+        if self.__file:
+            async with self.__lock:
+                await self.__sync_file()
+                self.__file.close()
+                self.__file = None
+        self.__fail_waiters(RuntimeError("Spool closed"))
+
+    async def append(self, scan: dict) -> SpoolEntry:
+        if len(self.__pending) >= self.__max_pending:
+            raise SpoolFull(f"{len(self.__pending)} scans are waiting to be sent")
+        async with self.__lock:
+            self.__last_seq += 1
+            entry = SpoolEntry(self.__last_seq, scan)
+            self.__write({"seq": entry.seq, "scan": scan})
+            self.__pending[entry.seq] = entry
+            synced = asyncio.get_running_loop().create_future()
+            self.__waiters.append(synced)
+        self.__dirty.set()
+        await synced
+        return entry
+
+    async def ack(self, seq: int):
+        if seq not in self.__pending:
+            return
+        async with self.__lock:
+            del self.__pending[seq]
+            self.__write({"ack": seq})
+        self.__dirty.set()
+
+    def __write(self, record: dict):
+        self.__file.write(json.dumps(record, separators=(",", ":")) + "\n") # type: ignore
+        self.__lines += 1
+
+    async def __sync_file(self):
+        self.__file.flush() # type: ignore
+        await asyncio.to_thread(os.fsync, self.__file.fileno()) # type: ignore
+
+    async def __flush_loop(self):
+        while True:
+            await self.__dirty.wait()
+            # Group window: let concurrent appends join this fsync
+            await asyncio.sleep(self.__fsync_interval)
+            self.__dirty.clear()
+            async with self.__lock:
+                waiters, self.__waiters = self.__waiters, []
+                try:
+                    await self.__sync_file()
+                    if self.__lines - len(self.__pending) >= self.__compact_after:
+                        await self.__compact()
+                except Exception as e:
+                    logger.error(f"Failed to sync scan journal {self.path}: {e}")
+                    for waiter in waiters:
+                        waiter.done() or waiter.set_exception(e)
+                    continue
+            for waiter in waiters:
+                waiter.done() or waiter.set_result(None)
+
+    async def __compact(self):
+        """Rewrite the journal with only pending scans (caller holds the lock, or no writer runs yet)."""
+        lines = [
+            json.dumps({"seq": entry.seq, "scan": entry.scan}, separators=(",", ":")) + "\n"
+            for entry in self.pending()
+        ]
+        if self.__file:
+            self.__file.close()
+        await asyncio.to_thread(self.__replace_file, lines)
+        self.__file = open(self.path, "a", encoding="utf-8")
+        self.__lines = len(lines)
+
+    def __replace_file(self, lines: List[str]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def __fail_waiters(self, error: Exception):
+        waiters, self.__waiters = self.__waiters, []
+        for waiter in waiters:
+            waiter.done() or waiter.set_exception(error)
@@ -0,0 +1,58 @@
+import pytest
+
+from spool import ScanSpool, SpoolFull, read_journal
+
+
+def scan(n: int) -> dict:
+    return {"idm": f"card{n}", "usb_port": 1, "timestamp": f"2026-01-01T12:00:{n:02d}+00:00"}
+
+
+@pytest.mark.asyncio
+class TestScanSpool:
+
+    async def test_recovers_unacknowledged_scans_in_order(self, tmp_path):
+        path = str(tmp_path / "spool.jsonl")
+        spool = ScanSpool(path)
+        await spool.open()
+        entries = [await spool.append(scan(n)) for n in range(3)]
+        await spool.ack(entries[1].seq)
+        await spool.close()
+
+        reopened = ScanSpool(path)
+        await reopened.open()
+        assert [e.scan["idm"] for e in reopened.pending()] == ["card0", "card2"]
+        # New entries continue after the recovered sequence numbers
+        assert (await reopened.append(scan(3))).seq == 4
+        await reopened.close()
+
+    async def test_ignores_torn_last_record(self, tmp_path):
+        path = tmp_path / "spool.jsonl"
+        path.write_text('{"seq":1,"scan":{"idm":"card1","usb_port":1}}\n{"seq":2,"sc')
+
+        pending, last_seq, _ = read_journal(str(path))
+        assert list(pending) == [1]
+        assert last_seq == 1
+
+    async def test_compacts_acknowledged_entries(self, tmp_path):
+        path = tmp_path / "spool.jsonl"
+        spool = ScanSpool(str(path), compact_after=10, fsync_interval=0)
+        await spool.open()
+        for n in range(20):
+            entry = await spool.append(scan(n))
+            await spool.ack(entry.seq)
+        last = await spool.append(scan(99))
+        await spool.close()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) < 20
+        pending, _, _ = read_journal(str(path))
+        assert list(pending) == [last.seq]
+
+    async def test_rejects_scans_when_full(self, tmp_path):
+        spool = ScanSpool(str(tmp_path / "spool.jsonl"), max_pending=2)
+        await spool.open()
+        await spool.append(scan(1))
+        await spool.append(scan(2))
+        with pytest.raises(SpoolFull):
+            await spool.append(scan(3))
+        await spool.close()
@@ -91,7 +91,8 @@ async function loadData() {
 
 async function loadUsers() {
   try {
-    const res = await apiFetch('/users/');
+    // only users with debt > 0, largest debt first
+    const res = await apiFetch('/users/?min_balance=1&sort=-account_balance');
     if (!res.ok) {
       console.error(
         'loadUsers failed',
@@ -102,11 +103,7 @@ async function loadUsers() {
     }
 
     const data = await res.json();
-
-    // show only users with debt > 0
-    debtCache = (data.users || []).filter(
-      (u) => Number(u.account_balance ?? 0) > 0
-    );
+    debtCache = data.users || [];
 
     renderDebtTable();
   } catch (e) {
@@ -280,37 +277,28 @@ async function toggleUserStatus(studentId, status) {
   }
 }
 
+// The feed is paged on the server; keep the cursor of every visited page for "prev"
+let activityCursors = [null];
+let activityNextCursor = null;
+
 async function loadActivity() {
   try {
-    const [pRes, payRes] = await Promise.all([
-      apiFetch('/purchases/'),
-      apiFetch('/payments/'),
-    ]);
-
-    if (!pRes.ok || !payRes.ok) return;
-
-    const pData = await pRes.json();
-    const payData = await payRes.json();
-
-    const purchases = pData.purchases || [];
-    const payments = payData.payments || [];
-
-    activityCache = [
-      ...purchases.map((x) => ({
-        time: x.created_at,
-        id: x.student_id,
-        type: 'PURCHASE',
-        amount: x.price,
-        className: 'purchase',
-      })),
-      ...payments.map((x) => ({
-        time: x.created_at,
-        id: x.student_id,
-        type: 'PAYMENT',
-        amount: x.amount_paid,
-        className: 'payment',
-      })),
-    ].sort((a, b) => new Date(b.time) - new Date(a.time));
+    const query = new URLSearchParams({ limit: activityPageSize });
+    const cursor = activityCursors[activityPage - 1];
+    if (cursor) query.set('cursor', cursor);
+
+    const res = await apiFetch(`/activity/?${query}`);
+    if (!res.ok) return;
+
+    const data = await res.json();
+    activityNextCursor = data.next_cursor;
+    activityCache = (data.activity || []).map((x) => ({
+      time: x.created_at,
+      id: x.student_id,
+      type: x.kind.toUpperCase(),
+      amount: x.amount,
+      className: x.kind,
+    }));
 
     renderActivityTable();
   } catch (e) {
@@ -321,17 +309,7 @@ function renderActivityTable() {
   const tbody = document.querySelector('#activityTable tbody');
   if (!tbody) return;
 
-  const totalPages = Math.max(
-    1,
-    Math.ceil(activityCache.length / activityPageSize)
-  );
-  if (activityPage > totalPages) activityPage = totalPages;
-  if (activityPage < 1) activityPage = 1;
-
-  const start = (activityPage - 1) * activityPageSize;
-  const pageItems = activityCache.slice(start, start + activityPageSize);
-
-  tbody.innerHTML = pageItems
+  tbody.innerHTML = activityCache
     .map(
       (a) => `<tr>
         <td>${new Date(a.time).toLocaleTimeString()}</td>
@@ -347,16 +325,19 @@ function renderActivityTable() {
   const info = document.getElementById('activityPageInfo');
 
   if (prev) prev.disabled = activityPage <= 1;
-  if (next) next.disabled = activityPage >= totalPages;
-  if (info) info.innerText = `${activityPage} / ${totalPages}`;
+  if (next) next.disabled = !activityNextCursor;
+  if (info) info.innerText = `${activityPage}`;
 }
 function activityNextPage() {
+  if (!activityNextCursor) return;
+  activityCursors[activityPage] = activityNextCursor;
   activityPage++;
-  renderActivityTable();
+  loadActivity();
 }
 function activityPrevPage() {
+  if (activityPage <= 1) return;
   activityPage--;
-  renderActivityTable();
+  loadActivity();
 }
 
 window.activityNextPage = activityNextPage;
@@ -567,23 +548,36 @@ async function registerCard() {
 
 let pollTimer = null;
 let dataTimer = null;
+let eventSource = null;
+
+function showCapturedCard(uid) {
+  if (!uid) return;
+  if ($('uid')) $('uid').value = uid;
+  if ($('status_msg')) $('status_msg').innerText = 'New Card: ' + uid;
+}
 
+let lastCapturedAt = null;
+
+// Long poll: the API holds the request until a card is captured on port 5
 async function pollForNewCard() {
+  let delay = 0;
   try {
-    const res = await apiFetch('/ic_cards/captured');
+    const query = lastCapturedAt
+      ? `?wait=30&after=${encodeURIComponent(lastCapturedAt)}`
+      : '';
+    const res = await apiFetch(`/ic_cards/captured${query}`);
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
 
     const card = await res.json();
-    const newUid = card?.uid;
-
-    if (newUid) {
-      if ($('uid')) $('uid').value = newUid;
-      if ($('status_msg')) $('status_msg').innerText = 'New Card: ' + newUid;
-    }
+    showCapturedCard(card?.uid);
+    if (card?.captured_at) lastCapturedAt = card.captured_at;
+    // Nothing captured yet: there is no `after` to wait on
+    if (!lastCapturedAt) delay = 2000;
   } catch (e) {
     console.error('pollForNewCard error', e);
+    delay = 2000;
   } finally {
-    pollTimer = setTimeout(pollForNewCard, 2000);
+    if (dataTimer) pollTimer = setTimeout(pollForNewCard, delay);
   }
 }
 
@@ -600,6 +594,62 @@ function stopTimers() {
   dataTimer = null;
 }
 
+// Tables to reload per event type
+const EVENT_RELOADS = {
+  card_captured: [loadCards],
+  card_changed: [loadCards],
+  purchase: [loadUsers, loadAllUsers, loadActivity],
+  payment: [loadUsers, loadAllUsers, loadActivity],
+  user_created: [loadAllUsers],
+  user_status: [loadUsers, loadAllUsers],
+};
+
+// A burst of events (e.g. a replayed scan batch) reloads each table once
+const pendingReloads = new Set();
+let reloadTimer = null;
+
+function scheduleReload(loaders) {
+  loaders.forEach((loader) => pendingReloads.add(loader));
+  if (reloadTimer) return;
+  reloadTimer = setTimeout(() => {
+    const loaders = [...pendingReloads];
+    pendingReloads.clear();
+    reloadTimer = null;
+    Promise.all(loaders.map((loader) => loader())).catch((e) =>
+      console.error('reload error', e)
+    );
+  }, 300);
+}
+
+// Server-pushed events replace the polling timers; if the API cannot
+// stream (e.g. no replica set), fall back to polling.
+function connectEvents() {
+  if (!window.EventSource) {
+    startTimers();
+    return;
+  }
+  eventSource = new EventSource(`${API_PREFIX}/admin/events`);
+
+  // Also fires on every reconnect, to catch up on anything missed
+  eventSource.addEventListener('open', () => {
+    stopTimers();
+    loadData();
+  });
+  eventSource.addEventListener('card_captured', (e) => {
+    showCapturedCard(JSON.parse(e.data).uid);
+  });
+  for (const [type, loaders] of Object.entries(EVENT_RELOADS)) {
+    eventSource.addEventListener(type, () => scheduleReload(loaders));
+  }
+  eventSource.addEventListener('resync', () => loadData());
+  eventSource.addEventListener('error', () => {
+    if (eventSource.readyState === EventSource.CLOSED) {
+      eventSource = null;
+      startTimers();
+    }
+  });
+}
+
 window.logout = logout;
 window.createUser = createUser;
 window.registerCard = registerCard;
@@ -624,5 +674,5 @@ window.cardsPrevPage = cardsPrevPage;
 
 window.addEventListener('load', () => {
   loadData();
-  startTimers();
+  connectEvents();
 });
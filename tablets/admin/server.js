@@ -1,6 +1,7 @@
 import express from 'express';
 import session from 'express-session';
 import path from 'path';
+import { Readable } from 'stream';
 import { fileURLToPath } from 'url';
 
 const FASTAPI_BASE = 'http://127.0.0.1:8000';
@@ -97,6 +98,40 @@ app.get('/api/me', requireAuthApi, (req, res) => {
   });
 });
 
+// Server-Sent Events are piped through as they arrive instead of buffered
+app.get('/api/admin/events', requireAuthApi, async (req, res) => {
+  const abort = new AbortController();
+  req.on('close', () => abort.abort());
+  try {
+    const headers = { Authorization: `Bearer ${req.session.admin.token}` };
+    if (req.headers['last-event-id']) {
+      headers['Last-Event-ID'] = req.headers['last-event-id'];
+    }
+    const r = await fetch(`${FASTAPI_BASE}/admin/events`, {
+      headers,
+      signal: abort.signal,
+    });
+    if (!r.ok) {
+      return res.status(r.status).json(await r.json().catch(() => ({})));
+    }
+    res.writeHead(200, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      Connection: 'keep-alive',
+    });
+    Readable.fromWeb(r.body)
+      .on('error', () => res.end())
+      .pipe(res);
+  } catch (e) {
+    if (abort.signal.aborted) return;
+    console.error(e);
+    if (!res.headersSent) {
+      return res.status(500).json({ detail: 'Event stream proxy failed' });
+    }
+    res.end();
+  }
+});
+
 app.use('/api', requireAuthApi, async (req, res) => {
   try {
     const url = `${FASTAPI_BASE}${req.originalUrl.replace(/^\/api/, '')}`;
@@ -105,6 +140,10 @@ app.use('/api', requireAuthApi, async (req, res) => {
       Authorization: `Bearer ${token}`,
       'Content-Type': 'application/json',
     };
+    // Let the API answer unchanged polls with 304
+    if (req.headers['if-none-match']) {
+      headers['If-None-Match'] = req.headers['if-none-match'];
+    }
 
     const options = {
       method: req.method,
@@ -119,6 +158,14 @@ app.use('/api', requireAuthApi, async (req, res) => {
     const contentType = r.headers.get('content-type') || '';
     res.status(r.status);
 
+    for (const name of ['etag', 'cache-control']) {
+      const value = r.headers.get(name);
+      if (value) res.set(name, value);
+    }
+    if (r.status === 304) {
+      return res.end();
+    }
+
     if (contentType.includes('application/json')) {
       const j = await r.json();
       return res.json(j);
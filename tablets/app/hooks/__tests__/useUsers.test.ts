@@ -1,5 +1,5 @@
 import { renderHook } from '@testing-library/react';
-import { fetcher } from '../useUsers';
+import { applyBalanceUpdate, fetcher, isBalanceUpdate } from '../useUsers';
 import React from 'react';
 import { LanguageProvider } from '../../context/LanguageContext';
 
@@ -139,3 +139,50 @@ describe('fetcher (useUsers)', () => {
     );
   });
 });
+
+describe('balance updates (useUsers)', () => {
+  const users = [
+    {
+      student_id: 1,
+      first_name: 'A',
+      last_name: 'B',
+      account_balance: 100,
+      status: 'active',
+    },
+    {
+      student_id: 2,
+      first_name: 'C',
+      last_name: 'D',
+      account_balance: 0,
+      status: 'active',
+    },
+  ];
+  const update = {
+    action: 'BALANCE_UPDATED' as const,
+    student_id: '1',
+    balance: 250,
+    status: 'inactive',
+  };
+
+  it('recognises BALANCE_UPDATED messages', () => {
+    expect(isBalanceUpdate(update)).toBe(true);
+    expect(isBalanceUpdate({ action: 'PAY_BACK', student_id: '1' })).toBe(false);
+    expect(isBalanceUpdate(null)).toBe(false);
+  });
+
+  it('patches only the matching student', () => {
+    const result = applyBalanceUpdate(users, update);
+    expect(result[0]).toEqual({
+      ...users[0],
+      account_balance: 250,
+      status: 'inactive',
+    });
+    expect(result[1]).toBe(users[1]);
+  });
+
+  it('returns the same list for an unknown student', () => {
+    expect(applyBalanceUpdate(users, { ...update, student_id: '9' })).toBe(
+      users
+    );
+  });
+});
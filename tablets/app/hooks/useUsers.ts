@@ -11,9 +11,37 @@ export interface User {
   status: string;
 }
 
+/** Pushed by the API over the tablet WebSocket when a student's balance or status changes */
+export interface BalanceUpdate {
+  action: 'BALANCE_UPDATED';
+  student_id: string;
+  balance: number;
+  status: string;
+}
+
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
-const REFRESH_INTERVAL_MS = 90_000; // 1.5 minutes
+export function isBalanceUpdate(data: unknown): data is BalanceUpdate {
+  return (
+    typeof data === 'object' &&
+    data !== null &&
+    (data as BalanceUpdate).action === 'BALANCE_UPDATED' &&
+    typeof (data as BalanceUpdate).student_id === 'string' &&
+    typeof (data as BalanceUpdate).balance === 'number' &&
+    typeof (data as BalanceUpdate).status === 'string'
+  );
+}
+
+/** Returns `users` with the update applied, or the same array if the student is unknown */
+export function applyBalanceUpdate(users: User[], update: BalanceUpdate): User[] {
+  const studentId = Number(update.student_id);
+  if (!users.some((user) => user.student_id === studentId)) return users;
+  return users.map((user) =>
+    user.student_id === studentId
+      ? { ...user, account_balance: update.balance, status: update.status }
+      : user
+  );
+}
 
 export async function fetcher(url: string): Promise<User[]> {
   const res = await fetch(url);
@@ -26,16 +54,22 @@ export function useUsers() {
   const { language } = useLanguage();
   const t = translations[language];
 
+  // Loaded once; the API keeps it current over the WebSocket (see page.tsx)
   const { data, error, isLoading, mutate } = useSWR<User[]>(
     `${API_BASE_URL}/users/`,
-    fetcher,
-    { refreshInterval: REFRESH_INTERVAL_MS }
+    fetcher
   );
 
+  const applyUpdate = (update: BalanceUpdate) =>
+    mutate((users) => users && applyBalanceUpdate(users, update), {
+      revalidate: false,
+    });
+
   return {
     users: data ?? [],
     loading: isLoading,
     error: error ? t.users.fetchError : null,
     mutate,
+    applyUpdate,
   };
 }
@@ -4,7 +4,7 @@ import { useEffect, useRef, useState } from 'react';
 export type ConnectionStatus = 'connecting' | 'connected' | 'disconnected';
 
 interface UseWebSocketOptions {
-  /** WebSocket server URL. Defaults to ws://localhost:8000/ws/tablet */
+  /** WebSocket server URL. Defaults to ws://localhost:8000/ws/tablet?station=<NEXT_PUBLIC_TABLET_STATION> */
   url?: string;
   /** Callback fired when a JSON message is received */
   onMessage?: (data: unknown) => void;
@@ -13,9 +13,11 @@ interface UseWebSocketOptions {
 }
 
 const WS_BASE_URL = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000';
+// Tablets sharing a station replace each other's connection on the API
+const TABLET_STATION = process.env.NEXT_PUBLIC_TABLET_STATION || 'default';
 
 export function useWebSocket({
-  url = `${WS_BASE_URL}/ws/tablet`,
+  url = `${WS_BASE_URL}/ws/tablet?station=${encodeURIComponent(TABLET_STATION)}`,
   onMessage,
   reconnectDelay = 3000,
 }: UseWebSocketOptions = {}) {
@@ -54,6 +56,11 @@ export function useWebSocket({
       ws.onmessage = (event: MessageEvent) => {
         try {
           const data = JSON.parse(event.data);
+          // Heartbeat from the API: answer it, or the connection gets evicted
+          if (data?.action === 'PING') {
+            ws.send(JSON.stringify({ action: 'PONG' }));
+            return;
+          }
           onMessageRef.current?.(data);
         } catch {
           // Non-JSON message (e.g. echo) — ignore or log
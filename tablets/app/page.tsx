@@ -4,9 +4,9 @@ import ThemeToggle from '@/app/components/ThemeToggle';
 import LanguageSwitcher from '@/app/components/LanguageSwitcher';
 import PaybackModal from '@/app/components/PaybackModal';
 import { useWebSocket } from '@/app/hooks/useWebSocket';
-import { useUsers } from '@/app/hooks/useUsers';
+import { isBalanceUpdate, useUsers } from '@/app/hooks/useUsers';
 import { Box } from '@mui/material';
-import { useCallback, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 
 interface PaybackPayload {
   student_name: string;
@@ -26,16 +26,31 @@ function isPaybackPayload(data: unknown): data is PaybackPayload {
 
 export default function Home() {
   const [paybackData, setPaybackData] = useState<PaybackPayload | null>(null);
-  const { mutate } = useUsers();
+  const { mutate, applyUpdate } = useUsers();
 
-  const handleWsMessage = useCallback((data: unknown) => {
-    if (isPaybackPayload(data)) {
-      setPaybackData(data);
-    }
-  }, []);
+  const handleWsMessage = useCallback(
+    (data: unknown) => {
+      if (isBalanceUpdate(data)) {
+        applyUpdate(data);
+      } else if ((data as { action?: string } | null)?.action === 'USERS_RESYNC') {
+        mutate();
+      } else if (isPaybackPayload(data)) {
+        setPaybackData(data);
+      }
+    },
+    [applyUpdate, mutate]
+  );
 
   const { status } = useWebSocket({ onMessage: handleWsMessage });
 
+  // Updates pushed while disconnected are lost: reload once after a reconnect
+  const wasConnectedRef = useRef(false);
+  useEffect(() => {
+    if (status !== 'connected') return;
+    if (wasConnectedRef.current) mutate();
+    wasConnectedRef.current = true;
+  }, [status, mutate]);
+
   return (
     <Box
       sx={{